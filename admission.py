@@ -0,0 +1,260 @@
+"""
+准入控制
+
+持续测量事件循环延迟，并按路由类别统计进行中的请求数。
+负载过高时对低优先级请求（验证码、AI增强）返回 503 + Retry-After，
+并发达到上限的请求排队等待，页面加载和静态资源始终放行。
+"""
+
+import os
+import time
+import asyncio
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Optional
+
+from starlette.responses import JSONResponse
+
+# 事件循环延迟的采样间隔（秒）
+LOOP_LAG_INTERVAL = 0.1
+
+# 连续该次数的采样都超过阈值才拒绝请求，启动后的单次bcrypt计算等抖动不会触发拒绝
+LOOP_LAG_SUSTAIN_SAMPLES = 3
+
+# 事件循环延迟（毫秒，平滑后）超过该值时拒绝低优先级请求
+ADMISSION_SHED_LAG_MS = float(os.environ.get("PROMPT_ADMISSION_SHED_LAG_MS", "200"))
+
+# 事件循环延迟超过该值时，除受保护的页面外全部拒绝
+ADMISSION_CRITICAL_LAG_MS = float(os.environ.get("PROMPT_ADMISSION_CRITICAL_LAG_MS", "1000"))
+
+# 并发达到上限时排队等待的最长时间（秒），超时后拒绝
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get("PROMPT_ADMISSION_QUEUE_TIMEOUT", "5"))
+
+# 拒绝时建议客户端重试的间隔（秒）
+ADMISSION_RETRY_AFTER = int(os.environ.get("PROMPT_ADMISSION_RETRY_AFTER", "2"))
+
+# 保留的最近拒绝记录条数
+ADMISSION_DECISION_HISTORY = 50
+
+PRIORITY_PROTECTED = "protected"
+PRIORITY_NORMAL = "normal"
+PRIORITY_LOW = "low"
+
+
+@dataclass
+class RouteClass:
+    """路由类别：优先级、并发上限（0为不限）及运行统计"""
+    name: str
+    priority: str
+    limit: int = 0
+    in_flight: int = 0
+    waiting: int = 0
+    admitted: int = 0
+    queued: int = 0
+    shed: int = 0
+    _semaphore: Optional[asyncio.Semaphore] = field(default=None, repr=False)
+
+    @property
+    def semaphore(self) -> Optional[asyncio.Semaphore]:
+        if self.limit and self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        return self._semaphore
+
+    def stats(self) -> dict:
+        return {
+            "priority": self.priority, "limit": self.limit, "in_flight": self.in_flight,
+            "waiting": self.waiting, "admitted": self.admitted, "queued": self.queued, "shed": self.shed
+        }
+
+
+def _class_limit(name: str, default: int) -> int:
+    return int(os.environ.get(f"PROMPT_ADMISSION_{name.upper()}_LIMIT", str(default)))
+
+
+def classify_route(method: str, path: str) -> str:
+    """按请求方法和路径确定路由类别"""
+    if path == "/auth/captcha":
+        return "captcha"
+    if path.startswith("/auth/") and method == "POST":
+        return "auth"  # 登录注册包含bcrypt计算
+    if path in ("/tasks/generate-ai-enhanced-prompt", "/tasks/speculate-ai-enhancement", "/profile/test"):
+        return "ai"
+    if method in ("GET", "HEAD") and not path.startswith("/tasks/history") and not path.endswith("/history"):
+        return "page"
+    return "storage"
+
+
+class LoopLagMonitor:
+    """事件循环延迟监测：定时休眠，实际唤醒时间与预期的差值即为延迟"""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, window: int = 50):
+        self.interval = interval
+        self.lag_ms = 0.0
+        self.samples: Deque[float] = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, (loop.time() - started - self.interval) * 1000))
+
+    def record(self, lag_ms: float):
+        # 指数平滑（从0开始），持续阻塞会很快体现
+        self.lag_ms = self.lag_ms * 0.7 + lag_ms * 0.3
+        self.samples.append(lag_ms)
+
+    @property
+    def sustained_lag_ms(self) -> float:
+        """用于准入决策的延迟：平滑值与最近几次采样中的最小值取较小者，单次抖动不会触发拒绝"""
+        recent = list(self.samples)[-LOOP_LAG_SUSTAIN_SAMPLES:]
+        if len(recent) < LOOP_LAG_SUSTAIN_SAMPLES:
+            return 0.0
+        return min(self.lag_ms, min(recent))
+
+    @property
+    def max_lag_ms(self) -> float:
+        return max(self.samples, default=0.0)
+
+
+class AdmissionController:
+    """准入决策与统计"""
+
+    def __init__(self, shed_lag_ms: float = ADMISSION_SHED_LAG_MS,
+                 critical_lag_ms: float = ADMISSION_CRITICAL_LAG_MS,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.shed_lag_ms = shed_lag_ms
+        self.critical_lag_ms = critical_lag_ms
+        self.queue_timeout = queue_timeout
+        self.monitor = LoopLagMonitor()
+        self.classes: Dict[str, RouteClass] = {
+            "page": RouteClass("page", PRIORITY_PROTECTED),
+            "captcha": RouteClass("captcha", PRIORITY_LOW, _class_limit("captcha", 16)),
+            "auth": RouteClass("auth", PRIORITY_NORMAL, _class_limit("auth", 8)),
+            "ai": RouteClass("ai", PRIORITY_LOW, _class_limit("ai", 16)),
+            "storage": RouteClass("storage", PRIORITY_NORMAL, _class_limit("storage", 64)),
+        }
+        self.decisions: Deque[dict] = deque(maxlen=ADMISSION_DECISION_HISTORY)
+        self.shedding = False
+
+    def start(self):
+        # 信号量绑定创建时的事件循环，每次启动时重新创建
+        for route_class in self.classes.values():
+            route_class._semaphore = None
+        self.monitor.start()
+
+    async def stop(self):
+        await self.monitor.stop()
+
+    def overloaded(self, route_class: RouteClass) -> bool:
+        """当前延迟下该类别是否应被拒绝"""
+        lag = self.monitor.sustained_lag_ms
+        if route_class.priority == PRIORITY_LOW:
+            return lag >= self.shed_lag_ms
+        if route_class.priority == PRIORITY_NORMAL:
+            return lag >= self.critical_lag_ms
+        return False
+
+    def _report(self, route_class: RouteClass, path: str, reason: str):
+        route_class.shed += 1
+        self.decisions.append({
+            "time": time.time(), "class": route_class.name, "path": path,
+            "reason": reason, "lag_ms": round(self.monitor.sustained_lag_ms, 1)
+        })
+
+    def _update_shedding(self):
+        # 只在进入/退出拒绝状态时输出，避免高负载时刷屏
+        lag = self.monitor.sustained_lag_ms
+        shedding = lag >= self.shed_lag_ms
+        if shedding != self.shedding:
+            self.shedding = shedding
+            if shedding:
+                print(f"⚠️  事件循环延迟 {lag:.0f}ms，开始拒绝低优先级请求")
+            else:
+                print(f"✅ 事件循环延迟恢复至 {lag:.0f}ms，停止拒绝请求")
+
+    async def acquire(self, route_class: RouteClass, path: str) -> bool:
+        """申请执行，返回是否准入；准入后必须调用 release"""
+        self._update_shedding()
+        if self.overloaded(route_class):
+            self._report(route_class, path, "loop_lag")
+            return False
+        semaphore = route_class.semaphore
+        if semaphore is not None:
+            if semaphore.locked():
+                # 排队的请求不超过并发上限，更多的直接拒绝
+                if route_class.waiting >= route_class.limit:
+                    self._report(route_class, path, "queue_full")
+                    return False
+                route_class.queued += 1
+                route_class.waiting += 1
+                try:
+                    await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+                except asyncio.TimeoutError:
+                    self._report(route_class, path, "queue_timeout")
+                    return False
+                finally:
+                    route_class.waiting -= 1
+            else:
+                await semaphore.acquire()
+        route_class.in_flight += 1
+        route_class.admitted += 1
+        return True
+
+    def release(self, route_class: RouteClass):
+        route_class.in_flight -= 1
+        if route_class.semaphore is not None:
+            route_class.semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "loop_lag_ms": round(self.monitor.lag_ms, 1),
+            "sustained_lag_ms": round(self.monitor.sustained_lag_ms, 1),
+            "max_loop_lag_ms": round(self.monitor.max_lag_ms, 1),
+            "shed_lag_ms": self.shed_lag_ms,
+            "critical_lag_ms": self.critical_lag_ms,
+            "shedding": self.shedding,
+            "classes": {name: route_class.stats() for name, route_class in self.classes.items()},
+            "recent_decisions": list(self.decisions)
+        }
+
+
+class AdmissionMiddleware:
+    """准入控制中间件（ASGI），只处理HTTP请求，WebSocket直接放行"""
+
+    def __init__(self, app, controller: "AdmissionController" = None):
+        self.app = app
+        self.controller = controller or admission_controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route_class = self.controller.classes[classify_route(scope["method"], scope["path"])]
+        if not await self.controller.acquire(route_class, scope["path"]):
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "服务繁忙，请稍后重试"},
+                headers={"Retry-After": str(ADMISSION_RETRY_AFTER)}
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(route_class)
+
+
+# 创建全局准入控制实例
+admission_controller = AdmissionController()
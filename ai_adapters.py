@@ -0,0 +1,295 @@
+"""
+AI服务适配器
+
+按接口格式封装请求构建、响应解析（含流式SSE）和token用量提取，路由只调用 complete_chat()：
+- OpenAI兼容接口（/v1/chat/completions，默认）
+- Anthropic messages接口（api.anthropic.com 或路径以 /messages 结尾）
+- 离线服务（offline://...），不访问网络，按Prompt生成确定性的答复，用于测试、压测和内网环境；
+  可通过 offline://local?latency_ms=200 模拟服务延迟
+新的接口格式实现 ProviderAdapter 后调用 register_adapter() 登记即可。
+"""
+
+import os
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs, ParseResult
+
+import httpx
+
+import codec
+from http_pool import get_http_client, DEFAULT_TIMEOUT
+from token_budget import count_tokens
+
+# 是否以流式（SSE）方式接收答复：长答复时读超时按数据块计算，不会因整体耗时过长被代理断开
+AI_STREAM = os.environ.get("PROMPT_AI_STREAM", "0") == "1"
+
+# 默认的采样温度
+AI_TEMPERATURE = 0.7
+
+# Anthropic接口版本
+ANTHROPIC_VERSION = "2023-06-01"
+
+
+# 解析响应体时视为格式异常的错误（JSON解码失败、缺少字段、字段类型不符）
+_PARSE_ERRORS = (ValueError, KeyError, IndexError, TypeError, AttributeError)
+
+
+class AIServiceError(Exception):
+    """AI服务调用失败（连接失败、超时、非200响应、响应格式异常）"""
+
+
+@dataclass
+class AICompletion:
+    """一次AI调用的答复和token用量（服务未返回用量时为None）"""
+    content: str = ""
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+
+
+class ProviderAdapter:
+    """接口格式适配器：子类实现请求构建和响应解析，发送、流式读取和错误处理在此统一完成"""
+
+    name = "base"
+
+    def matches(self, url: ParseResult) -> bool:
+        """该适配器是否处理此地址"""
+        return False
+
+    def build_request(self, provider, prompt: str, max_tokens: int, stream: bool) -> Tuple[Dict[str, str], dict]:
+        """返回 (请求头, 请求体)"""
+        raise NotImplementedError
+
+    def parse_response(self, data: dict) -> AICompletion:
+        """解析非流式响应体"""
+        raise NotImplementedError
+
+    def parse_stream_event(self, event: dict, completion: AICompletion) -> bool:
+        """把一个流式事件合并进 completion，返回是否已结束"""
+        raise NotImplementedError
+
+    def error_detail(self, response: httpx.Response) -> str:
+        """从错误响应中提取错误信息（OpenAI和Anthropic都使用 {"error": {"message": ...}}）"""
+        try:
+            error = response.json().get("error")
+            if isinstance(error, dict) and error.get("message"):
+                return error["message"]
+        except Exception:
+            pass
+        return response.text
+
+    async def complete(self, provider, prompt: str, max_tokens: int, timeout: httpx.Timeout = DEFAULT_TIMEOUT,
+                       headers: Optional[Dict[str, str]] = None, stream: bool = AI_STREAM) -> AICompletion:
+        """发送请求并返回答复，失败时抛出 AIServiceError"""
+        request_headers, payload = self.build_request(provider, prompt, max_tokens, stream)
+        request_headers.update(headers or {})
+        client = get_http_client()
+        try:
+            if not stream:
+                response = await client.post(provider.api_url, headers=request_headers, json=payload, timeout=timeout)
+                self._check_status(response)
+                try:
+                    return self.parse_response(response.json())
+                except _PARSE_ERRORS:
+                    raise AIServiceError(f"AI响应格式异常: {response.text[:200]}")
+
+            async with client.stream("POST", provider.api_url, headers=request_headers, json=payload,
+                                     timeout=timeout) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    self._check_status(response)
+                return await self._read_stream(response)
+        except httpx.TimeoutException:
+            raise AIServiceError("AI服务请求超时，请检查网络连接或API地址")
+        except (httpx.RequestError, httpx.InvalidURL) as e:
+            raise AIServiceError(f"无法连接到AI服务，请检查API地址: {str(e)}")
+        except (httpx.HTTPError, httpx.StreamError) as e:
+            raise AIServiceError(f"AI服务响应异常: {str(e)}")
+
+    def _check_status(self, response: httpx.Response):
+        if response.status_code != 200:
+            raise AIServiceError(f"AI服务请求失败 ({response.status_code}): {self.error_detail(response)}")
+
+    async def _read_stream(self, response: httpx.Response) -> AICompletion:
+        completion = AICompletion()
+        async for event in iter_sse_events(response):
+            try:
+                if self.parse_stream_event(event, completion):
+                    break
+            except _PARSE_ERRORS:
+                raise AIServiceError(f"AI流式响应格式异常: {str(event)[:200]}")
+        return completion
+
+
+async def iter_sse_events(response: httpx.Response):
+    """逐个解析SSE的data字段（JSON），遇到 [DONE] 结束"""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue  # 空行、注释和 event: 行（事件类型在data中也有）
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        if not data:
+            continue
+        try:
+            yield codec.loads(data)
+        except ValueError:
+            raise AIServiceError(f"AI流式响应格式异常: {data[:200]}")
+
+
+class OpenAIAdapter(ProviderAdapter):
+    """OpenAI兼容的 chat/completions 接口"""
+
+    name = "openai"
+
+    def matches(self, url: ParseResult) -> bool:
+        return url.scheme in ("http", "https")
+
+    def build_request(self, provider, prompt: str, max_tokens: int, stream: bool) -> Tuple[Dict[str, str], dict]:
+        headers = {
+            "Authorization": f"Bearer {provider.api_key}",
+            "Content-Type": "application/json"
+        }
+        payload = {
+            "model": provider.model_name,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": AI_TEMPERATURE,
+            "max_tokens": max_tokens
+        }
+        if stream:
+            payload["stream"] = True
+        return headers, payload
+
+    @staticmethod
+    def _usage(completion: AICompletion, usage: Optional[dict]):
+        if usage:
+            completion.prompt_tokens = usage.get("prompt_tokens")
+            completion.completion_tokens = usage.get("completion_tokens")
+
+    def parse_response(self, data: dict) -> AICompletion:
+        completion = AICompletion(content=data["choices"][0]["message"]["content"] or "")
+        self._usage(completion, data.get("usage"))
+        return completion
+
+    def parse_stream_event(self, event: dict, completion: AICompletion) -> bool:
+        # 部分服务在最后一个数据块中返回用量，此时choices为空
+        self._usage(completion, event.get("usage"))
+        for choice in event.get("choices") or []:
+            completion.content += (choice.get("delta") or {}).get("content") or ""
+        return False
+
+
+class AnthropicAdapter(ProviderAdapter):
+    """Anthropic messages 接口"""
+
+    name = "anthropic"
+
+    def matches(self, url: ParseResult) -> bool:
+        return url.scheme in ("http", "https") and (
+            url.hostname == "api.anthropic.com" or url.path.rstrip("/").endswith("/messages"))
+
+    def build_request(self, provider, prompt: str, max_tokens: int, stream: bool) -> Tuple[Dict[str, str], dict]:
+        headers = {
+            "x-api-key": provider.api_key,
+            "anthropic-version": ANTHROPIC_VERSION,
+            "Content-Type": "application/json"
+        }
+        payload = {
+            "model": provider.model_name,
+            "max_tokens": max_tokens,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": AI_TEMPERATURE
+        }
+        if stream:
+            payload["stream"] = True
+        return headers, payload
+
+    def parse_response(self, data: dict) -> AICompletion:
+        usage = data.get("usage") or {}
+        return AICompletion(
+            content="".join(block.get("text", "") for block in data["content"] if block.get("type") == "text"),
+            prompt_tokens=usage.get("input_tokens"),
+            completion_tokens=usage.get("output_tokens")
+        )
+
+    def parse_stream_event(self, event: dict, completion: AICompletion) -> bool:
+        event_type = event.get("type")
+        if event_type == "message_start":
+            completion.prompt_tokens = (event["message"].get("usage") or {}).get("input_tokens")
+        elif event_type == "content_block_delta" and event["delta"].get("type") == "text_delta":
+            completion.content += event["delta"]["text"]
+        elif event_type == "message_delta":
+            completion.completion_tokens = (event.get("usage") or {}).get("output_tokens")
+        elif event_type == "error":
+            raise AIServiceError(f"AI服务请求失败: {event['error'].get('message')}")
+        return event_type == "message_stop"
+
+
+class OfflineAdapter(ProviderAdapter):
+    """离线服务：不访问网络，相同的模型和Prompt总是得到相同的答复"""
+
+    name = "offline"
+
+    def matches(self, url: ParseResult) -> bool:
+        return url.scheme == "offline"
+
+    def build_request(self, provider, prompt: str, max_tokens: int, stream: bool) -> Tuple[Dict[str, str], dict]:
+        return {}, {"model": provider.model_name, "prompt": prompt, "max_tokens": max_tokens}
+
+    def parse_response(self, data: dict) -> AICompletion:
+        digest = hashlib.sha256(f"{data['model']}\n{data['prompt']}".encode("utf-8")).hexdigest()[:16]
+        content = f"离线模式答复（模型 {data['model']}，Prompt指纹 {digest}）"
+        return AICompletion(content=content, prompt_tokens=count_tokens(data["prompt"]),
+                            completion_tokens=min(count_tokens(content), data["max_tokens"]))
+
+    def parse_stream_event(self, event: dict, completion: AICompletion) -> bool:
+        return True
+
+    async def complete(self, provider, prompt: str, max_tokens: int, timeout: httpx.Timeout = DEFAULT_TIMEOUT,
+                       headers: Optional[Dict[str, str]] = None, stream: bool = AI_STREAM) -> AICompletion:
+        query = parse_qs(urlparse(provider.api_url).query)
+        try:
+            latency = float(query.get("latency_ms", ["0"])[0]) / 1000
+        except ValueError:
+            latency = 0.0
+        if latency > 0:
+            if timeout.read is not None and latency > timeout.read:
+                await asyncio.sleep(timeout.read)
+                raise AIServiceError("AI服务请求超时，请检查网络连接或API地址")
+            await asyncio.sleep(latency)
+        return self.parse_response(self.build_request(provider, prompt, max_tokens, stream)[1])
+
+
+# 按登记顺序倒序匹配，后登记的适配器优先；OpenAI兼容接口兜底
+_adapters: List[ProviderAdapter] = [OpenAIAdapter(), AnthropicAdapter(), OfflineAdapter()]
+
+
+def register_adapter(adapter: ProviderAdapter):
+    """登记新的接口格式"""
+    _adapters.append(adapter)
+
+
+def adapter_for(api_url: str) -> ProviderAdapter:
+    """按服务地址选择适配器"""
+    url = urlparse(api_url or "")
+    for adapter in reversed(_adapters):
+        if adapter.matches(url):
+            return adapter
+    return _adapters[0]
+
+
+async def complete_chat(provider, prompt: str, max_tokens: int, timeout: httpx.Timeout = DEFAULT_TIMEOUT,
+                        headers: Optional[Dict[str, str]] = None, stream: bool = AI_STREAM) -> AICompletion:
+    """向AI服务（AIConfig或AIProvider）发送单轮对话，失败时抛出 AIServiceError"""
+    return await adapter_for(provider.api_url).complete(provider, prompt, max_tokens, timeout, headers, stream)
@@ -0,0 +1,85 @@
+import os
+import json
+import stat
+import mimetypes
+from typing import Dict
+
+import anyio
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.types import Scope
+
+STATIC_DIR = "static"
+DIST_DIR_NAME = "dist"
+MANIFEST_FILE = os.path.join(STATIC_DIR, DIST_DIR_NAME, "manifest.json")
+
+# 带指纹的资源内容不会变化，可以长期缓存
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# 未构建的资源每次使用前都需要重新验证（依靠ETag返回304）
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# 预压缩文件的后缀，按优先级排列
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def load_manifest(path: str = MANIFEST_FILE) -> Dict[str, str]:
+    """加载资源清单（原始路径 -> 带指纹路径），未构建时返回空字典"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+_manifest = load_manifest()
+
+
+def reload_manifest():
+    """重新加载资源清单（构建资源后调用）"""
+    global _manifest
+    _manifest = load_manifest()
+
+
+def asset_url(path: str) -> str:
+    """模板中引用静态资源的地址，已构建时返回带指纹的地址"""
+    path = path.lstrip("/")
+    hashed = _manifest.get(path)
+    if hashed:
+        return f"/{STATIC_DIR}/{DIST_DIR_NAME}/{hashed}"
+    return f"/{STATIC_DIR}/{path}"
+
+
+class AssetStaticFiles(StaticFiles):
+    """静态文件服务：带指纹的资源使用长期缓存并优先返回预压缩文件"""
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        normalized = path.replace(os.sep, "/")
+        if not normalized.startswith(DIST_DIR_NAME + "/"):
+            response = await super().get_response(path, scope)
+            response.headers.setdefault("Cache-Control", REVALIDATE_CACHE_CONTROL)
+            return response
+
+        response = await self._get_precompressed_response(path, scope)
+        if response is None:
+            response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+    async def _get_precompressed_response(self, path: str, scope: Scope):
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            if encoding not in accept_encoding:
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+            if stat_result and stat.S_ISREG(stat_result.st_mode):
+                media_type, _ = mimetypes.guess_type(path)
+                return FileResponse(
+                    full_path,
+                    stat_result=stat_result,
+                    media_type=media_type or "application/octet-stream",
+                    headers={"Content-Encoding": encoding}
+                )
+        return None
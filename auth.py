@@ -6,12 +6,14 @@ from fastapi import HTTPException, Depends, status, Request, Cookie
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import secrets
 import string
-from PIL import Image, ImageDraw, ImageFont
 import io
+import os
 import base64
 
 from models import User, UserCreate, TokenData
 from storage import storage
+from shared_state import shared_state
+from tracing import traced
 
 # 密码加密上下文
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -21,8 +23,14 @@ SECRET_KEY = "your-secret-key-here-change-in-production"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# 验证码存储（内存中，生产环境建议使用Redis）
-captcha_store = {}
+# 验证码字体（首次生成验证码时加载）
+_captcha_font = None
+
+# 管理员邮箱（逗号分隔），诊断类接口只对管理员开放
+ADMIN_EMAILS = {email.strip().lower() for email in os.environ.get("PROMPT_ADMIN_EMAILS", "").split(",") if email.strip()}
+
+# 验证码有效期（秒），验证码通过共享状态后端存储，多worker部署时任意worker都可以校验
+CAPTCHA_EXPIRE_SECONDS = 300
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """验证密码"""
@@ -66,6 +74,7 @@ def get_token_from_request(request: Request):
 
     return None
 
+@traced("auth.verify_token")
 def verify_token(request: Request):
     """验证令牌"""
     token = get_token_from_request(request)
@@ -99,8 +108,19 @@ def get_current_user(request: Request):
     """获取当前用户（作为依赖使用）"""
     return verify_token(request)
 
+def require_admin(request: Request):
+    """要求当前用户为管理员（作为依赖使用）"""
+    token_data = verify_token(request)
+    if token_data.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="需要管理员权限")
+    return token_data
+
 def generate_captcha() -> tuple[str, str]:
     """生成验证码"""
+    # PIL只在第一次需要验证码时导入，缩短应用启动时间
+    from PIL import Image, ImageDraw, ImageFont
+    global _captcha_font
+
     # 生成随机验证码文本
     length = 4
     chars = string.ascii_letters + string.digits
@@ -120,10 +140,12 @@ def generate_captcha() -> tuple[str, str]:
         draw.line([(x1, y1), (x2, y2)], fill='lightgray', width=1)
 
     # 绘制验证码文本
-    try:
-        font = ImageFont.truetype("arial.ttf", 20)
-    except:
-        font = ImageFont.load_default()
+    if _captcha_font is None:
+        try:
+            _captcha_font = ImageFont.truetype("arial.ttf", 20)
+        except:
+            _captcha_font = ImageFont.load_default()
+    font = _captcha_font
 
     # 每个字符随机位置和颜色
     for i, char in enumerate(captcha_text):
@@ -143,19 +165,15 @@ def generate_captcha() -> tuple[str, str]:
 
     # 生成验证码ID并存储
     captcha_id = secrets.token_hex(16)
-    captcha_store[captcha_id] = captcha_text.upper()
+    shared_state.set(f"captcha:{captcha_id}", captcha_text.upper(), ttl=CAPTCHA_EXPIRE_SECONDS)
 
     return captcha_id, f"data:image/png;base64,{img_str}"
 
 def verify_captcha(captcha_id: str, user_input: str) -> bool:
     """验证验证码"""
-    if captcha_id not in captcha_store:
+    # 读取并删除已使用的验证码
+    stored_captcha = shared_state.pop(f"captcha:{captcha_id}")
+    if stored_captcha is None:
         return False
 
-    stored_captcha = captcha_store[captcha_id]
-    user_input = user_input.upper()
-
-    # 删除已使用的验证码
-    del captcha_store[captcha_id]
-
-    return stored_captcha == user_input
+    return stored_captcha == user_input.upper()
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Prompt Generator 性能基准脚本
+
+用法: python benchmark.py [项目 ...]
+不指定项目时运行全部基准。
+"""
+
+import os
+import sys
+import time
+import statistics
+from types import SimpleNamespace
+
+
+def measure(func, repeat: int = 200) -> dict:
+    """多次执行函数，返回耗时统计（毫秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "mean": statistics.mean(timings),
+        "p50": timings[len(timings) // 2],
+        "p95": timings[int(len(timings) * 0.95) - 1],
+    }
+
+
+def print_result(name: str, result: dict):
+    print(f"  {name:<36} mean {result['mean']:.3f}ms  p50 {result['p50']:.3f}ms  p95 {result['p95']:.3f}ms")
+
+
+def bench_templates():
+    """模板渲染：各路由独立环境（自动重载、无片段缓存） vs 共享生产环境"""
+    import tempfile
+    from fastapi.templating import Jinja2Templates
+    from jinja2 import FileSystemBytecodeCache
+    from assets import asset_url
+    from templating import templates, FragmentCacheExtension, TEMPLATES_DIR
+
+    print("📄 模板渲染")
+    context = {
+        "request": None,
+        "project": SimpleNamespace(id=1, name="示例项目"),
+        "user": SimpleNamespace(id=1, username="bench"),
+    }
+
+    # 原有方式：默认配置（auto_reload开启），片段缓存关闭
+    legacy = Jinja2Templates(directory=TEMPLATES_DIR, extensions=[FragmentCacheExtension])
+    legacy.env.fragment_cache_enabled = False
+    legacy.env.globals["asset_url"] = asset_url
+
+    for name in ("interface_task_form.html", "bug_fix_form.html", "menu.html"):
+        legacy_result = measure(lambda: legacy.env.get_template(name).render(context))
+        shared_result = measure(lambda: templates.env.get_template(name).render(context))
+        print_result(f"{name} 原有环境", legacy_result)
+        print_result(f"{name} 共享环境", shared_result)
+        print(f"  {'':<36} 提升 {legacy_result['mean'] / shared_result['mean']:.1f}x")
+
+    # 冷启动编译：无字节码缓存 vs 已有字节码缓存
+    with tempfile.TemporaryDirectory() as cache_dir:
+        def compile_all(bytecode_cache=None):
+            env = Jinja2Templates(directory=TEMPLATES_DIR, extensions=[FragmentCacheExtension],
+                                  bytecode_cache=bytecode_cache).env
+            for template_name in env.list_templates(extensions=["html"]):
+                env.get_template(template_name)
+
+        compile_all(FileSystemBytecodeCache(cache_dir))
+        print_result("全部模板编译（无字节码缓存）", measure(compile_all, repeat=20))
+        print_result("全部模板编译（字节码缓存）", measure(lambda: compile_all(FileSystemBytecodeCache(cache_dir)), repeat=20))
+
+
+def retained_bytes(func) -> int:
+    """返回函数结果占用的内存（tracemalloc统计，字节）"""
+    import tracemalloc
+    tracemalloc.start()
+    result = func()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def bench_projects(project_count: int = 5, standard_lines: int = 400):
+    """项目列表：完整项目模型 vs 项目摘要"""
+    import tempfile
+    from datetime import datetime
+    from storage import JSONStorage
+    from templating import templates
+
+    print(f"📁 项目列表（{project_count} 个项目，每个规范 {standard_lines} 条）")
+    with tempfile.TemporaryDirectory() as data_dir:
+        bench_storage = JSONStorage(data_dir)
+        now = datetime.now().isoformat()
+        bench_storage._write_shard_file(bench_storage._projects_file(1), [
+            {
+                "id": i + 1,
+                "user_id": 1,
+                "name": f"项目{i + 1}",
+                "development_standard": "\n".join(f"- 规范条目{n}：接口统一返回Result包装，异常统一由全局处理器转换"
+                                                   for n in range(standard_lines)),
+                "interface_example": "com/example/controller/UserController.java",
+                "entity_example": "com/example/entity/User.java",
+                "mapper_example": "com/example/mapper/UserMapper.java",
+                "created_at": now,
+                "updated_at": now,
+            }
+            for i in range(project_count)
+        ])
+
+        full = lambda: bench_storage.get_projects_by_user_id(1)
+        summary = lambda: bench_storage.get_project_summaries_by_user_id(1)
+        print_result("完整项目模型", measure(full, repeat=100))
+        print_result("项目摘要", measure(summary, repeat=100))
+        print(f"  {'结果内存 完整 / 摘要':<36} {retained_bytes(full) / 1024:.1f}KB / {retained_bytes(summary) / 1024:.1f}KB")
+
+        page = templates.env.get_template("projects.html")
+        context = {"request": None, "can_create": True, "max_projects": 5}
+        full_json = sum(len(p.model_dump_json()) for p in full())
+        summary_json = sum(len(p.model_dump_json()) for p in summary())
+        print(f"  {'序列化大小 完整 / 摘要':<36} {full_json / 1024:.1f}KB / {summary_json / 1024:.1f}KB")
+        print(f"  {'列表页HTML':<36} {len(page.render(context, projects=summary())) / 1024:.1f}KB")
+
+
+def bench_serialization(project_count: int = 5):
+    """存储读写与接口响应序列化：标准库json + 完整校验 vs codec + 免校验构建"""
+    import json
+    from datetime import datetime
+    import codec
+    from models import Project
+
+    print(f"🧬 序列化（{project_count} 个项目，orjson {'已启用' if codec.orjson else '未安装，使用标准库'}）")
+    now = datetime.now()
+    records = [
+        {
+            "id": i + 1, "user_id": 1, "name": f"项目{i + 1}",
+            "development_standard": "\n".join(f"- 规范条目{n}" for n in range(200)),
+            "interface_example": "com/example/controller/UserController.java",
+            "entity_example": "com/example/entity/User.java",
+            "mapper_example": "com/example/mapper/UserMapper.java",
+            "created_at": now, "updated_at": now,
+        }
+        for i in range(project_count)
+    ]
+    legacy_raw = json.dumps(records, indent=2, ensure_ascii=False, default=str).encode("utf-8")
+    fast_raw = codec.dumps(records)
+
+    def legacy_parse(value):
+        # 原实现：依次尝试 fromisoformat（替换空格）、strptime
+        try:
+            return datetime.fromisoformat(value.replace(' ', 'T'))
+        except ValueError:
+            return datetime.strptime(value, '%Y-%m-%d %H:%M:%S.%f')
+
+    def legacy_read():
+        return [Project(**{**r, "created_at": legacy_parse(r["created_at"]), "updated_at": legacy_parse(r["updated_at"])})
+                for r in json.loads(legacy_raw.decode("utf-8"))]
+
+    def fast_read():
+        return [Project.model_construct(**{**r, "created_at": codec.parse_timestamp(r["created_at"]),
+                                           "updated_at": codec.parse_timestamp(r["updated_at"])})
+                for r in codec.loads(fast_raw)]
+
+    print_result("读取 原实现", measure(legacy_read))
+    print_result("读取 codec", measure(fast_read))
+    print_result("写入 json.dumps(indent=2)",
+                 measure(lambda: json.dumps(records, indent=2, ensure_ascii=False, default=str).encode("utf-8")))
+    print_result("写入 codec.dumps", measure(lambda: codec.dumps(records)))
+
+    payload = [p.model_dump(mode="json") for p in fast_read()]
+    print_result("响应 JSONResponse", measure(lambda: codec.JSONResponse(payload).body))
+    print_result("响应 FastJSONResponse", measure(lambda: codec.FastJSONResponse(payload).body))
+
+
+def bench_blobs(project_count: int = 50, standard_lines: int = 400):
+    """项目文件读写：长文本内联 vs blob存储"""
+    import tempfile
+    import codec
+    from blob_store import BlobStore
+
+    print(f"🗜️  blob存储（{project_count} 个项目共用 10 套规范，每套 {standard_lines} 条）")
+    with tempfile.TemporaryDirectory() as blob_dir:
+        store = BlobStore(blob_dir)
+        records = [
+            {
+                "id": i + 1, "user_id": i // 5 + 1, "name": f"项目{i + 1}",
+                "development_standard": "\n".join(f"- 规范{i % 10}-{n}：接口统一返回Result包装，异常统一由全局处理器转换"
+                                                   for n in range(standard_lines)),
+                "interface_example": "com/example/controller/UserController.java",
+            }
+            for i in range(project_count)
+        ]
+        packed = [{**r, "development_standard": store.pack(r["development_standard"])} for r in records]
+        inline_raw, packed_raw = codec.dumps(records), codec.dumps(packed)
+
+        print(f"  {'projects.json 内联 / blob引用':<36} {len(inline_raw) / 1024:.1f}KB / {len(packed_raw) / 1024:.1f}KB")
+        print(f"  {'blob文件数 / 磁盘占用':<36} {store.stats()['blobs']} / {store.stats()['disk_bytes'] / 1024:.1f}KB")
+        print_result("读取+写回 内联", measure(lambda: codec.dumps(codec.loads(inline_raw)), repeat=50))
+        print_result("读取+写回 blob引用", measure(lambda: codec.dumps(codec.loads(packed_raw)), repeat=50))
+
+        ref = packed[0]["development_standard"]
+        cold = BlobStore(blob_dir)
+        print_result("读取规范 blob（解压）", measure(lambda: BlobStore(blob_dir, cache_chars=0).get(ref["$blob"]), repeat=50))
+        print_result("读取规范 blob（缓存）", measure(lambda: cold.get(ref["$blob"]), repeat=50))
+
+
+def bench_sharding(user_count: int = 200, projects_per_user: int = 5):
+    """项目更新：按用户分片后每次写入的数据量"""
+    import tempfile
+    from storage import JSONStorage, write_json_atomic
+    from models import ProjectUpdate
+
+    print(f"🧩 数据分片（{user_count} 个用户，每人 {projects_per_user} 个项目）")
+    with tempfile.TemporaryDirectory() as data_dir:
+        bench_storage = JSONStorage(data_dir)
+        index = bench_storage._load_index()
+        project_id = 1
+        for user_id in range(1, user_count + 1):
+            projects = []
+            for _ in range(projects_per_user):
+                projects.append({
+                    "id": project_id, "user_id": user_id, "name": f"项目{project_id}",
+                    "development_standard": "- 接口统一返回Result包装", "interface_example": "UserController.java",
+                    "entity_example": "User.java", "mapper_example": "UserMapper.java",
+                })
+                index["projects"][str(project_id)] = user_id
+                project_id += 1
+            bench_storage._write_shard_file(bench_storage._projects_file(user_id), projects)
+            index["emails"][f"user{user_id}@example.com"] = user_id
+        write_json_atomic(bench_storage.index_file, index)
+
+        shard_bytes = os.path.getsize(bench_storage._projects_file(1))
+        total_bytes = sum(os.path.getsize(bench_storage._projects_file(u)) for u in range(1, user_count + 1))
+        update = ProjectUpdate(name="新名称")
+        print_result("更新一个项目", measure(lambda: bench_storage.update_project(1, update), repeat=50))
+        print(f"  {'每次写入 分片 / 单文件布局':<36} {shard_bytes / 1024:.1f}KB / {total_bytes / 1024:.1f}KB")
+
+
+def bench_cache():
+    """每个请求的存储读取：缓存 vs 每次读文件"""
+    import tempfile
+    from storage import JSONStorage
+    from models import User, ProjectCreate
+
+    print("🧠 存储缓存（读取用户 + 项目列表 + AI配置）")
+    with tempfile.TemporaryDirectory() as data_dir:
+        bench_storage = JSONStorage(data_dir)
+        user = bench_storage.create_user(User(username="bench", email="bench@example.com", password_hash="x"))
+        for i in range(5):
+            bench_storage.create_project(user.id, ProjectCreate(name=f"项目{i}", development_standard="- 规范"))
+
+        def request_reads():
+            current = bench_storage.get_user_by_email("bench@example.com")
+            bench_storage.get_projects_by_user_id(current.id)
+            bench_storage.get_ai_config_by_user_id(current.id)
+
+        cached = measure(request_reads)
+        bench_storage.cache_enabled = False
+        uncached = measure(request_reads)
+        bench_storage.cache_enabled = True
+        print_result("每次读文件", uncached)
+        print_result("缓存", cached)
+        print(f"  {'通知方式':<36} {bench_storage.notifier.name}")
+
+
+def bench_history(entry_count: int = 200, standard_lines: int = 200):
+    """Prompt历史：命中查询耗时与去重压缩后的磁盘占用"""
+    import tempfile
+    from prompt_history import PromptHistory, request_fingerprint
+
+    print(f"📚 Prompt历史（{entry_count} 条记录共用一套 {standard_lines} 条的项目规范）")
+    with tempfile.TemporaryDirectory() as history_dir:
+        history = PromptHistory(history_dir, max_entries=0, max_age_days=0)
+        standard = "\n".join(f"- 规范{n}：接口统一返回Result包装，异常统一由全局处理器转换" for n in range(standard_lines))
+        raw_bytes = 0
+        for i in range(entry_count):
+            payload = {"interface_name": f"接口{i}", "interface_path": f"/api/v1/items/{i}", "project_id": 1}
+            prompt = f"# 核心任务\n\n接口{i}\n\n# 要求\n\n{standard}\n"
+            raw_bytes += len(prompt.encode("utf-8"))
+            history.record(1, 1, "interface", request_fingerprint("interface", payload), f"接口{i}", payload, prompt)
+
+        fingerprint = request_fingerprint("interface", {"interface_name": "接口7", "interface_path": "/api/v1/items/7",
+                                                        "project_id": 1})
+        print_result("命中历史", measure(lambda: history.find(1, fingerprint)))
+        print_result("分页列出（每页20条）", measure(lambda: history.list_entries(1)))
+        stats = history.blobs.stats()
+        print(f"  {'原始输出 / blob磁盘占用':<36} {raw_bytes / 1024:.1f}KB / {stats['disk_bytes'] / 1024:.1f}KB")
+
+
+def bench_specs(spec_count: int = 100_000, template_count: int = 2_000):
+    """相似接口查询：10万条历史接口签名中查找最相似的接口"""
+    import random
+    from models import InterfaceTaskRequest
+    from spec_index import MinHasher, SignatureIndex, spec_tokens
+
+    print(f"🔎 相似接口索引（{spec_count} 条签名，LSH分桶 + 候选逐位比较）")
+    request = InterfaceTaskRequest(
+        interface_name="查询订单", interface_description="分页查询用户订单", business_logic_description="",
+        interface_path="/orders", request_body_example="{}", response_body_example="{}", project_id=1,
+        database_ddls=["CREATE TABLE orders (id bigint, order_no varchar(32), user_id bigint, amount decimal);"],
+        response_structure_table=[{"parameter": name, "description": ""}
+                                  for name in ("orderNo", "userId", "amount", "total", "ownerName")]
+    )
+    hasher = MinHasher()
+    print_result("计算签名", measure(lambda: hasher.signature(spec_tokens(request))))
+
+    # 按若干"表结构模板"生成签名：同一模板下的接口随机替换部分签名位，模拟字段略有不同的相似接口
+    rng = random.Random(7)
+    templates = [[rng.randrange(1 << 31) for _ in range(hasher.size)] for _ in range(template_count)]
+    index = SignatureIndex()
+    for i in range(spec_count):
+        signature = list(templates[i % template_count])
+        for position in rng.sample(range(hasher.size), rng.randrange(hasher.size // 2)):
+            signature[position] = rng.randrange(1 << 31)
+        index.add(i, signature)
+    queries = [templates[rng.randrange(template_count)] for _ in range(50)]
+    query_iter = iter(queries * 10)
+    print_result("查询Top3", measure(lambda: index.query(next(query_iter), limit=3, threshold=0.5), repeat=500))
+
+
+
+def bench_memory(rounds: int = 5, requests_per_round: int = 200):
+    """长时间运行的内存增长：反复执行验证码、存储读取和Prompt生成，记录各存储大小和增长最多的代码位置"""
+    import tempfile
+    from auth import generate_captcha
+    from shared_state import shared_state
+    from storage import JSONStorage
+    from memory_diagnostics import MemoryTracker
+    from models import User, ProjectCreate, InterfaceTaskRequest
+    from prompt_sections import SectionBuilder
+
+    print(f"🧮 内存增长（{rounds} 轮，每轮 {requests_per_round} 次验证码 + 存储读取 + Prompt生成）")
+    tracker = MemoryTracker()
+    tracker.start_tracing(frames=1)
+    with tempfile.TemporaryDirectory() as data_dir:
+        bench_storage = JSONStorage(data_dir)
+        user = bench_storage.create_user(User(username="bench", email="bench@example.com", password_hash="x"))
+        project = bench_storage.create_project(user.id, ProjectCreate(name="项目", development_standard="- 规范\n" * 200))
+        tracker.register_store("shared_state", lambda: {"entries": shared_state.size()})
+        tracker.register_store("storage_cache", lambda: {"entries": bench_storage.cache_stats()["entries"]})
+        request = InterfaceTaskRequest(
+            interface_name="查询订单", interface_description="分页查询用户订单", business_logic_description="",
+            interface_path="/orders", request_body_example="{}", response_body_example="{}", project_id=project.id
+        )
+
+        tracker.take_snapshot("start")
+        for round_index in range(rounds):
+            for _ in range(requests_per_round):
+                generate_captcha()
+                current = bench_storage.get_user_by_email("bench@example.com")
+                SectionBuilder(request, current.username, bench_storage.get_project_by_id(project.id)).render().assemble()
+            point = tracker.sample()
+            stores = ", ".join(f"{name} {size['entries']}" for name, size in point["stores"].items())
+            print(f"  {'第' + str(round_index + 1) + '轮':<36} traced {point['traced_bytes'] / 1024:.1f}KB  {stores}")
+        tracker.take_snapshot("end")
+
+        diff = tracker.diff("start", "end", limit=5)
+        print(f"  {'增长最多的代码位置':<36} 共 {diff['size_diff_bytes'] / 1024:+.1f}KB")
+        for stat in diff["top"]:
+            location = os.path.relpath(stat["location"]) if os.path.isabs(stat["location"]) else stat["location"]
+            print(f"    {stat['size_diff_bytes'] / 1024:+8.1f}KB  {stat['count_diff']:+6d}  {location}")
+    tracker.stop_tracing()
+
+
+def bench_ai(calls: int = 500, concurrency: int = 50, latency_ms: int = 50):
+    """AI调用链路的并发压测：使用离线服务（不访问网络），覆盖服务调度、适配器、追踪和调用日志"""
+    import asyncio
+    import tempfile
+    from datetime import datetime
+
+    print(f"🤖 AI调用（离线服务，{calls} 次，并发 {concurrency}，模拟延迟 {latency_ms}ms）")
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        # 调用日志写入当前目录下的 logs/，在临时目录中运行
+        os.chdir(work_dir)
+        try:
+            from models import AIConfig
+            from routers.task_router import call_ai_service
+
+            ai_config = AIConfig(user_id=1, api_key="offline", api_url=f"offline://local?latency_ms={latency_ms}",
+                                 model_name="offline", created_at=datetime.now())
+            prompt = "请分析以下接口的数据来源。\n" * 50
+            timings = []
+
+            async def one(index: int, semaphore: asyncio.Semaphore):
+                async with semaphore:
+                    start = time.perf_counter()
+                    await call_ai_service(f"{prompt}{index}", ai_config, "bench")
+                    timings.append((time.perf_counter() - start) * 1000)
+
+            async def run():
+                semaphore = asyncio.Semaphore(concurrency)
+                await asyncio.gather(*(one(i, semaphore) for i in range(calls)))
+
+            start = time.perf_counter()
+            asyncio.run(run())
+            elapsed = time.perf_counter() - start
+        finally:
+            os.chdir(cwd)
+
+    timings.sort()
+    print_result("单次调用", {
+        "mean": statistics.mean(timings),
+        "p50": timings[len(timings) // 2],
+        "p95": timings[int(len(timings) * 0.95) - 1],
+    })
+    print(f"  {'吞吐量':<36} {calls / elapsed:.0f} 次/秒（理论上限 {concurrency * 1000 / latency_ms:.0f} 次/秒）")
+
+
+BENCHMARKS = {
+    "templates": bench_templates,
+    "projects": bench_projects,
+    "serialization": bench_serialization,
+    "blobs": bench_blobs,
+    "sharding": bench_sharding,
+    "cache": bench_cache,
+    "history": bench_history,
+    "specs": bench_specs,
+    "memory": bench_memory,
+    "ai": bench_ai,
+}
+
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"❌ 未知基准: {name}，可选: {', '.join(BENCHMARKS)}")
+            return 1
+        BENCHMARKS[name]()
+        print()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+import os
+import mmap
+import gzip
+import hashlib
+import time
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 大文本字段的内容寻址存储目录
+BLOB_DIR = os.path.join("data", "blobs")
+
+# 记录中引用blob的键：{"$blob": <sha256>, "length": 字符数, "lines": 行数, "preview": 首行}
+BLOB_REF_KEY = "$blob"
+
+# blob引用中保存的首行预览的最大字符数（列表页不读取blob内容）
+BLOB_PREVIEW_CHARS = 120
+
+# 超过该字符数的文本才移入blob存储，短文本直接保存在记录中
+BLOB_MIN_LENGTH = 512
+
+# 读缓存最多保存的解压后文本总字符数
+BLOB_CACHE_CHARS = 8 * 1024 * 1024
+
+# 清理时只删除超过该时间（秒）未被写入的blob，避免误删刚写入、引用尚未保存的内容
+BLOB_GC_MIN_AGE = 3600
+
+# 项目更新、删除后立即释放blob时，跳过该时间（秒）内写入过的blob（可能正被其他分片引用），留给定期清理
+BLOB_RELEASE_MIN_AGE = 60
+
+# 压缩格式对应的文件后缀，读取时按顺序查找
+BLOB_SUFFIXES = (".zst", ".gz")
+
+
+def is_blob_ref(value: Any) -> bool:
+    """判断字段值是否为blob引用"""
+    return isinstance(value, dict) and BLOB_REF_KEY in value
+
+
+def blob_ref_length(value: Any) -> int:
+    """字段的字符数（blob引用读取引用中记录的长度，不加载内容）"""
+    if is_blob_ref(value):
+        return value.get("length", 0)
+    return len(value or "")
+
+
+class BlobStore:
+    """内容寻址的压缩文本存储：相同内容只保存一份，读取时内存映射并缓存解压结果"""
+
+    def __init__(self, blob_dir: str = BLOB_DIR, cache_chars: int = BLOB_CACHE_CHARS):
+        self.blob_dir = blob_dir
+        self.cache_chars = cache_chars
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._cached_chars = 0
+        self._lock = threading.Lock()
+        # 目录在第一次写入时创建，导入模块不会在工作目录中建立 data/blobs
+
+    def _path(self, blob_hash: str, suffix: str) -> str:
+        return os.path.join(self.blob_dir, blob_hash[:2], blob_hash + suffix)
+
+    def _find(self, blob_hash: str) -> Optional[str]:
+        """查找已存在的blob文件"""
+        for suffix in BLOB_SUFFIXES:
+            path = self._path(blob_hash, suffix)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def put(self, text: str) -> Dict[str, Any]:
+        """保存文本，返回写入记录的blob引用（内容已存在时不重复写入）"""
+        raw = text.encode("utf-8")
+        blob_hash = hashlib.sha256(raw).hexdigest()
+        existing = self._find(blob_hash)
+        if existing is not None:
+            # 刷新修改时间，防止被并发的清理当作长期无引用的blob删除
+            os.utime(existing)
+        else:
+            if zstandard is not None:
+                suffix, data = ".zst", zstandard.ZstdCompressor(level=10).compress(raw)
+            else:
+                suffix, data = ".gz", gzip.compress(raw, compresslevel=6, mtime=0)
+            path = self._path(blob_hash, suffix)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+        self._remember(blob_hash, text)
+        first_line_end = text.find("\n", 0, BLOB_PREVIEW_CHARS)
+        return {
+            BLOB_REF_KEY: blob_hash,
+            "length": len(text),
+            "lines": text.count("\n") + 1 if not text.isspace() else 0,
+            "preview": text[:first_line_end if first_line_end >= 0 else BLOB_PREVIEW_CHARS]
+        }
+
+    def get(self, blob_hash: str) -> str:
+        """读取文本，优先使用缓存"""
+        with self._lock:
+            text = self._cache.get(blob_hash)
+            if text is not None:
+                self._cache.move_to_end(blob_hash)
+                return text
+
+        path = self._find(blob_hash)
+        if path is None:
+            raise FileNotFoundError(f"blob不存在: {blob_hash}")
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if path.endswith(".zst"):
+                    if zstandard is None:
+                        raise RuntimeError("读取 .zst blob 需要安装 zstandard")
+                    raw = zstandard.ZstdDecompressor().decompress(mapped)
+                else:
+                    raw = gzip.decompress(mapped)
+        text = raw.decode("utf-8")
+        self._remember(blob_hash, text)
+        return text
+
+    def _remember(self, blob_hash: str, text: str):
+        """放入LRU缓存，超出容量时淘汰最久未使用的条目"""
+        if len(text) > self.cache_chars:
+            return
+        with self._lock:
+            if blob_hash in self._cache:
+                self._cache.move_to_end(blob_hash)
+                return
+            self._cache[blob_hash] = text
+            self._cached_chars += len(text)
+            while self._cached_chars > self.cache_chars:
+                _, evicted = self._cache.popitem(last=False)
+                self._cached_chars -= len(evicted)
+
+    def pack(self, text: str) -> Any:
+        """长文本转换为blob引用，短文本原样返回"""
+        if isinstance(text, str) and len(text) >= BLOB_MIN_LENGTH:
+            return self.put(text)
+        return text
+
+    def unpack(self, value: Any) -> Any:
+        """blob引用还原为文本，其他值原样返回"""
+        if is_blob_ref(value):
+            return self.get(value[BLOB_REF_KEY])
+        return value
+
+    def collect_garbage(self, referenced: Iterable[str], min_age: float = BLOB_GC_MIN_AGE) -> int:
+        """删除不再被任何记录引用且超过保留时间的blob，返回删除的文件数"""
+        referenced = set(referenced)
+        cutoff = time.time() - min_age
+        removed = 0
+        for root, _, files in os.walk(self.blob_dir):
+            for name in files:
+                if name.startswith(".tmp-"):
+                    continue
+                blob_hash = name.split(".", 1)[0]
+                path = os.path.join(root, name)
+                if blob_hash not in referenced and os.path.getmtime(path) < cutoff:
+                    self._remove(blob_hash, path)
+                    removed += 1
+        return removed
+
+    def release(self, blob_hashes: Iterable[str], min_age: float = BLOB_RELEASE_MIN_AGE) -> int:
+        """删除调用方确认已无引用的blob，返回删除的文件数
+
+        最近写入过的blob可能刚被其他分片写入、引用尚未保存，保留给 collect_garbage 处理。
+        """
+        cutoff = time.time() - min_age
+        removed = 0
+        for blob_hash in set(blob_hashes):
+            path = self._find(blob_hash)
+            try:
+                if path is not None and os.path.getmtime(path) < cutoff:
+                    self._remove(blob_hash, path)
+                    removed += 1
+            except FileNotFoundError:
+                pass  # 已被其他进程删除
+        return removed
+
+    def _remove(self, blob_hash: str, path: str):
+        """删除blob文件并使缓存失效"""
+        os.remove(path)
+        with self._lock:
+            evicted = self._cache.pop(blob_hash, None)
+            if evicted is not None:
+                self._cached_chars -= len(evicted)
+
+    def cache_info(self) -> Dict[str, int]:
+        """解压缓存的条目数和字符数（不访问磁盘）"""
+        return {"entries": len(self._cache), "chars": self._cached_chars, "max_chars": self.cache_chars}
+
+    def stats(self) -> Dict[str, int]:
+        """blob数量、磁盘占用和缓存情况"""
+        count = disk_bytes = 0
+        for root, _, files in os.walk(self.blob_dir):
+            for name in files:
+                if not name.startswith(".tmp-"):
+                    count += 1
+                    disk_bytes += os.path.getsize(os.path.join(root, name))
+        return {
+            "blobs": count,
+            "disk_bytes": disk_bytes,
+            "cached_blobs": len(self._cache),
+            "cached_chars": self._cached_chars
+        }
+
+
+# 创建全局blob存储实例
+blob_store = BlobStore()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+静态资源构建脚本
+
+为 static/ 下的CSS/JS等资源生成带内容指纹的副本、预压缩文件（gzip，安装brotli时同时生成br）
+以及资源清单 static/dist/manifest.json。模板通过 asset_url() 引用资源，
+构建后自动切换到带指纹的地址，服务端对其返回长期缓存头。
+
+用法: python build_assets.py
+"""
+
+import os
+import gzip
+import json
+import shutil
+import hashlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from assets import STATIC_DIR, DIST_DIR_NAME, MANIFEST_FILE
+
+DIST_DIR = os.path.join(STATIC_DIR, DIST_DIR_NAME)
+
+# 需要预压缩的文本类资源
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".svg", ".json", ".txt", ".html"}
+
+# 小于该大小的文件压缩收益很小，不生成压缩版本
+MIN_COMPRESS_SIZE = 512
+
+
+def iter_source_files():
+    """遍历需要构建的静态资源（跳过构建产物目录）"""
+    for root, dirs, files in os.walk(STATIC_DIR):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != DIST_DIR]
+        for name in sorted(files):
+            yield os.path.join(root, name)
+
+
+def fingerprint(content: bytes) -> str:
+    """根据内容计算指纹"""
+    return hashlib.sha256(content).hexdigest()[:12]
+
+
+def write_compressed(path: str, content: bytes) -> int:
+    """写入预压缩文件，返回生成的文件数"""
+    count = 0
+    with open(path + ".gz", "wb") as f:
+        f.write(gzip.compress(content, compresslevel=9, mtime=0))
+    count += 1
+    if brotli is not None:
+        with open(path + ".br", "wb") as f:
+            f.write(brotli.compress(content, quality=11))
+        count += 1
+    return count
+
+
+def build():
+    """构建全部资源并写入清单"""
+    if os.path.exists(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR)
+
+    manifest = {}
+    compressed_files = 0
+    for source_path in iter_source_files():
+        relative_path = os.path.relpath(source_path, STATIC_DIR).replace(os.sep, "/")
+        with open(source_path, "rb") as f:
+            content = f.read()
+
+        stem, ext = os.path.splitext(relative_path)
+        hashed_path = f"{stem}.{fingerprint(content)}{ext}"
+        target_path = os.path.join(DIST_DIR, hashed_path)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        with open(target_path, "wb") as f:
+            f.write(content)
+
+        if ext.lower() in COMPRESSIBLE_EXTENSIONS and len(content) >= MIN_COMPRESS_SIZE:
+            compressed_files += write_compressed(target_path, content)
+
+        manifest[relative_path] = hashed_path
+        print(f"✅ {relative_path} -> {DIST_DIR_NAME}/{hashed_path}")
+
+    with open(MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    print(f"📦 共构建 {len(manifest)} 个资源，生成 {compressed_files} 个预压缩文件")
+    if brotli is None:
+        print("💡 未安装brotli，仅生成gzip压缩文件")
+    return manifest
+
+
+if __name__ == "__main__":
+    build()
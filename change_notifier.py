@@ -0,0 +1,226 @@
+import os
+import sys
+import mmap
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+# 变更通知方式：auto（Linux下使用inotify，其他平台轮询）、inotify、polling
+NOTIFIER_MODE = os.environ.get("PROMPT_CHANGE_NOTIFIER", "auto")
+
+# 轮询方式的扫描间隔（秒）
+POLL_INTERVAL = 1.0
+
+# 缓存只保存数据目录顶层的索引文件和 users/<用户ID>/ 下的分片文件，
+# blobs、history、usage 等子目录不在监听范围内
+SHARD_ROOT = "users"
+
+# inotify 常量（见 <sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+# 回调参数为发生变化的文件绝对路径，None 表示无法确定变化范围（需要全部失效）
+ChangeCallback = Callable[[Optional[str]], None]
+
+
+def _is_data_file(name: str) -> bool:
+    """只关心数据文件，忽略临时文件和锁文件"""
+    return name.endswith(".json") and not name.startswith(".tmp-")
+
+
+def _is_watched_dir(root: str, directory: str) -> bool:
+    """是否为需要监听的目录：数据目录、分片根目录或某个用户的分片目录"""
+    shard_root = os.path.join(root, SHARD_ROOT)
+    return directory in (root, shard_root) or os.path.dirname(directory) == shard_root
+
+
+def _watched_dirs(root: str):
+    """当前需要监听的全部目录"""
+    yield root
+    shard_root = os.path.join(root, SHARD_ROOT)
+    if os.path.isdir(shard_root):
+        yield shard_root
+        for entry in os.scandir(shard_root):
+            if entry.is_dir():
+                yield entry.path
+
+
+class SharedVersion:
+    """多进程共享的版本计数器
+
+    保存在一个8字节的小文件中并映射到内存，读取不需要系统调用。
+    每次写入数据后递增，其他进程发现版本变化时先处理完积压的变更通知再读缓存。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if not os.path.exists(path) or os.path.getsize(path) < 8:
+            with open(path, "ab") as f:
+                f.write(b"\0" * (8 - f.tell()))
+        self._file = open(path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), 8)
+
+    def read(self) -> int:
+        return struct.unpack_from("Q", self._map, 0)[0]
+
+    def bump(self) -> int:
+        """递增版本号（调用方需持有该文件的锁）"""
+        value = (self.read() + 1) % (1 << 64)
+        struct.pack_into("Q", self._map, 0, value)
+        return value
+
+
+class PollingNotifier:
+    """轮询方式：定期比较数据文件的修改时间和大小"""
+
+    name = "polling"
+
+    def __init__(self, root: str, callback: ChangeCallback, interval: float = POLL_INTERVAL):
+        self.root = os.path.abspath(root)
+        self.callback = callback
+        self.interval = interval
+        self._signatures: Dict[str, Tuple[int, int, int]] = self._scan()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def _scan(self) -> Dict[str, Tuple[int, int, int]]:
+        signatures = {}
+        for directory in _watched_dirs(self.root):
+            try:
+                entries = list(os.scandir(directory))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if _is_data_file(entry.name):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    signatures[entry.path] = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        return signatures
+
+    def drain(self):
+        """立即扫描一次并通知变化的文件"""
+        with self._lock:
+            current = self._scan()
+            changed = [path for path, signature in current.items() if self._signatures.get(path) != signature]
+            changed += [path for path in self._signatures if path not in current]
+            self._signatures = current
+        for path in changed:
+            self.callback(path)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.drain()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="change-notifier", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+
+class InotifyNotifier:
+    """inotify方式（Linux）：由内核推送变更事件，后台线程实时处理"""
+
+    name = "inotify"
+
+    def __init__(self, root: str, callback: ChangeCallback):
+        self.root = os.path.abspath(root)
+        self.callback = callback
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self._watches: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        for directory in _watched_dirs(self.root):
+            self._add_watch(directory)
+
+    def _add_watch(self, directory: str):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"无法监听目录: {directory}")
+        self._watches[wd] = directory
+
+    def drain(self):
+        """读取并处理所有已到达的事件（不阻塞）"""
+        changed = []
+        with self._lock:
+            while True:
+                try:
+                    data = os.read(self._fd, 64 * 1024)
+                except BlockingIOError:
+                    break
+                if not data:
+                    break
+                offset = 0
+                while offset < len(data):
+                    wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                    offset += _EVENT_HEADER.size
+                    name = data[offset:offset + length].rstrip(b"\0").decode("utf-8", "replace")
+                    offset += length
+                    if mask & IN_Q_OVERFLOW:
+                        # 事件队列溢出，无法确定哪些文件变化
+                        changed.append(None)
+                        continue
+                    directory = self._watches.get(wd)
+                    if directory is None:
+                        continue
+                    path = os.path.join(directory, name)
+                    if mask & IN_ISDIR:
+                        if mask & (IN_CREATE | IN_MOVED_TO) and _is_watched_dir(self.root, path):
+                            # 新建的分片目录：加入监听（包括其中已建好的用户目录），已写入的文件视为变化
+                            try:
+                                for new_dir in [path] + [p for p in _watched_dirs(self.root)
+                                                         if os.path.dirname(p) == path]:
+                                    self._add_watch(new_dir)
+                                    changed.extend(os.path.join(new_dir, f) for f in os.listdir(new_dir)
+                                                   if _is_data_file(f))
+                            except OSError:
+                                pass
+                    elif _is_data_file(name):
+                        changed.append(path)
+        for path in changed:
+            self.callback(path)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            readable, _, _ = select.select([self._fd], [], [], 1.0)
+            if readable:
+                self.drain()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="change-notifier", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+
+def create_notifier(root: str, callback: ChangeCallback, mode: str = NOTIFIER_MODE):
+    """创建变更通知器，inotify不可用时回退为轮询"""
+    if mode in ("auto", "inotify") and sys.platform.startswith("linux"):
+        try:
+            return InotifyNotifier(root, callback)
+        except (OSError, AttributeError) as e:
+            print(f"⚠️  inotify不可用（{e}），数据变更改为轮询检测")
+    return PollingNotifier(root, callback)
@@ -0,0 +1,86 @@
+import json
+from datetime import datetime
+from typing import Any, Optional, Union
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+    JSONDecodeError = orjson.JSONDecodeError
+else:
+    FastJSONResponse = JSONResponse
+    JSONDecodeError = json.JSONDecodeError
+
+# 存储中时间字段的统一格式：ISO 8601（datetime.isoformat()，日期和时间以T分隔）
+TIMESTAMP_FIELDS = ("created_at", "updated_at")
+
+# 历史数据中出现过的时间格式（str(datetime) 写入的空格分隔格式等），只在迁移时使用
+LEGACY_TIMESTAMP_FORMATS = ("%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S.%f")
+
+
+def _default(value: Any):
+    """无法直接序列化的类型统一转为字符串（时间按统一格式，与orjson的输出一致）"""
+    if isinstance(value, datetime):
+        return format_timestamp(value)
+    return str(value)
+
+
+def dumps(data: Any, pretty: bool = True) -> bytes:
+    """序列化为UTF-8编码的JSON"""
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 if pretty else 0
+        return orjson.dumps(data, default=_default, option=option)
+    text = json.dumps(data, indent=2 if pretty else None, ensure_ascii=False, default=_default)
+    return text.encode("utf-8")
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """解析JSON"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def format_timestamp(value: datetime) -> str:
+    """格式化为统一的时间格式"""
+    return value.isoformat()
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """解析统一格式的时间字符串，已经是datetime或为空时原样返回"""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+def normalize_timestamp(value: Any) -> Any:
+    """把历史格式的时间字符串转换为统一格式，无法识别时原样返回"""
+    if not isinstance(value, str):
+        return value
+    try:
+        return format_timestamp(datetime.fromisoformat(value.replace(" ", "T", 1)))
+    except ValueError:
+        pass
+    for fmt in LEGACY_TIMESTAMP_FORMATS:
+        try:
+            return format_timestamp(datetime.strptime(value, fmt))
+        except ValueError:
+            continue
+    return value
+
+
+def normalize_record_timestamps(record: dict) -> bool:
+    """统一一条记录中的时间字段，返回是否有修改"""
+    changed = False
+    for field in TIMESTAMP_FIELDS:
+        if field in record:
+            normalized = normalize_timestamp(record[field])
+            if normalized != record[field]:
+                record[field] = normalized
+                changed = True
+    return changed
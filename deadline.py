@@ -0,0 +1,103 @@
+import os
+import time
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Dict, List, Optional, Tuple
+
+# AI增强生成的总时间预算（秒），到期时取消未完成的AI调用并返回已完成的部分
+AI_ENHANCE_BUDGET = float(os.environ.get("PROMPT_AI_ENHANCE_BUDGET", "90"))
+
+
+class ClientDisconnected(Exception):
+    """客户端在等待结果期间断开了连接"""
+
+
+class Deadline:
+    """请求的截止时间（单调时钟）"""
+
+    def __init__(self, seconds: float):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def cap(self, timeout: float) -> float:
+        """将超时时间限制在剩余时间以内"""
+        return min(timeout, self.remaining())
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """当前请求的截止时间，未设置时为None
+
+    截止时间保存在上下文变量中，asyncio.create_task 创建的任务会继承，调用链上的函数不需要逐层传递。
+    """
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(seconds: float):
+    """在代码块内设置截止时间；外层已有更早的截止时间时沿用外层的"""
+    outer = _current_deadline.get()
+    deadline = Deadline(seconds)
+    if outer is not None and outer.expires_at < deadline.expires_at:
+        deadline = outer
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+async def _wait_disconnect(request):
+    """等待客户端断开连接
+
+    请求体此时已读取完毕，之后收到的消息只会是 http.disconnect（经过中间件时响应发送后也会收到）。
+    不使用 request.is_disconnected() 轮询：经过 BaseHTTPMiddleware 时它无法取到断开消息。
+    """
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def gather_within_deadline(aws: Dict[str, Awaitable], request=None) -> Tuple[Dict[str, Any], List[str]]:
+    """并发执行多个协程，返回 (已完成的结果, 截止时间到达时未完成的名称)
+
+    截止时间到达时取消未完成的协程；传入request时同时监视客户端连接，
+    断开时取消全部协程并抛出 ClientDisconnected。协程抛出的异常原样抛出，同时取消其余协程。
+    """
+    tasks = {name: asyncio.ensure_future(aw) for name, aw in aws.items()}
+    watcher = asyncio.ensure_future(_wait_disconnect(request)) if request is not None else None
+    deadline = current_deadline()
+    try:
+        pending = set(tasks.values())
+        while pending:
+            waiting = pending | {watcher} if watcher is not None else pending
+            done, _ = await asyncio.wait(waiting, timeout=deadline.remaining() if deadline else None,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if watcher is not None and watcher in done:
+                raise ClientDisconnected()
+            if not done:
+                break
+            pending -= done
+            if any(not task.cancelled() and task.exception() is not None for task in done):
+                break  # 异常会直接抛出，其余结果不再需要，不等待未完成的协程
+        results = {name: task.result() for name, task in tasks.items() if task.done()}
+        return results, [name for name, task in tasks.items() if not task.done()]
+    finally:
+        leftovers = [task for task in tasks.values() if not task.done()]
+        if watcher is not None:
+            leftovers.append(watcher)
+        for task in leftovers:
+            task.cancel()
+        if leftovers:
+            await asyncio.gather(*leftovers, return_exceptions=True)
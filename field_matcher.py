@@ -0,0 +1,397 @@
+import re
+import difflib
+from dataclasses import dataclass, field
+from typing import List, Optional, Dict, Tuple
+
+from models import InterfaceTaskRequest
+from tracing import traced
+
+# 模糊匹配的相似度阈值，达到该值的列作为候选提示交给AI确认
+FUZZY_CUTOFF = 0.85
+
+# 本地可以直接确定数据源的匹配类型
+RESOLVED_MATCH_TYPES = ("exact", "camel", "case", "normalized")
+
+# 各匹配类型的关系描述，{column}为匹配到的列名
+_MATCH_DESCRIPTIONS = {
+    "exact": "字段名与数据库列名一致",
+    "camel": "{column}转译为驼峰命名即为该字段",
+    "case": "字段名与{column}仅大小写不同",
+    "normalized": "忽略大小写和分隔符后字段名与{column}一致",
+}
+
+# 多个表都有匹配列时提示中的说法
+_CANDIDATE_LABELS = {
+    "exact": "同名列",
+    "camel": "驼峰转译后同名的列",
+    "case": "仅大小写不同的同名列",
+    "normalized": "忽略分隔符后同名的列",
+}
+
+# DDL中不属于列定义的行
+_NON_COLUMN_PREFIXES = ("PRIMARY", "KEY", "UNIQUE", "INDEX", "CONSTRAINT", "FOREIGN", "FULLTEXT", "SPATIAL", "CHECK")
+
+_TABLE_PATTERN = re.compile(r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?[`"\[]?([\w.]+)[`"\]]?', re.IGNORECASE)
+_COLUMN_PATTERN = re.compile(r'^\s*[`"\[]?(\w+)[`"\]]?\s+(\w+)')
+_COMMENT_PATTERN = re.compile(r"COMMENT\s+'((?:[^'\\]|\\.)*)'", re.IGNORECASE)
+_REFERENCES_PATTERN = re.compile(r'REFERENCES\s+[`"\[]?([\w.]+)[`"\]]?\s*\(\s*[`"\[]?(\w+)', re.IGNORECASE)
+_FOREIGN_KEY_PATTERN = re.compile(r'FOREIGN\s+KEY\s*\(\s*[`"\[]?(\w+)', re.IGNORECASE)
+
+
+@dataclass
+class DDLColumn:
+    """DDL列定义"""
+    table: str
+    name: str
+    column_type: str
+    comment: str = ""
+    references: str = ""  # 外键引用的列（表.列），没有外键时为空
+
+    @property
+    def qualified_name(self) -> str:
+        return f"{self.table}.{self.name}"
+
+
+@dataclass
+class FieldMatch:
+    """报文字段与数据库列的匹配结果
+
+    名称完全一致、驼峰转译、仅大小写不同或忽略分隔符后一致，且只在一个表中出现的列
+    才能在本地确定数据源；多个表中都有该列或名称只是近似时，候选列作为提示交给AI确认。
+    """
+    parameter: str
+    description: str
+    column: Optional[DDLColumn] = None
+    candidates: List[DDLColumn] = field(default_factory=list)
+    related_columns: List[DDLColumn] = field(default_factory=list)  # 外键引用的列
+    match_type: str = ""  # "exact" / "camel" / "case" / "normalized" / "fuzzy"，未匹配时为空
+    score: float = 0.0
+
+    @property
+    def ambiguous(self) -> bool:
+        return len(self.candidates) > 1
+
+    @property
+    def resolved(self) -> bool:
+        return self.column is not None and self.match_type in RESOLVED_MATCH_TYPES and not self.ambiguous
+
+    def hint(self) -> str:
+        """未能在本地确定数据源时给AI的候选提示，没有候选列时为空"""
+        if self.resolved or not self.candidates:
+            return ""
+        names = "、".join(c.qualified_name for c in self.candidates)
+        if self.match_type == "fuzzy":
+            return f"名称与{names}近似（相似度{self.score:.2f}），请确认"
+        return f"{names}中都有{_CANDIDATE_LABELS[self.match_type]}，请确认"
+
+
+def snake_to_camel(name: str) -> str:
+    """下划线命名转驼峰命名，例如 user_id -> userId"""
+    parts = [p for p in name.split('_') if p]
+    if not parts:
+        return name
+    return parts[0].lower() + ''.join(p[:1].upper() + p[1:].lower() for p in parts[1:])
+
+
+def camel_to_snake(name: str) -> str:
+    """驼峰命名转下划线命名，例如 userId -> user_id"""
+    name = re.sub(r'([A-Z]+)([A-Z][a-z])', r'\1_\2', name)
+    name = re.sub(r'([a-z0-9])([A-Z])', r'\1_\2', name)
+    return name.lower()
+
+
+def normalize_name(name: str) -> str:
+    """归一化字段名：去掉分隔符并转小写，用于大小写/命名风格无关的比较"""
+    return re.sub(r'[^0-9a-z]', '', name.lower())
+
+
+def leaf_parameter_name(parameter: str) -> str:
+    """取嵌套报文字段的叶子名称，例如 data.list.0.userId -> userId"""
+    segments = [s for s in re.split(r'[.\[\]]', parameter) if s and not s.isdigit()]
+    return segments[-1] if segments else parameter
+
+
+def parse_ddl_columns(ddl: str) -> List[DDLColumn]:
+    """解析CREATE TABLE语句中的列定义"""
+    columns = []
+    for statement in split_ddl_statements(ddl):
+        table_match = _TABLE_PATTERN.search(statement)
+        if not table_match:
+            continue
+        table = table_match.group(1).split('.')[-1]
+
+        body_start = statement.find('(', table_match.end())
+        body_end = statement.rfind(')')
+        if body_start < 0 or body_end <= body_start:
+            continue
+
+        table_columns: Dict[str, DDLColumn] = {}
+        foreign_keys = []
+        for line in _split_column_definitions(statement[body_start + 1:body_end]):
+            if line.lstrip().upper().startswith(_NON_COLUMN_PREFIXES):
+                # 表级外键约束：FOREIGN KEY (列) REFERENCES 表(列)
+                foreign_key, references = _FOREIGN_KEY_PATTERN.search(line), _REFERENCES_PATTERN.search(line)
+                if foreign_key and references:
+                    foreign_keys.append((foreign_key.group(1), references))
+                continue
+            column_match = _COLUMN_PATTERN.match(line)
+            if not column_match:
+                continue
+            comment_match = _COMMENT_PATTERN.search(line)
+            references = _REFERENCES_PATTERN.search(line)
+            column = DDLColumn(
+                table=table,
+                name=column_match.group(1),
+                column_type=column_match.group(2),
+                comment=comment_match.group(1) if comment_match else "",
+                references=_reference_name(references) if references else ""
+            )
+            table_columns[column.name.lower()] = column
+            columns.append(column)
+        for name, references in foreign_keys:
+            if name.lower() in table_columns:
+                table_columns[name.lower()].references = _reference_name(references)
+    return columns
+
+
+def _reference_name(references: re.Match) -> str:
+    return f"{references.group(1).split('.')[-1]}.{references.group(2)}"
+
+
+def split_ddl_statements(ddl: str) -> List[str]:
+    """按分号拆分DDL语句（忽略引号内的分号），去掉空语句"""
+    statements, current, quote = [], [], None
+    for char in ddl:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"', '`'):
+            quote = char
+        elif char == ';':
+            statements.append(''.join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    statements.append(''.join(current).strip())
+    return [s for s in statements if s]
+
+
+def dedupe_ddls(ddls: List[str]) -> List[str]:
+    """去除重复的DDL语句
+
+    同名表只保留第一次出现的CREATE TABLE语句，其他语句按去除空白后的文本去重。
+    """
+    seen_tables, seen_statements, result = set(), set(), []
+    for ddl in ddls:
+        kept = []
+        for statement in split_ddl_statements(ddl):
+            table_match = _TABLE_PATTERN.search(statement)
+            key = ("table", table_match.group(1).split('.')[-1].lower()) if table_match \
+                else ("statement", re.sub(r'\s+', ' ', statement).lower())
+            if key in (seen_tables if table_match else seen_statements):
+                continue
+            (seen_tables if table_match else seen_statements).add(key)
+            kept.append(statement)
+        if kept:
+            result.append(";\n\n".join(kept) + ";")
+    return result
+
+
+def strip_unused_columns(ddl: str, keep_columns: set) -> str:
+    """删除DDL中未被使用的列定义和二级索引，保留主键及keep_columns中的列
+
+    keep_columns 为归一化后的列名集合（见 normalize_name）。
+    """
+    statements = []
+    for statement in split_ddl_statements(ddl):
+        table_match = _TABLE_PATTERN.search(statement)
+        body_start = statement.find('(', table_match.end()) if table_match else -1
+        body_end = statement.rfind(')')
+        if body_start < 0 or body_end <= body_start:
+            statements.append(statement)
+            continue
+
+        primary_keys = set()
+        for definition in _split_column_definitions(statement[body_start + 1:body_end]):
+            if definition.strip().upper().startswith("PRIMARY"):
+                primary_keys.update(normalize_name(n) for n in re.findall(r'\w+', definition.split('(', 1)[-1]))
+
+        kept = []
+        for definition in _split_column_definitions(statement[body_start + 1:body_end]):
+            stripped = definition.strip()
+            if stripped.upper().startswith("PRIMARY"):
+                kept.append(stripped)
+                continue
+            if stripped.upper().startswith(_NON_COLUMN_PREFIXES):
+                continue
+            column_match = _COLUMN_PATTERN.match(definition)
+            if column_match and normalize_name(column_match.group(1)) not in keep_columns | primary_keys:
+                continue
+            kept.append(stripped)
+
+        statements.append(statement[:body_start + 1] + "\n  " + ",\n  ".join(kept) + "\n" + statement[body_end:])
+    return ";\n\n".join(statements) + ";"
+
+
+def _split_column_definitions(body: str) -> List[str]:
+    """按顶层逗号拆分列定义（忽略括号和引号内的逗号）"""
+    definitions, current, depth, quote = [], [], 0, None
+    for char in body:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"'):
+            quote = char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            definitions.append(''.join(current))
+            current = []
+            continue
+        current.append(char)
+    if ''.join(current).strip():
+        definitions.append(''.join(current))
+    return definitions
+
+
+class FieldMatcher:
+    """基于DDL列的报文字段数据源匹配器
+
+    构建时预先计算四类索引：原始列名、小写列名、驼峰列名、归一化列名，
+    单个字段的匹配只需若干次字典查找，只有未命中时才进行模糊比较。
+    """
+
+    def __init__(self, columns: List[DDLColumn]):
+        self.columns = columns
+        self._qualified_index: Dict[str, DDLColumn] = {c.qualified_name.lower(): c for c in columns}
+        self._exact_index: Dict[str, List[DDLColumn]] = {}
+        self._lower_index: Dict[str, List[DDLColumn]] = {}
+        self._camel_index: Dict[str, List[DDLColumn]] = {}
+        self._normalized_index: Dict[str, List[DDLColumn]] = {}
+
+        for column in columns:
+            self._exact_index.setdefault(column.name, []).append(column)
+            self._lower_index.setdefault(column.name.lower(), []).append(column)
+            self._camel_index.setdefault(snake_to_camel(column.name), []).append(column)
+            self._normalized_index.setdefault(normalize_name(column.name), []).append(column)
+
+        self._normalized_keys = list(self._normalized_index.keys())
+
+    @classmethod
+    def from_ddls(cls, ddls: List[str]) -> "FieldMatcher":
+        columns = []
+        for ddl in ddls:
+            columns.extend(parse_ddl_columns(ddl))
+        return cls(columns)
+
+    def match(self, parameter: str, description: str = "") -> FieldMatch:
+        """匹配单个报文字段"""
+        result = FieldMatch(parameter=parameter, description=description)
+        name = leaf_parameter_name(parameter)
+        if not name or not self.columns:
+            return result
+
+        candidates, match_type, score = self._lookup(name)
+        if candidates:
+            result.column = candidates[0]
+            result.candidates = list(candidates)
+            result.match_type = match_type
+            result.score = score
+            # 关联数据源只来自DDL中声明的外键，不按列名相同推测
+            if result.resolved and result.column.references:
+                referenced = self._qualified_index.get(result.column.references.lower())
+                if referenced is not None:
+                    result.related_columns = [referenced]
+        return result
+
+    def match_all(self, fields: List[Tuple[str, str]]) -> List[FieldMatch]:
+        """批量匹配 (字段名, 字段描述) 列表"""
+        return [self.match(parameter, description) for parameter, description in fields]
+
+    def _lookup(self, name: str) -> Tuple[List[DDLColumn], str, float]:
+        if name in self._exact_index:
+            return self._exact_index[name], "exact", 1.0
+
+        if name.lower() in self._lower_index:
+            return self._lower_index[name.lower()], "case", 1.0
+
+        if name in self._camel_index:
+            return self._camel_index[name], "camel", 1.0
+
+        snake_name = camel_to_snake(name)
+        if snake_name in self._lower_index:
+            return self._lower_index[snake_name], "camel", 1.0
+
+        normalized = normalize_name(name)
+        if normalized in self._normalized_index:
+            return self._normalized_index[normalized], "normalized", 1.0
+
+        close = difflib.get_close_matches(normalized, self._normalized_keys, n=1, cutoff=FUZZY_CUTOFF)
+        if close:
+            score = difflib.SequenceMatcher(None, normalized, close[0]).ratio()
+            return self._normalized_index[close[0]], "fuzzy", score
+
+        return [], "", 0.0
+
+
+@traced("field_matcher.match_fields")
+def match_interface_fields(request: InterfaceTaskRequest) -> List[FieldMatch]:
+    """匹配接口请求报文和响应报文中的全部字段"""
+    matcher = FieldMatcher.from_ddls(dedupe_ddls(request.database_ddls))
+    fields = [(f.parameter, f.description) for f in request.request_structure_table]
+    fields += [(f.parameter, f.description) for f in request.response_structure_table]
+    return matcher.match_all(fields)
+
+
+def _describe_match(match: FieldMatch) -> str:
+    """生成关联数据源关系描述"""
+    description = _MATCH_DESCRIPTIONS[match.match_type].format(column=match.column.name)
+
+    if match.column.comment:
+        description += f"；列含义：{match.column.comment}"
+    if match.related_columns:
+        description += f"；通过外键{match.column.name}关联{'、'.join(c.table for c in match.related_columns)}"
+    return description
+
+
+def build_data_source_table(matches: List[FieldMatch]) -> str:
+    """将本地确定数据源的字段构建为数据源表格（与AI返回格式一致的四列表格）"""
+    resolved = [m for m in matches if m.resolved]
+    if not resolved:
+        return ""
+
+    table_md = "| 字段名 | 主数据源 | 关联数据源 | 关联数据源关系描述 |\n"
+    table_md += "|---------|---------|-----------|----------|\n"
+    for match in resolved:
+        related = "、".join(c.qualified_name for c in match.related_columns)
+        table_md += f"| {match.parameter} | {match.column.qualified_name} | {related} | {_describe_match(match)} |\n"
+    return table_md
+
+
+@traced("field_matcher.merge_tables")
+def merge_data_source_tables(local_table: str, ai_response: str) -> str:
+    """将AI返回的表格行追加到本地预填表格之后
+
+    AI答复中不是表格的内容（或本地表格为空时）保持原样。
+    """
+    ai_response = (ai_response or "").strip()
+    if not local_table:
+        return ai_response
+    if not ai_response:
+        return local_table.rstrip("\n")
+
+    ai_lines = ai_response.splitlines()
+    table_lines = [line for line in ai_lines if line.strip().startswith("|")]
+    if len(table_lines) < 2:
+        return local_table + "\n" + ai_response
+
+    # 跳过AI表格的表头和分隔行
+    rows = table_lines[2:] if re.match(r'^\s*\|[\s:|-]+\|\s*$', table_lines[1]) else table_lines[1:]
+    extra_lines = [line for line in ai_lines if line.strip() and not line.strip().startswith("|")]
+
+    merged = local_table + "\n".join(row.strip() for row in rows)
+    if extra_lines:
+        merged += "\n\n" + "\n".join(extra_lines)
+    return merged.rstrip("\n")
@@ -0,0 +1,50 @@
+import asyncio
+from typing import Iterable, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+# 连接池配置：AI服务调用复用同一个客户端，避免每次请求都重新建立TLS连接
+HTTP_POOL_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60.0)
+DEFAULT_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """获取全局共享的异步HTTP客户端"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(timeout=DEFAULT_TIMEOUT, limits=HTTP_POOL_LIMITS)
+    return _client
+
+
+async def warmup_http_pool(urls: Iterable[str] = (), timeout: float = 3.0) -> int:
+    """预热连接池：创建客户端，并可选地预先连接各AI服务主机
+
+    只对各主机发送一次HEAD请求以建立连接，失败不影响启动，返回成功预连接的主机数。
+    """
+    client = get_http_client()
+    origins = set()
+    for url in urls:
+        parsed = urlparse(url)
+        if parsed.scheme in ("http", "https") and parsed.netloc:
+            origins.add(f"{parsed.scheme}://{parsed.netloc}")
+
+    async def connect(origin: str) -> bool:
+        try:
+            await client.head(origin, timeout=timeout)
+            return True
+        except httpx.HTTPError:
+            return False
+
+    results = await asyncio.gather(*(connect(origin) for origin in origins))
+    return sum(results)
+
+
+async def close_http_pool():
+    """关闭全局HTTP客户端"""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
@@ -0,0 +1,174 @@
+"""
+生成接口的幂等键
+
+/tasks/generate-* 请求可带 Idempotency-Key 请求头：同一用户、同一接口、同一个键的第一次执行结果
+在共享状态中保存 PROMPT_IDEMPOTENCY_TTL 秒，重复的请求（网络重试、重复提交）直接返回保存的结果，
+不再重新生成（包括AI调用）；第一次执行尚未完成时，重复的请求等待其结果而不是再执行一次。
+同一个键用于不同的请求内容时返回 422。多worker时需配置共享状态后端（见 shared_state.py）。
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+from typing import Optional
+
+from jose import jwt, JWTError
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+import codec
+from auth import get_token_from_request, SECRET_KEY, ALGORITHM
+from shared_state import shared_state
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+
+# 需要幂等处理的接口路径前缀
+IDEMPOTENT_PATH_PREFIX = "/tasks/generate-"
+
+# 执行结果的保存时间（秒）
+IDEMPOTENCY_TTL = int(os.environ.get("PROMPT_IDEMPOTENCY_TTL", "3600"))
+
+# 执行中标记的有效期（秒），应不短于一次生成的最长耗时；执行的worker异常退出时，到期后允许重新执行
+IDEMPOTENCY_LOCK_TTL = int(os.environ.get("PROMPT_IDEMPOTENCY_LOCK_TTL", "180"))
+
+# 重复请求等待第一次执行结果的最长时间（秒），超时后返回 409
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.environ.get("PROMPT_IDEMPOTENCY_WAIT_TIMEOUT", "120"))
+
+# 等待时查询结果的间隔（秒）
+IDEMPOTENCY_POLL_INTERVAL = 0.2
+
+# 幂等键的最大长度
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# 保存结果时保留的响应头
+_STORED_HEADERS = ("content-type",)
+
+
+def _user_of(scope) -> Optional[str]:
+    """从请求的令牌中取出用户邮箱，未登录或令牌无效时为None（交由接口本身返回401）"""
+    token = get_token_from_request(Request(scope))
+    if not token:
+        return None
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
+
+def _error(status_code: int, detail: str, retry_after: Optional[int] = None) -> Response:
+    headers = {"Retry-After": str(retry_after)} if retry_after else None
+    return JSONResponse(status_code=status_code, content={"detail": detail}, headers=headers)
+
+
+class IdempotencyMiddleware:
+    """生成接口的幂等处理（ASGI），只保存成功（2xx且 success 不为false）的结果"""
+
+    def __init__(self, app, state=None):
+        self.app = app
+        self.state = state or shared_state
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not scope["path"].startswith(IDEMPOTENT_PATH_PREFIX):
+            await self.app(scope, receive, send)
+            return
+        idempotency_key = None
+        for key, value in scope["headers"]:
+            if key == IDEMPOTENCY_HEADER.encode():
+                idempotency_key = value.decode("latin-1").strip()
+                break
+        if not idempotency_key:
+            await self.app(scope, receive, send)
+            return
+        if len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            await _error(400, f"Idempotency-Key 不能超过{IDEMPOTENCY_KEY_MAX_LENGTH}个字符")(scope, receive, send)
+            return
+        user = _user_of(scope)
+        if user is None:
+            await self.app(scope, receive, send)
+            return
+
+        # 读取完整请求体计算指纹，之后把请求体原样交给接口
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+        fingerprint = hashlib.sha256(body).hexdigest()
+        name = hashlib.sha256(f"{user}\n{scope['path']}\n{idempotency_key}".encode("utf-8")).hexdigest()
+        result_key, lock_key = f"idempotency:result:{name}", f"idempotency:lock:{name}"
+
+        response = await self._acquire(result_key, lock_key, fingerprint)
+        if response is not None:
+            await response(scope, receive, send)
+            return
+
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        captured = {"status": 500, "headers": [], "body": []}
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                captured["status"] = message["status"]
+                captured["headers"] = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                captured["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+            await asyncio.to_thread(self._store, result_key, fingerprint, captured)
+        finally:
+            await asyncio.to_thread(self.state.delete, lock_key)
+
+    async def _acquire(self, result_key: str, lock_key: str, fingerprint: str) -> Optional[Response]:
+        """取得执行权时返回None；已有结果时返回重放的响应；等待超时或请求内容不一致时返回错误响应"""
+        waited_until = time.monotonic() + IDEMPOTENCY_WAIT_TIMEOUT
+        while True:
+            # 共享状态后端可能需要网络往返，在线程中访问
+            stored = await asyncio.to_thread(self.state.get, result_key)
+            if stored is not None:
+                record = codec.loads(stored)
+                if record["fingerprint"] != fingerprint:
+                    return _error(422, "Idempotency-Key 已用于内容不同的请求")
+                headers = dict(record["headers"])
+                headers["Idempotent-Replayed"] = "true"
+                return Response(content=record["body"].encode("utf-8"), status_code=record["status"], headers=headers)
+
+            if await asyncio.to_thread(self.state.set_if_absent, lock_key, fingerprint, IDEMPOTENCY_LOCK_TTL):
+                return None
+            running = await asyncio.to_thread(self.state.get, lock_key)
+            if running is not None and running != fingerprint:
+                return _error(422, "Idempotency-Key 已用于内容不同的请求")
+            if time.monotonic() >= waited_until:
+                return _error(409, "相同的请求正在处理中，请稍后重试", retry_after=2)
+            await asyncio.sleep(IDEMPOTENCY_POLL_INTERVAL)
+
+    def _store(self, result_key: str, fingerprint: str, captured: dict):
+        """保存成功的结果；失败的结果（如客户端断开、AI服务不可用）不保存，重试时重新执行"""
+        if not 200 <= captured["status"] < 300:
+            return
+        body = b"".join(captured["body"])
+        try:
+            text = body.decode("utf-8")
+            if codec.loads(body).get("success") is False:
+                return
+        except (UnicodeDecodeError, ValueError, AttributeError):
+            return
+        headers = [
+            (key.decode("latin-1"), value.decode("latin-1"))
+            for key, value in captured["headers"] if key.decode("latin-1").lower() in _STORED_HEADERS
+        ]
+        record = {"fingerprint": fingerprint, "status": captured["status"], "headers": headers, "body": text}
+        self.state.set(result_key, codec.dumps(record, pretty=False).decode("utf-8"), IDEMPOTENCY_TTL)
@@ -0,0 +1,94 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from pydantic import TypeAdapter, ValidationError
+
+from models import InterfaceTaskRequest
+from prompt_sections import SectionBuilder, INTERFACE_SECTIONS
+
+# 收到字段修改后等待的时间（秒），期间的连续输入合并为一次渲染
+PREVIEW_DEBOUNCE = 0.15
+
+# 单条消息的最大字符数，超过时拒绝并关闭连接
+PREVIEW_MAX_MESSAGE_CHARS = 512 * 1024
+
+# 表单可以修改的字段（项目ID在建立连接时确定，生成选项与预览无关）
+PREVIEW_FIELDS = tuple(
+    name for name in InterfaceTaskRequest.model_fields
+    if name not in ("project_id", "use_history", "base_history_id")
+)
+
+# 每个字段单独校验，修改一个字段时不需要校验整个表单
+_FIELD_ADAPTERS = {
+    name: TypeAdapter(InterfaceTaskRequest.model_fields[name].annotation) for name in PREVIEW_FIELDS
+}
+
+
+class PreviewSession:
+    """一个WebSocket连接的预览会话
+
+    保存表单当前状态和上一次渲染的段落；收到字段修改后延迟渲染，只推送内容变化的段落。
+    """
+
+    def __init__(self, send, username: str, project, debounce: float = PREVIEW_DEBOUNCE):
+        self.send = send
+        self.username = username
+        self.project = project
+        self.debounce = debounce
+        self.form: Dict[str, Any] = {
+            name: field.get_default(call_default_factory=True) if not field.is_required() else ""
+            for name, field in InterfaceTaskRequest.model_fields.items() if name in PREVIEW_FIELDS
+        }
+        self.form["project_id"] = project.id
+        self.sequence = 0
+        self._previous: Optional[Dict[str, Dict[str, str]]] = None
+        self._pending: Optional[asyncio.Task] = None
+
+    def apply(self, fields: Dict[str, Any]) -> List[str]:
+        """校验并应用字段修改，返回错误信息（有错误的字段不会被修改）"""
+        errors = []
+        for name, value in fields.items():
+            adapter = _FIELD_ADAPTERS.get(name)
+            if adapter is None:
+                errors.append(f"未知字段: {name}")
+                continue
+            try:
+                self.form[name] = adapter.validate_python(value)
+            except ValidationError as e:
+                errors.append(f"{name}: {e.errors()[0]['msg']}")
+        return errors
+
+    def schedule(self):
+        """延迟渲染：等待期间再次修改会重新计时"""
+        if self._pending is not None and not self._pending.done():
+            self._pending.cancel()
+        self._pending = asyncio.create_task(self._render_later())
+
+    async def _render_later(self):
+        await asyncio.sleep(self.debounce)
+        await self.render()
+
+    def build(self) -> SectionBuilder:
+        """按当前表单状态生成段落，输入未变化的段落复用上一次的结果"""
+        # 字段已逐个校验过，直接构建请求模型
+        request = InterfaceTaskRequest.model_construct(**self.form)
+        return SectionBuilder(request, self.username, self.project, self._previous).render()
+
+    async def render(self):
+        builder = self.build()
+        previous_texts = (self._previous or {}).get("sections", {})
+        changed = {name: text for name, text in builder.texts.items() if previous_texts.get(name) != text}
+        if not changed and self._previous is not None:
+            return
+        self._previous = {"sections": builder.texts, "fingerprints": builder.fingerprints}
+        self.sequence += 1
+        await self.send({"type": "preview", "seq": self.sequence, "sections": changed})
+
+    def close(self):
+        if self._pending is not None:
+            self._pending.cancel()
+
+
+def preview_ready_message() -> Dict[str, Any]:
+    """连接建立后发送给客户端的消息：段落顺序和可修改的字段"""
+    return {"type": "ready", "order": list(INTERFACE_SECTIONS), "fields": list(PREVIEW_FIELDS)}
@@ -0,0 +1,153 @@
+"""
+事件循环阻塞检测（诊断模式）
+
+事件循环定时更新心跳，独立的看门狗线程检查心跳间隔：超过阈值说明有回调占用了事件循环，
+此时抓取事件循环线程的调用栈，按项目代码中的调用位置汇总次数和耗时，供管理员接口查看。
+通过 PROMPT_BLOCKING_DETECTOR=1 开启，阈值由 PROMPT_BLOCKING_THRESHOLD_MS 指定。
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+import traceback
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+# 是否开启阻塞检测
+BLOCKING_DETECTOR_ENABLED = os.environ.get("PROMPT_BLOCKING_DETECTOR", "0") == "1"
+
+# 回调占用事件循环超过该时间（毫秒）即视为阻塞
+BLOCKING_THRESHOLD_MS = float(os.environ.get("PROMPT_BLOCKING_THRESHOLD_MS", "100"))
+
+# 每个调用位置保留的调用栈层数
+BLOCKING_STACK_DEPTH = 20
+
+_PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@dataclass
+class BlockingSite:
+    """一个调用位置的阻塞统计"""
+    location: str
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    last_seen: float = 0.0
+    stack: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            "location": self.location, "count": self.count, "total_ms": round(self.total_ms, 1),
+            "max_ms": round(self.max_ms, 1), "last_seen": self.last_seen, "stack": self.stack
+        }
+
+
+def _is_project_frame(filename: str) -> bool:
+    path = os.path.abspath(filename)
+    return (path.startswith(_PROJECT_DIR + os.sep) and "site-packages" not in path
+            and path != os.path.abspath(__file__))
+
+
+def blocking_location(stack: traceback.StackSummary) -> str:
+    """调用栈中最内层的项目代码位置（没有项目代码时取最内层帧）"""
+    frames = [frame for frame in reversed(stack) if _is_project_frame(frame.filename)] or list(reversed(stack))
+    if not frames:
+        return "<unknown>"
+    frame = frames[0]
+    return f"{os.path.relpath(frame.filename, _PROJECT_DIR)}:{frame.lineno} {frame.name}"
+
+
+class BlockingDetector:
+    """事件循环阻塞检测器"""
+
+    def __init__(self, threshold_ms: float = BLOCKING_THRESHOLD_MS):
+        self.threshold = threshold_ms / 1000
+        # 心跳间隔为阈值的1/4，检测误差不超过阈值的1/4
+        self.beat_interval = self.threshold / 4
+        self.sites: Dict[str, BlockingSite] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._pending: Optional[tuple] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """在事件循环线程中调用"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stop.clear()
+        self._beat()
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _beat(self):
+        # 心跳在事件循环中执行，本次与上次心跳的间隔即为上一次阻塞的准确时长
+        now = time.monotonic()
+        blocked = now - self._last_beat - self.beat_interval
+        pending = self._pending
+        if pending is not None and pending[0] == self._last_beat and blocked >= self.threshold:
+            self._record(pending[1], blocked)
+        self._pending = None
+        self._last_beat = now
+        self._handle = self._loop.call_later(self.beat_interval, self._beat)
+
+    def _capture(self) -> traceback.StackSummary:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return traceback.StackSummary()
+        return traceback.extract_stack(frame, limit=BLOCKING_STACK_DEPTH)
+
+    def _watch(self):
+        # 看门狗只负责在阻塞期间抓取调用栈（阻塞结束后栈已不存在），时长由下一次心跳计算
+        while not self._stop.wait(self.beat_interval):
+            last_beat = self._last_beat
+            if self._pending is None and time.monotonic() - last_beat - self.beat_interval >= self.threshold:
+                self._pending = (last_beat, self._capture())
+
+    def _record(self, stack: traceback.StackSummary, blocked: float):
+        location = blocking_location(stack)
+        with self._lock:
+            site = self.sites.setdefault(location, BlockingSite(location))
+            site.count += 1
+            site.total_ms += blocked * 1000
+            site.max_ms = max(site.max_ms, blocked * 1000)
+            site.last_seen = time.time()
+            site.stack = [line.rstrip("\n") for line in stack.format()]
+        print(f"⚠️  事件循环被阻塞 {blocked * 1000:.0f}ms: {location}")
+
+    def report(self) -> dict:
+        with self._lock:
+            sites = sorted(self.sites.values(), key=lambda site: -site.total_ms)
+            return {
+                "enabled": self.running,
+                "threshold_ms": self.threshold * 1000,
+                "sites": [site.to_dict() for site in sites]
+            }
+
+    def reset(self):
+        with self._lock:
+            self.sites.clear()
+
+
+# 创建全局阻塞检测实例
+blocking_detector = BlockingDetector()
@@ -1,20 +1,94 @@
 from fastapi import FastAPI, Request, Depends, HTTPException, status
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 import uvicorn
+import asyncio
 import os
+import time
 from datetime import datetime
 
-from routers.auth_router import router as auth_router
-from routers.menu_router import router as menu_router
-from routers.project_router import router as project_router
-from routers.task_router import router as task_router
-from routers.profile_router import router as profile_router
+# 尽早导入：PROMPT_TRACEMALLOC 开启时从这里开始追踪内存分配
+from memory_diagnostics import memory_tracker
+from routers import auth_router, menu_router, project_router, task_router, profile_router, admin_router
+from storage import storage
+from http_pool import warmup_http_pool, close_http_pool
+from assets import AssetStaticFiles
+from templating import templates, precompile_templates
+from codec import FastJSONResponse
+from prompt_history import prompt_history
+from admission import AdmissionMiddleware, admission_controller
+from idempotency import IdempotencyMiddleware
+from loop_watchdog import blocking_detector, BLOCKING_DETECTOR_ENABLED
+from tracing import TracingMiddleware
+from shared_state import shared_state
+from blob_store import blob_store
+from spec_index import similar_spec_finder
+from usage_accounting import usage_ledger
+from speculation import speculative_enhancer
+
+# 进程启动时间：由启动器通过环境变量 PROMPT_LAUNCH_TIME 传入，未传入时以模块导入时间为准
+LAUNCH_TIME = float(os.environ.get("PROMPT_LAUNCH_TIME") or time.time())
+
+# 启动指标：就绪耗时、首个请求完成耗时（均从进程启动算起，单位秒）
+startup_metrics = {
+    "ready": False,
+    "ready_seconds": None,
+    "first_request_seconds": None,
+    "templates_compiled": 0,
+    "warmed_hosts": 0
+}
+
+# 是否在启动时预先连接已配置的AI服务主机
+WARMUP_AI_HOSTS = os.environ.get("PROMPT_WARMUP_AI_HOSTS", "0") == "1"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：在开始接收请求前完成预热"""
+    startup_metrics["templates_compiled"] = precompile_templates()
+    storage.migrate_storage_format()
+    storage.warmup()
+    prompt_history.collect_garbage()
+    ai_urls = storage.get_ai_api_urls() if WARMUP_AI_HOSTS else []
+    startup_metrics["warmed_hosts"] = await warmup_http_pool(ai_urls)
+    admission_controller.start()
+    if BLOCKING_DETECTOR_ENABLED:
+        blocking_detector.start()
+    memory_tracker.start_sampling()
+
+    startup_metrics["ready"] = True
+    startup_metrics["ready_seconds"] = round(time.time() - LAUNCH_TIME, 3)
+    print(f"✅ 应用预热完成，启动耗时 {startup_metrics['ready_seconds']}s")
+
+    yield
+
+    startup_metrics["ready"] = False
+    await admission_controller.stop()
+    blocking_detector.stop()
+    await memory_tracker.stop_sampling()
+    await speculative_enhancer.stop()
+    await asyncio.to_thread(usage_ledger.flush)
+    await close_http_pool()
+
+# 内存诊断记录大小的进程内存储和缓存
+memory_tracker.register_store("shared_state", lambda: {"entries": shared_state.size()})
+memory_tracker.register_store("storage_cache", lambda: {"entries": storage.cache_stats()["entries"]})
+memory_tracker.register_store("blob_cache", blob_store.cache_info)
+memory_tracker.register_store("history_blob_cache", prompt_history.blobs.cache_info)
+memory_tracker.register_store("fragment_cache", lambda: {"entries": len(templates.env.fragment_cache)})
+memory_tracker.register_store("spec_index", similar_spec_finder.stats)
+memory_tracker.register_store("admission_decisions", lambda: {"entries": len(admission_controller.decisions)})
+memory_tracker.register_store("blocking_sites", lambda: {"entries": len(blocking_detector.sites)})
+memory_tracker.register_store("usage_queue", lambda: {"entries": usage_ledger.pending})
+memory_tracker.register_store("speculation_tasks", lambda: {"entries": speculative_enhancer.stats()["running"]})
 
 # 创建应用
-app = FastAPI(title="Prompt Generator", description="A FastAPI app for generating prompts")
+app = FastAPI(
+    title="Prompt Generator",
+    description="A FastAPI app for generating prompts",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse  # JSON接口默认使用orjson序列化（未安装时回退为标准库）
+)
 
 # 配置CORS
 app.add_middleware(
@@ -25,18 +99,45 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 挂载静态文件
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# 生成接口的幂等键：重复提交和网络重试直接返回第一次的结果，并发的重复请求等待第一次执行完成
+app.add_middleware(IdempotencyMiddleware)
+
+# 准入控制：事件循环延迟过高或并发达到上限时拒绝/排队低优先级请求
+app.add_middleware(AdmissionMiddleware)
+
+# 链路追踪：按 PROMPT_TRACE_SAMPLE_RATE 采样，被拒绝的请求同样记录
+app.add_middleware(TracingMiddleware)
 
-# 配置模板
-templates = Jinja2Templates(directory="templates")
+# 挂载静态文件（带指纹的资源长期缓存并返回预压缩版本）
+app.mount("/static", AssetStaticFiles(directory="static"), name="static")
 
 # 包含路由
-app.include_router(auth_router, prefix="/auth", tags=["auth"])
-app.include_router(menu_router, prefix="/menu", tags=["menu"])
-app.include_router(project_router, prefix="/projects", tags=["projects"])
-app.include_router(task_router, prefix="/tasks", tags=["tasks"])
-app.include_router(profile_router, prefix="/profile", tags=["profile"])
+app.include_router(auth_router.router, prefix="/auth", tags=["auth"])
+app.include_router(menu_router.router, prefix="/menu", tags=["menu"])
+app.include_router(project_router.router, prefix="/projects", tags=["projects"])
+app.include_router(task_router.router, prefix="/tasks", tags=["tasks"])
+app.include_router(profile_router.router, prefix="/profile", tags=["profile"])
+app.include_router(admin_router.router, prefix="/admin", tags=["admin"])
+
+@app.middleware("http")
+async def record_first_request(request: Request, call_next):
+    """记录冷启动到首个请求完成的耗时"""
+    response = await call_next(request)
+    if startup_metrics["first_request_seconds"] is None:
+        startup_metrics["first_request_seconds"] = round(time.time() - LAUNCH_TIME, 3)
+        print(f"⏱️  首个请求完成，冷启动耗时 {startup_metrics['first_request_seconds']}s")
+    return response
+
+@app.get("/healthz")
+async def liveness():
+    """存活检查"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readiness():
+    """就绪检查：预热完成后才返回200"""
+    status_code = status.HTTP_200_OK if startup_metrics["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE
+    return JSONResponse(status_code=status_code, content={"pid": os.getpid(), **startup_metrics})
 
 @app.get("/", response_class=HTMLResponse)
 async def root():
@@ -69,4 +170,6 @@ async def single_translate_page():
     return RedirectResponse(url="/projects", status_code=302)
 
 if __name__ == "__main__":
+    # 开发模式下开启模板自动重载
+    os.environ.setdefault("PROMPT_TEMPLATE_AUTO_RELOAD", "1")
     uvicorn.run("main:app", host="0.0.0.0", port=4397, reload=True)
@@ -0,0 +1,172 @@
+"""
+内存诊断
+
+基于tracemalloc统计分配最多的代码位置、在两个时间点之间做快照对比，
+并定时记录各进程内存储和缓存（验证码等共享状态、存储缓存、blob缓存等）的大小，
+用于发现长时间运行时的内存增长并定位到具体的代码和存储。
+"""
+
+import os
+import time
+import asyncio
+import threading
+import tracemalloc
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, List, Optional
+
+# 启动时开启tracemalloc并保存的调用栈层数，0为不开启（可通过管理员接口随时开启）
+TRACEMALLOC_FRAMES = int(os.environ.get("PROMPT_TRACEMALLOC", "0"))
+
+# 存储大小的采样间隔（秒）
+MEMORY_SAMPLE_INTERVAL = float(os.environ.get("PROMPT_MEMORY_SAMPLE_INTERVAL", "60"))
+
+# 保留的采样点数量（默认间隔下为6小时）
+MEMORY_SAMPLE_HISTORY = 360
+
+# 最多保留的快照数量，超过时丢弃最早的
+MEMORY_MAX_SNAPSHOTS = 5
+
+# 统计时忽略的分配位置（tracemalloc自身、模块导入）
+_IGNORED_TRACES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def _process_rss() -> Optional[int]:
+    """当前进程常驻内存（字节），非Linux平台返回None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _format_statistic(stat, with_traceback: bool = False) -> dict:
+    frame = stat.traceback[0]
+    result = {"location": f"{frame.filename}:{frame.lineno}", "size_bytes": stat.size, "count": stat.count}
+    if with_traceback:
+        result["traceback"] = [f"{f.filename}:{f.lineno}" for f in stat.traceback]
+    return result
+
+
+class MemoryTracker:
+    """tracemalloc统计、快照对比与命名存储的大小记录"""
+
+    def __init__(self):
+        self._stores: Dict[str, Callable[[], dict]] = {}
+        self.samples: Deque[dict] = deque(maxlen=MEMORY_SAMPLE_HISTORY)
+        self._snapshots: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # tracemalloc控制
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start_tracing(self, frames: int = 1):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(max(1, frames))
+
+    def stop_tracing(self):
+        tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+
+    def _require_tracing(self):
+        if not tracemalloc.is_tracing():
+            raise ValueError("tracemalloc未开启")
+
+    # 命名存储
+    def register_store(self, name: str, measure: Callable[[], dict]):
+        """登记一个进程内存储，measure返回其大小（如条目数、字符数）"""
+        self._stores[name] = measure
+
+    def store_sizes(self) -> Dict[str, dict]:
+        sizes = {}
+        for name, measure in self._stores.items():
+            try:
+                sizes[name] = measure()
+            except Exception as e:
+                sizes[name] = {"error": str(e)}
+        return sizes
+
+    def sample(self) -> dict:
+        """记录一个采样点：进程内存、tracemalloc统计的内存和各存储的大小"""
+        point = {"time": time.time(), "rss_bytes": _process_rss(), "stores": self.store_sizes()}
+        if tracemalloc.is_tracing():
+            point["traced_bytes"], point["traced_peak_bytes"] = tracemalloc.get_traced_memory()
+        self.samples.append(point)
+        return point
+
+    def start_sampling(self, interval: float = MEMORY_SAMPLE_INTERVAL):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(interval))
+
+    async def stop_sampling(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self, interval: float):
+        while True:
+            # 远程共享状态后端的大小查询需要网络往返，在线程中采样
+            await asyncio.to_thread(self.sample)
+            await asyncio.sleep(interval)
+
+    # 分配统计与快照
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        self._require_tracing()
+        return tracemalloc.take_snapshot().filter_traces(_IGNORED_TRACES)
+
+    def top_allocations(self, limit: int = 20, group_by: str = "lineno") -> List[dict]:
+        """当前存活内存最多的分配位置，group_by 为 lineno / filename / traceback"""
+        statistics = self._snapshot().statistics(group_by)
+        return [_format_statistic(stat, group_by == "traceback") for stat in statistics[:limit]]
+
+    def take_snapshot(self, name: str) -> dict:
+        snapshot = self._snapshot()
+        with self._lock:
+            self._snapshots.pop(name, None)
+            self._snapshots[name] = (time.time(), snapshot)
+            while len(self._snapshots) > MEMORY_MAX_SNAPSHOTS:
+                self._snapshots.popitem(last=False)
+        return {"name": name, "traced_bytes": sum(stat.size for stat in snapshot.statistics("filename"))}
+
+    def snapshot_names(self) -> List[dict]:
+        with self._lock:
+            return [{"name": name, "time": taken_at} for name, (taken_at, _) in self._snapshots.items()]
+
+    def diff(self, before: str, after: str, limit: int = 20) -> dict:
+        """两个快照之间内存变化最多的分配位置"""
+        with self._lock:
+            if before not in self._snapshots or after not in self._snapshots:
+                raise KeyError(before if before not in self._snapshots else after)
+            (before_time, old), (after_time, new) = self._snapshots[before], self._snapshots[after]
+        statistics = new.compare_to(old, "lineno")
+        return {
+            "seconds": round(after_time - before_time, 3),
+            "size_diff_bytes": sum(stat.size_diff for stat in statistics),
+            "top": [
+                {**_format_statistic(stat), "size_diff_bytes": stat.size_diff, "count_diff": stat.count_diff}
+                for stat in statistics[:limit]
+            ]
+        }
+
+    def report(self, limit: int = 20) -> dict:
+        result = {"tracing": self.tracing, "rss_bytes": _process_rss(), "stores": self.store_sizes()}
+        if self.tracing:
+            result["traced_bytes"], result["traced_peak_bytes"] = tracemalloc.get_traced_memory()
+            result["top"] = self.top_allocations(limit)
+        return result
+
+
+# 创建全局内存诊断实例
+memory_tracker = MemoryTracker()
+
+if TRACEMALLOC_FRAMES > 0:
+    memory_tracker.start_tracing(TRACEMALLOC_FRAMES)
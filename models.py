@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from typing import Optional, List, Literal
 from datetime import datetime
 
 class User(BaseModel):
@@ -57,6 +57,17 @@ class Project(BaseModel):
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
+class ProjectSummary(BaseModel):
+    """项目空间摘要模型（列表页使用，不包含大文本字段）"""
+    id: int
+    user_id: int
+    name: str
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    standards_count: int = 0
+    content_size: int = 0  # 规范和示例字段的总字符数
+    preview: str = ""  # 开发规范的简短预览
+
 class ProjectCreate(BaseModel):
     """项目创建模型"""
     name: str
@@ -110,12 +121,42 @@ class InterfaceTaskRequest(BaseModel):
     response_structure_table: List[ResponseField] = []
     database_ddls: List[str] = []
     project_id: int
+    use_history: bool = True  # 相同请求直接返回历史结果，传False时强制重新生成
+    base_history_id: Optional[int] = None  # 增量生成的基准记录，未指定时取同一接口最近一次生成
 
 class InterfaceTaskResponse(BaseModel):
     """接口类任务响应模型"""
     success: bool
     message: str
     prompt_content: Optional[str] = None
+    history_id: Optional[int] = None
+    from_history: bool = False
+    similar_specs: List[dict] = []  # 相似的历史接口：history_id、title、similarity
+    reused_sections: List[str] = []  # 与上一次生成相比输入未变化、直接复用的段落
+    skipped_sections: List[str] = []  # 超出时间预算、未能完成的AI段落
+
+# 可以分配给AI服务的增强任务：字段数据源分析、业务逻辑推测
+AITask = Literal["data_sources", "business_logic"]
+
+class AIProvider(BaseModel):
+    """备用AI服务（默认配置之外登记的服务，按优先级和实际表现参与调度）"""
+    id: int
+    name: str
+    api_key: str
+    api_url: str
+    model_name: str
+    priority: int = 1  # 数值越小越优先，默认配置的优先级为0
+    tasks: List[AITask] = ["data_sources", "business_logic"]  # 只用于哪些增强任务（如便宜的模型只做业务逻辑）
+    created_at: Optional[datetime] = None
+
+class AIProviderCreate(BaseModel):
+    """备用AI服务创建模型"""
+    name: str
+    api_key: str
+    api_url: str
+    model_name: str
+    priority: int = 1
+    tasks: List[AITask] = ["data_sources", "business_logic"]
 
 class AIConfig(BaseModel):
     """AI配置模型"""
@@ -124,6 +165,7 @@ class AIConfig(BaseModel):
     api_key: str
     api_url: str
     model_name: str = "gpt-3.5-turbo"
+    providers: List[AIProvider] = []
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
@@ -152,4 +194,5 @@ class AITestResponse(BaseModel):
 class BugFixTaskRequest(BaseModel):
     """故障类任务请求模型"""
     bash_info: str
-    project_id: int
\ No newline at end of file
+    project_id: int
+    use_history: bool = True
\ No newline at end of file
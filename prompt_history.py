@@ -0,0 +1,303 @@
+import os
+import re
+import time
+import base64
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import codec
+from blob_store import BlobStore
+from tracing import traced
+
+# 生成历史的存储目录：索引保存在SQLite中，输入、输出和AI段落以blob形式去重压缩保存
+HISTORY_DIR = os.path.join("data", "history")
+
+# 保留策略：每个项目最多保留的条数、最长保留天数（0表示不限制）
+HISTORY_MAX_ENTRIES = int(os.environ.get("PROMPT_HISTORY_MAX_ENTRIES", "200"))
+HISTORY_MAX_AGE_DAYS = int(os.environ.get("PROMPT_HISTORY_MAX_AGE_DAYS", "90"))
+
+# 分页查询每页默认/最大条数
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_PAGE_SIZE = 100
+
+# 历史记录的生成类型
+KIND_INTERFACE = "interface"
+KIND_AI_ENHANCED = "ai_enhanced"
+KIND_BUG_FIX = "bug_fix"
+
+# Prompt头部的日期行，命中历史时替换为当天日期
+_DATE_LINE_PATTERN = re.compile(r"^(\s*- sinci: )\d{4}/\d{2}/\d{2}", re.MULTILINE)
+
+
+def request_fingerprint(kind: str, payload: Dict[str, Any], **context: Any) -> str:
+    """计算请求指纹：生成类型、规范化后的请求内容以及影响输出的上下文（项目规范、模型等）"""
+    canonical = codec.dumps({"kind": kind, "payload": payload, "context": context}, pretty=False)
+    return hashlib.sha256(canonical).hexdigest()
+
+
+def refresh_prompt_date(prompt: str) -> str:
+    """把历史Prompt中的生成日期更新为当天"""
+    today = datetime.now().strftime("%Y/%m/%d")
+    return _DATE_LINE_PATTERN.sub(lambda m: m.group(1) + today, prompt, count=1)
+
+
+def encode_cursor(created_at: float, entry_id: int) -> str:
+    """分页游标：上一页最后一条记录的（创建时间, ID）"""
+    return base64.urlsafe_b64encode(f"{created_at!r}:{entry_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """解析分页游标，格式错误时抛出ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, entry_id = raw.split(":", 1)
+        return float(created_at), int(entry_id)
+    except Exception:
+        raise ValueError("无效的分页游标")
+
+
+class PromptHistory:
+    """按项目保存的Prompt生成历史
+
+    相同请求（指纹一致）只保存一条记录，再次请求时直接返回历史结果并累计命中次数；
+    文本内容按哈希去重压缩，多条记录共用相同的输入、段落只保存一份。
+    """
+
+    def __init__(self, history_dir: str = HISTORY_DIR,
+                 max_entries: int = HISTORY_MAX_ENTRIES, max_age_days: int = HISTORY_MAX_AGE_DAYS):
+        self.history_dir = history_dir
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        os.makedirs(history_dir, exist_ok=True)
+        self.db_path = os.path.join(history_dir, "history.db")
+        # 与项目使用的blob目录分开，项目blob清理不会误删历史内容
+        self.blobs = BlobStore(os.path.join(history_dir, "blobs"), cache_chars=2 * 1024 * 1024)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS prompt_history ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, project_id INTEGER NOT NULL, user_id INTEGER NOT NULL, "
+                "kind TEXT NOT NULL, fingerprint TEXT NOT NULL, title TEXT NOT NULL, "
+                "input_blob TEXT NOT NULL, output_blob TEXT NOT NULL, sections TEXT NOT NULL, "
+                "output_length INTEGER NOT NULL, hits INTEGER NOT NULL DEFAULT 0, "
+                "created_at REAL NOT NULL, last_used_at REAL NOT NULL, fingerprints TEXT NOT NULL DEFAULT '{}', "
+                "version INTEGER NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(prompt_history)")}
+            if "fingerprints" not in columns:
+                # 早期创建的表没有段落指纹
+                conn.execute("ALTER TABLE prompt_history ADD COLUMN fingerprints TEXT NOT NULL DEFAULT '{}'")
+            if "version" not in columns:
+                # 早期创建的表没有版本号，已有记录按ID编号
+                conn.execute("ALTER TABLE prompt_history ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+                conn.execute("UPDATE prompt_history SET version = id")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_history_project_time "
+                "ON prompt_history (project_id, created_at DESC, id DESC)"
+            )
+            conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_history_fingerprint "
+                "ON prompt_history (project_id, fingerprint)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_history_user_version "
+                "ON prompt_history (user_id, kind, version)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @traced("history.find")
+    def find(self, project_id: int, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """查找相同请求的历史结果，命中时累计命中次数并返回完整记录"""
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT * FROM prompt_history WHERE project_id = ? AND fingerprint = ?",
+            (project_id, fingerprint)
+        ).fetchone()
+        if row is None:
+            return None
+        entry = self._row_to_dict(row)
+        try:
+            entry["prompt_content"] = self.blobs.get(entry.pop("output_blob"))
+        except FileNotFoundError:
+            # 内容已被清理，视为未命中
+            conn.execute("DELETE FROM prompt_history WHERE id = ?", (entry["id"],))
+            return None
+        conn.execute(
+            "UPDATE prompt_history SET hits = hits + 1, last_used_at = ? WHERE id = ?",
+            (time.time(), entry["id"])
+        )
+        entry["hits"] += 1
+        return entry
+
+    @traced("history.record")
+    def record(self, project_id: int, user_id: int, kind: str, fingerprint: str, title: str,
+               payload: Dict[str, Any], prompt_content: str, sections: Optional[Dict[str, str]] = None,
+               fingerprints: Optional[Dict[str, str]] = None) -> int:
+        """保存一次生成结果，返回记录ID（相同指纹的记录会被覆盖，ID不变）
+
+        sections为各段落内容，fingerprints为各段落输入的指纹，用于下次增量生成时判断哪些段落可以复用。
+        每次写入（包括覆盖）都分配新的版本号，相似接口索引据此重新加载变化的记录。
+        """
+        input_ref = self.blobs.put(codec.dumps(payload).decode("utf-8"))
+        output_ref = self.blobs.put(prompt_content)
+        section_refs = {name: self.blobs.put(text)["$blob"] for name, text in (sections or {}).items() if text}
+        now = time.time()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 写事务互斥，版本号在所有worker间单调递增
+            version = conn.execute("SELECT COALESCE(MAX(version), 0) + 1 FROM prompt_history").fetchone()[0]
+            conn.execute(
+                "INSERT INTO prompt_history (project_id, user_id, kind, fingerprint, title, input_blob, output_blob, "
+                "sections, output_length, created_at, last_used_at, fingerprints, version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (project_id, fingerprint) DO UPDATE SET title = excluded.title, "
+                "input_blob = excluded.input_blob, output_blob = excluded.output_blob, sections = excluded.sections, "
+                "output_length = excluded.output_length, created_at = excluded.created_at, "
+                "last_used_at = excluded.last_used_at, fingerprints = excluded.fingerprints, version = excluded.version",
+                (project_id, user_id, kind, fingerprint, title[:100], input_ref["$blob"], output_ref["$blob"],
+                 codec.dumps(section_refs, pretty=False).decode("utf-8"), len(prompt_content), now, now,
+                 codec.dumps(fingerprints or {}, pretty=False).decode("utf-8"), version)
+            )
+            # 并发写入同一指纹时走更新分支，lastrowid不可靠，按指纹重新查询
+            entry_id = conn.execute(
+                "SELECT id FROM prompt_history WHERE project_id = ? AND fingerprint = ?", (project_id, fingerprint)
+            ).fetchone()[0]
+            self._apply_retention(conn, project_id)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return entry_id
+
+    def _apply_retention(self, conn: sqlite3.Connection, project_id: Optional[int] = None):
+        """按保留策略删除过期和超出条数的记录（blob由 collect_garbage 统一清理）"""
+        if self.max_age_days:
+            cutoff = time.time() - self.max_age_days * 86400
+            conn.execute("DELETE FROM prompt_history WHERE last_used_at < ?", (cutoff,))
+        if self.max_entries and project_id is not None:
+            conn.execute(
+                "DELETE FROM prompt_history WHERE project_id = ? AND id NOT IN ("
+                "SELECT id FROM prompt_history WHERE project_id = ? ORDER BY created_at DESC, id DESC LIMIT ?)",
+                (project_id, project_id, self.max_entries)
+            )
+
+    def list_entries(self, project_id: int, cursor: Optional[str] = None, limit: int = HISTORY_PAGE_SIZE,
+                     kind: Optional[str] = None) -> Dict[str, Any]:
+        """按时间倒序分页列出项目的历史记录（不含正文），返回条目和下一页游标"""
+        limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+        sql = "SELECT * FROM prompt_history WHERE project_id = ?"
+        params: List[Any] = [project_id]
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+        if cursor:
+            created_at, entry_id = decode_cursor(cursor)
+            sql += " AND (created_at, id) < (?, ?)"
+            params += [created_at, entry_id]
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        conn = self._connect()
+        rows = conn.execute(sql, params).fetchall()
+        items = [self._row_to_dict(row) for row in rows[:limit]]
+        for item in items:
+            del item["input_blob"], item["output_blob"]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = encode_cursor(last["created_at"], last["id"])
+        return {"items": items, "next_cursor": next_cursor}
+
+    def latest_id(self, project_id: int, kind: str, title: str) -> Optional[int]:
+        """同一项目中同类型、同标题最近一次生成的记录ID"""
+        row = self._connect().execute(
+            "SELECT id FROM prompt_history WHERE project_id = ? AND kind = ? AND title = ? "
+            "ORDER BY created_at DESC, id DESC LIMIT 1",
+            (project_id, kind, title[:100])
+        ).fetchone()
+        return row[0] if row else None
+
+    def get(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        """读取一条历史记录的完整内容：请求输入、生成结果、各段落内容及指纹"""
+        conn = self._connect()
+        row = conn.execute("SELECT * FROM prompt_history WHERE id = ?", (entry_id,)).fetchone()
+        if row is None:
+            return None
+        entry = self._row_to_dict(row)
+        entry["prompt_content"] = self.blobs.get(entry.pop("output_blob"))
+        entry["input"] = codec.loads(self.blobs.get(entry.pop("input_blob")))
+        entry["sections"] = {name: self.blobs.get(blob_hash) for name, blob_hash in entry["sections"].items()}
+        return entry
+
+    def iter_entries(self, user_id: int, kind: str, after_version: int = 0):
+        """按版本号顺序遍历用户某一类型、在after_version之后新增或覆盖的历史记录（含请求输入和AI段落）"""
+        rows = self._connect().execute(
+            "SELECT * FROM prompt_history WHERE user_id = ? AND kind = ? AND version > ? ORDER BY version",
+            (user_id, kind, after_version)
+        ).fetchall()
+        for row in rows:
+            entry = self._row_to_dict(row)
+            try:
+                entry["input"] = codec.loads(self.blobs.get(entry["input_blob"]))
+                entry["sections"] = {name: self.blobs.get(blob_hash) for name, blob_hash in entry["sections"].items()}
+            except FileNotFoundError:
+                continue
+            yield entry
+
+    def existing_ids(self, entry_ids: List[int]) -> set:
+        """返回仍然存在的记录ID"""
+        if not entry_ids:
+            return set()
+        placeholders = ",".join("?" * len(entry_ids))
+        rows = self._connect().execute(
+            f"SELECT id FROM prompt_history WHERE id IN ({placeholders})", list(entry_ids)
+        ).fetchall()
+        return {row[0] for row in rows}
+
+    def delete_project(self, project_id: int) -> int:
+        """删除项目的全部历史记录，返回删除条数"""
+        cursor = self._connect().execute("DELETE FROM prompt_history WHERE project_id = ?", (project_id,))
+        return cursor.rowcount
+
+    def collect_garbage(self) -> Dict[str, int]:
+        """执行保留策略并清理不再被引用的blob"""
+        conn = self._connect()
+        before = conn.execute("SELECT COUNT(*) FROM prompt_history").fetchone()[0]
+        self._apply_retention(conn)
+        entries = conn.execute("SELECT COUNT(*) FROM prompt_history").fetchone()[0]
+        referenced = set()
+        for input_blob, output_blob, sections in conn.execute(
+                "SELECT input_blob, output_blob, sections FROM prompt_history"):
+            referenced.add(input_blob)
+            referenced.add(output_blob)
+            referenced.update(codec.loads(sections).values())
+        return {
+            "entries": entries,
+            "entries_expired": before - entries,
+            "blobs_removed": self.blobs.collect_garbage(referenced)
+        }
+
+    @staticmethod
+    def _row_to_dict(row: tuple) -> Dict[str, Any]:
+        columns = ("id", "project_id", "user_id", "kind", "fingerprint", "title", "input_blob", "output_blob",
+                   "sections", "output_length", "hits", "created_at", "last_used_at", "fingerprints", "version")
+        entry = dict(zip(columns, row))
+        entry["sections"] = codec.loads(entry["sections"])
+        entry["fingerprints"] = codec.loads(entry["fingerprints"])
+        return entry
+
+
+# 创建全局历史记录实例
+prompt_history = PromptHistory()
@@ -0,0 +1,155 @@
+import hashlib
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import codec
+from models import InterfaceTaskRequest
+from tracing import traced
+
+# 接口类Prompt的段落，按顺序拼接即为完整Prompt
+INTERFACE_SECTIONS = (
+    "header", "core_task", "business_logic", "requirements", "api",
+    "request_structure", "response_structure", "ddl", "data_sources"
+)
+
+DATA_SOURCES_HEADING = "\n\n# 接口参数数据源\n"
+
+
+def section_fingerprint(*inputs: Any) -> str:
+    """段落输入的指纹，输入不变时段落内容不变"""
+    return hashlib.sha256(codec.dumps(inputs, pretty=False)).hexdigest()
+
+
+def _structure_table(fields) -> str:
+    if not fields:
+        return ""
+    table_md = "| 参数字段 | 字段描述 |\n"
+    table_md += "|---------|---------|\n"
+    for field in fields:
+        table_md += f"| {field.parameter} | {field.description} |\n"
+    return table_md
+
+
+def _render_header(request: InterfaceTaskRequest, username: str, project) -> str:
+    current_date = datetime.now().strftime("%Y/%m/%d")
+    return f"- sinci: {current_date}\n- author: {username}\n\n"
+
+
+def _render_core_task(request: InterfaceTaskRequest, username: str, project) -> str:
+    return (f"# 核心任务\n\n{request.interface_name}是一个{request.interface_description}的接口，"
+            f"请你按要求完成{request.interface_name}的开发，接口将存放至（待填充）。\n\n")
+
+
+def _render_business_logic(request: InterfaceTaskRequest, username: str, project) -> str:
+    return render_business_logic(request.business_logic_description)
+
+
+def _render_requirements(request: InterfaceTaskRequest, username: str, project) -> str:
+    return f"# 要求\n\n{project.development_standard}\n\n"
+
+
+def _render_api(request: InterfaceTaskRequest, username: str, project) -> str:
+    return f"# 接口API\n\n## 接口路径\n\n```http\n{request.interface_path}\n```\n\n"
+
+
+def _render_request_structure(request: InterfaceTaskRequest, username: str, project) -> str:
+    request_params_md = "".join(f"- {param}\n" for param in request.request_params)
+    return (f"## 请求体结构\n\n{_structure_table(request.request_structure_table)}\n\n"
+            f"## 请求体示例\n\n{request_params_md}\n\n```json\n{request.request_body_example}\n```\n\n")
+
+
+def _render_response_structure(request: InterfaceTaskRequest, username: str, project) -> str:
+    return (f"## 响应体结构\n\n{_structure_table(request.response_structure_table)}\n\n"
+            f"## 响应体示例\n\n```json\n{request.response_body_example}\n```\n\n")
+
+
+def _render_ddl(request: InterfaceTaskRequest, username: str, project) -> str:
+    ddl_content = "".join(f"```sql\n{ddl}\n```\n\n" for ddl in request.database_ddls)
+    return f"# 关联数据库信息\n\n{ddl_content}"
+
+
+def render_business_logic(text: str) -> str:
+    return f"# 业务逻辑\n\n{text}\n\n"
+
+
+def render_data_sources(table: str) -> str:
+    return DATA_SOURCES_HEADING + table.rstrip("\n") if table else ""
+
+
+# 各段落的渲染函数及其依赖的输入
+_SECTION_RENDERERS: Dict[str, Tuple[Callable, Callable]] = {
+    "header": (_render_header, lambda r, u, p: (datetime.now().strftime("%Y/%m/%d"), u)),
+    "core_task": (_render_core_task, lambda r, u, p: (r.interface_name, r.interface_description)),
+    "business_logic": (_render_business_logic, lambda r, u, p: (r.business_logic_description,)),
+    "requirements": (_render_requirements, lambda r, u, p: (p.development_standard,)),
+    "api": (_render_api, lambda r, u, p: (r.interface_path,)),
+    "request_structure": (_render_request_structure, lambda r, u, p: (
+        r.dict(include={"request_structure_table", "request_params", "request_body_example"}),)),
+    "response_structure": (_render_response_structure, lambda r, u, p: (
+        r.dict(include={"response_structure_table", "response_body_example"}),)),
+    "ddl": (_render_ddl, lambda r, u, p: (r.database_ddls,)),
+}
+
+
+def business_logic_ai_inputs(request: InterfaceTaskRequest, ai_config) -> tuple:
+    """AI推测业务逻辑依赖的输入：接口信息、报文结构与样例、模型"""
+    return ("ai", ai_config.api_url, ai_config.model_name, request.dict(include={
+        "interface_name", "interface_description", "business_logic_description", "request_params",
+        "request_structure_table", "response_structure_table", "request_body_example", "response_body_example"
+    }))
+
+
+def data_sources_ai_inputs(request: InterfaceTaskRequest, ai_config) -> tuple:
+    """AI分析字段数据源依赖的输入：接口信息、DDL、报文结构、模型"""
+    return ("ai", ai_config.api_url, ai_config.model_name, request.dict(include={
+        "interface_name", "interface_description", "business_logic_description", "database_ddls",
+        "request_structure_table", "response_structure_table"
+    }))
+
+
+def data_sources_context_inputs(request: InterfaceTaskRequest, ai_config) -> tuple:
+    """字段级复用数据源的前提：DDL和模型不变（报文字段逐个比较）"""
+    return (ai_config.api_url, ai_config.model_name, request.database_ddls)
+
+
+class SectionBuilder:
+    """按段落生成接口类Prompt
+
+    提供上一次生成的段落内容和指纹时，输入未变化的段落直接复用，只重新生成变化的段落。
+    """
+
+    def __init__(self, request: InterfaceTaskRequest, username: str, project, previous: Optional[Dict] = None):
+        self.request = request
+        self.username = username
+        self.project = project
+        self.previous_texts: Dict[str, str] = (previous or {}).get("sections", {})
+        self.previous_fingerprints: Dict[str, str] = (previous or {}).get("fingerprints", {})
+        self.texts: Dict[str, str] = {}
+        self.fingerprints: Dict[str, str] = {}
+        self.reused: List[str] = []
+
+    @traced("prompt.render_sections")
+    def render(self) -> "SectionBuilder":
+        """生成全部非AI段落"""
+        for name, (renderer, inputs) in _SECTION_RENDERERS.items():
+            fingerprint = section_fingerprint(name, *inputs(self.request, self.username, self.project))
+            if not self.reuse(name, fingerprint):
+                self.set(name, renderer(self.request, self.username, self.project), fingerprint)
+        return self
+
+    def reuse(self, name: str, fingerprint: str) -> bool:
+        """指纹与上次一致时复用上次的段落内容"""
+        if self.previous_fingerprints.get(name) == fingerprint and name in self.previous_texts:
+            self.set(name, self.previous_texts[name], fingerprint)
+            self.reused.append(name)
+            return True
+        return False
+
+    def set(self, name: str, text: str, fingerprint: str):
+        if name in self.reused:
+            self.reused.remove(name)
+        self.texts[name] = text
+        self.fingerprints[name] = fingerprint
+
+    def assemble(self) -> str:
+        return "".join(self.texts.get(name, "") for name in INTERFACE_SECTIONS)
@@ -0,0 +1,141 @@
+"""
+AI服务调度
+
+用户可以在默认AI配置之外登记备用服务。每次调用按评分从低到高依次尝试：
+评分 = 延迟滑动平均 ×（1 + 错误率惩罚）×（1 + 优先级加权），失败时自动切换到下一个服务；
+连续失败的服务暂停调度一段时间，暂停结束后重新参与。统计保存在各worker进程内存中。
+"""
+
+import os
+import time
+import hashlib
+import threading
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+
+from models import AIProvider
+
+AI_TASKS = ("data_sources", "business_logic")
+
+# 延迟和错误率的指数滑动平均系数，越大越看重最近的调用
+PROVIDER_EWMA_ALPHA = 0.3
+
+# 错误率对评分的放大系数：错误率50%的服务评分为无错误时的3倍
+PROVIDER_ERROR_PENALTY = 4.0
+
+# 每一级优先级对评分的放大系数
+PROVIDER_PRIORITY_WEIGHT = 0.5
+
+# 连续失败该次数后暂停调度
+PROVIDER_FAILURE_THRESHOLD = int(os.environ.get("PROMPT_PROVIDER_FAILURE_THRESHOLD", "3"))
+
+# 暂停调度的时长（秒）
+PROVIDER_COOLDOWN_SECONDS = float(os.environ.get("PROMPT_PROVIDER_COOLDOWN_SECONDS", "30"))
+
+# 所有服务都没有观测数据时假定的延迟（毫秒）
+PROVIDER_DEFAULT_LATENCY_MS = 1000.0
+
+
+@dataclass
+class ProviderStats:
+    """一个AI服务的调用统计"""
+    calls: int = 0
+    failures: int = 0
+    latency_ms: Optional[float] = None
+    error_rate: float = 0.0
+    consecutive_failures: int = 0
+    cooldown_until: float = 0.0
+    last_error: Optional[str] = None
+    last_used: Optional[float] = None
+
+    @property
+    def cooling_down(self) -> bool:
+        return self.cooldown_until > time.time()
+
+
+def ai_providers(ai_config) -> List[AIProvider]:
+    """用户可用的全部AI服务：默认配置（优先级0，承担全部任务）+ 备用服务"""
+    primary = AIProvider.model_construct(
+        id=0, name="默认", api_key=ai_config.api_key, api_url=ai_config.api_url,
+        model_name=ai_config.model_name, priority=0, tasks=list(AI_TASKS), created_at=ai_config.created_at
+    )
+    return [primary] + list(ai_config.providers or [])
+
+
+def provider_key(provider: AIProvider) -> str:
+    """按地址、模型和密钥区分服务：同一密钥的限流在所有用户间共享"""
+    raw = f"{provider.api_url}\n{provider.model_name}\n{provider.api_key}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class ProviderBalancer:
+    """按观测到的延迟和错误率为AI服务排序，并记录每次调用的结果"""
+
+    def __init__(self):
+        self._stats: Dict[str, ProviderStats] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, provider: AIProvider) -> ProviderStats:
+        return self._stats.setdefault(provider_key(provider), ProviderStats())
+
+    def rank(self, providers: List[AIProvider], task: str) -> List[AIProvider]:
+        """返回承担该任务的服务的尝试顺序；暂停中的服务排在最后，作为其他服务全部失败时的兜底"""
+        candidates = [p for p in providers if task in p.tasks]
+        with self._lock:
+            stats = {id(p): self._get(p) for p in candidates}
+            known = [s.latency_ms for s in stats.values() if s.latency_ms is not None]
+            # 没有观测数据的服务按已知最快的延迟估计，让新登记的服务有机会被尝试
+            baseline = min(known) if known else PROVIDER_DEFAULT_LATENCY_MS
+
+            def score(provider: AIProvider) -> float:
+                s = stats[id(provider)]
+                latency = s.latency_ms if s.latency_ms is not None else baseline
+                return (latency * (1 + PROVIDER_ERROR_PENALTY * s.error_rate)
+                        * (1 + PROVIDER_PRIORITY_WEIGHT * max(provider.priority, 0)))
+
+            available = sorted((p for p in candidates if not stats[id(p)].cooling_down), key=score)
+            cooling = sorted((p for p in candidates if stats[id(p)].cooling_down),
+                             key=lambda p: stats[id(p)].cooldown_until)
+        return available + cooling
+
+    def record(self, provider: AIProvider, latency: float, ok: bool, error: Optional[str] = None):
+        """记录一次调用的耗时（秒）和结果"""
+        with self._lock:
+            s = self._get(provider)
+            s.calls += 1
+            s.last_used = time.time()
+            s.error_rate += PROVIDER_EWMA_ALPHA * ((0.0 if ok else 1.0) - s.error_rate)
+            if ok:
+                latency_ms = latency * 1000
+                s.latency_ms = latency_ms if s.latency_ms is None else \
+                    s.latency_ms + PROVIDER_EWMA_ALPHA * (latency_ms - s.latency_ms)
+                s.consecutive_failures = 0
+                s.cooldown_until = 0.0
+            else:
+                s.failures += 1
+                s.consecutive_failures += 1
+                s.last_error = error
+                if s.consecutive_failures >= PROVIDER_FAILURE_THRESHOLD:
+                    s.cooldown_until = time.time() + PROVIDER_COOLDOWN_SECONDS
+                    print(f"⚠️  AI服务 {provider.name}（{provider.model_name}）连续失败 "
+                          f"{s.consecutive_failures} 次，暂停调度 {PROVIDER_COOLDOWN_SECONDS:g} 秒")
+
+    def stats(self, providers: List[AIProvider]) -> List[dict]:
+        """各服务的统计，用于个人中心展示（不包含密钥）"""
+        with self._lock:
+            result = []
+            for provider in providers:
+                s = self._get(provider)
+                result.append({
+                    "id": provider.id, "name": provider.name, "api_url": provider.api_url,
+                    "model_name": provider.model_name, "priority": provider.priority, "tasks": list(provider.tasks),
+                    "cooling_down": s.cooling_down,
+                    **{k: v for k, v in asdict(s).items() if k != "cooldown_until"},
+                    "latency_ms": round(s.latency_ms, 1) if s.latency_ms is not None else None,
+                    "error_rate": round(s.error_rate, 3)
+                })
+            return result
+
+
+# 创建全局AI服务调度实例
+provider_balancer = ProviderBalancer()
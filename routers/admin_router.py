@@ -0,0 +1,86 @@
+import asyncio
+from fastapi import APIRouter, HTTPException, status, Depends
+from auth import require_admin
+from admission import admission_controller
+from loop_watchdog import blocking_detector
+from memory_diagnostics import memory_tracker
+from usage_accounting import usage_ledger
+from speculation import speculative_enhancer
+
+router = APIRouter()
+
+@router.get("/admission")
+async def get_admission_stats(token_data: dict = Depends(require_admin)):
+    """准入控制状态：事件循环延迟、各路由类别的并发与拒绝统计、最近的拒绝记录"""
+    return admission_controller.stats()
+
+@router.get("/usage")
+async def get_usage_summary(days: int = 30, token_data: dict = Depends(require_admin)):
+    """全部用户的AI调用用量汇总"""
+    return await asyncio.to_thread(usage_ledger.summary, None, days)
+
+@router.get("/speculation")
+async def get_speculation_stats(token_data: dict = Depends(require_admin)):
+    """预先增强统计：进行中的任务数、启动/限流/取消次数，点击时命中已完成或进行中结果的次数"""
+    return speculative_enhancer.stats()
+
+@router.get("/blocking")
+async def get_blocking_calls(token_data: dict = Depends(require_admin)):
+    """事件循环阻塞统计：按调用位置汇总的次数、耗时和最近一次的调用栈（需开启 PROMPT_BLOCKING_DETECTOR）"""
+    return blocking_detector.report()
+
+@router.post("/blocking/reset")
+async def reset_blocking_calls(token_data: dict = Depends(require_admin)):
+    """清空阻塞统计"""
+    blocking_detector.reset()
+    return {"success": True}
+
+@router.get("/memory")
+async def get_memory_report(limit: int = 20, token_data: dict = Depends(require_admin)):
+    """内存概况：进程内存、各存储大小，开启tracemalloc时附带分配最多的代码位置"""
+    return await asyncio.to_thread(memory_tracker.report, limit)
+
+@router.post("/memory/tracing")
+async def set_memory_tracing(enabled: bool = True, frames: int = 1, token_data: dict = Depends(require_admin)):
+    """开启或关闭tracemalloc（frames为每次分配保存的调用栈层数）"""
+    if enabled:
+        memory_tracker.start_tracing(frames)
+    else:
+        memory_tracker.stop_tracing()
+    return {"success": True, "tracing": memory_tracker.tracing}
+
+@router.get("/memory/top")
+async def get_top_allocations(limit: int = 20, group_by: str = "lineno", token_data: dict = Depends(require_admin)):
+    """当前存活内存最多的分配位置，group_by 为 lineno / filename / traceback"""
+    try:
+        if group_by not in ("lineno", "filename", "traceback"):
+            raise ValueError(f"不支持的分组方式: {group_by}")
+        return await asyncio.to_thread(memory_tracker.top_allocations, limit, group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.get("/memory/samples")
+async def get_memory_samples(token_data: dict = Depends(require_admin)):
+    """定时记录的进程内存和各存储大小"""
+    return list(memory_tracker.samples)
+
+@router.get("/memory/snapshots")
+async def list_memory_snapshots(token_data: dict = Depends(require_admin)):
+    """已保存的快照"""
+    return memory_tracker.snapshot_names()
+
+@router.post("/memory/snapshots/{name}")
+async def take_memory_snapshot(name: str, token_data: dict = Depends(require_admin)):
+    """保存一个快照，用于与之后的快照对比"""
+    try:
+        return await asyncio.to_thread(memory_tracker.take_snapshot, name)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.get("/memory/diff")
+async def diff_memory_snapshots(before: str, after: str, limit: int = 20, token_data: dict = Depends(require_admin)):
+    """两个快照之间内存变化最多的分配位置"""
+    try:
+        return await asyncio.to_thread(memory_tracker.diff, before, after, limit)
+    except KeyError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"快照不存在: {e.args[0]}")
@@ -1,6 +1,6 @@
+import asyncio
 from fastapi import APIRouter, HTTPException, status, Request, Depends, Form
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from datetime import timedelta
 from typing import Optional
 
@@ -10,9 +10,17 @@ from auth import (
     generate_captcha, verify_captcha, ACCESS_TOKEN_EXPIRE_MINUTES
 )
 from storage import storage
+from shared_state import check_rate_limit, is_rate_limited
+from templating import templates
+
+# 验证码和限流计数保存在共享状态中（SQLite/Redis后端需要磁盘或网络往返），在线程中访问，不阻塞事件循环
+
+# 限流配置：每个IP每分钟最多获取的验证码数，每个IP+邮箱每5分钟最多的登录失败次数
+CAPTCHA_RATE_LIMIT = 30
+LOGIN_RATE_LIMIT = 10
+LOGIN_RATE_WINDOW_SECONDS = 300
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
 
 @router.post("/register", response_class=HTMLResponse)
 async def register(
@@ -34,7 +42,7 @@ async def register(
             })
 
         # 验证验证码
-        if not verify_captcha(captcha_id, captcha):
+        if not await asyncio.to_thread(verify_captcha, captcha_id, captcha):
             return templates.TemplateResponse("register.html", {
                 "request": request,
                 "error": "验证码错误"
@@ -79,9 +87,18 @@ async def login(
 ):
     """用户登录"""
     try:
+        # 限制登录失败频率
+        rate_limit_key = f"login:{request.client.host if request.client else 'unknown'}:{email}"
+        if await asyncio.to_thread(is_rate_limited, rate_limit_key, LOGIN_RATE_LIMIT, LOGIN_RATE_WINDOW_SECONDS):
+            return templates.TemplateResponse("login.html", {
+                "request": request,
+                "error": "登录失败次数过多，请稍后再试"
+            })
+
         # 认证用户
         user = authenticate_user(email, password)
         if not user:
+            await asyncio.to_thread(check_rate_limit, rate_limit_key, LOGIN_RATE_LIMIT, LOGIN_RATE_WINDOW_SECONDS)
             return templates.TemplateResponse("login.html", {
                 "request": request,
                 "error": "邮箱或密码错误"
@@ -125,7 +142,11 @@ async def logout():
     return response
 
 @router.get("/captcha", response_model=CaptchaResponse)
-async def get_captcha():
+async def get_captcha(request: Request):
     """获取验证码"""
-    captcha_id, captcha_image = generate_captcha()
+    client_ip = request.client.host if request.client else "unknown"
+    if not await asyncio.to_thread(check_rate_limit, f"captcha:{client_ip}", CAPTCHA_RATE_LIMIT, 60):
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="验证码请求过于频繁，请稍后再试")
+
+    captcha_id, captcha_image = await asyncio.to_thread(generate_captcha)
     return CaptchaResponse(captcha_id=captcha_id, captcha_image=captcha_image)
@@ -1,10 +1,9 @@
 from fastapi import APIRouter, HTTPException, status, Request, Depends
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
 from auth import get_current_user
+from templating import templates
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
 
 @router.get("/", response_class=HTMLResponse)
 async def get_menu(request: Request, token_data: dict = Depends(get_current_user)):
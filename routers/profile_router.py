@@ -1,16 +1,27 @@
 from fastapi import APIRouter, HTTPException, status, Request, Depends
-from fastapi.responses import HTMLResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import HTMLResponse
 from typing import Optional
 import httpx
 import json
+import time
+import asyncio
 
-from models import AIConfigCreate, AIConfigUpdate, AITestRequest, AITestResponse, ApiResponse
+from models import AIConfigCreate, AIConfigUpdate, AITestRequest, AITestResponse, ApiResponse, AIProviderCreate
 from auth import get_current_user
 from storage import storage
+from ai_adapters import AIServiceError, complete_chat
+from templating import templates
+from codec import FastJSONResponse
+from provider_balancer import provider_balancer, ai_providers
+from usage_accounting import usage_ledger, UsageRecord, OUTCOME_OK, OUTCOME_ERROR
+
+# 个人中心用量面板显示的天数
+USAGE_PANEL_DAYS = 14
+
+# 连接测试在用量统计中的类型
+USAGE_TASK_CONNECTION_TEST = "connection_test"
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
 
 @router.get("/", response_class=HTMLResponse)
 async def get_profile(request: Request, token_data: dict = Depends(get_current_user)):
@@ -27,7 +38,10 @@ async def get_profile(request: Request, token_data: dict = Depends(get_current_u
         return templates.TemplateResponse("profile.html", {
             "request": request,
             "user": user,
-            "ai_config": ai_config
+            "ai_config": ai_config,
+            "provider_stats": provider_balancer.stats(ai_providers(ai_config)) if ai_config else [],
+            # 汇总查询访问SQLite，在线程中执行，不阻塞事件循环
+            "usage": await asyncio.to_thread(usage_ledger.summary, user.id, USAGE_PANEL_DAYS)
         })
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
@@ -42,7 +56,7 @@ async def save_ai_config(
         # 获取当前用户信息
         user = storage.get_user_by_email(token_data.email)
         if not user:
-            return JSONResponse(
+            return FastJSONResponse(
                 status_code=status.HTTP_404_NOT_FOUND,
                 content={"success": False, "message": "用户不存在"}
             )
@@ -54,11 +68,11 @@ async def save_ai_config(
             # 更新配置
             updated_config = storage.update_ai_config(user.id, AIConfigUpdate(**config_data.dict()))
             if updated_config:
-                return JSONResponse(
+                return FastJSONResponse(
                     content={"success": True, "message": "AI配置更新成功"}
                 )
             else:
-                return JSONResponse(
+                return FastJSONResponse(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     content={"success": False, "message": "更新配置失败"}
                 )
@@ -66,17 +80,17 @@ async def save_ai_config(
             # 创建新配置
             try:
                 new_config = storage.create_ai_config(user.id, config_data)
-                return JSONResponse(
+                return FastJSONResponse(
                     content={"success": True, "message": "AI配置保存成功"}
                 )
             except ValueError as e:
-                return JSONResponse(
+                return FastJSONResponse(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     content={"success": False, "message": str(e)}
                 )
 
     except Exception as e:
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"success": False, "message": f"保存配置失败: {str(e)}"}
         )
@@ -107,77 +121,38 @@ async def test_ai_connection(
             )
 
         # 调用AI API进行测试
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            headers = {
-                "Authorization": f"Bearer {ai_config.api_key}",
-                "Content-Type": "application/json"
-            }
-
-            payload = {
-                "model": ai_config.model_name,
-                "messages": [
-                    {"role": "user", "content": test_request.message}
-                ],
-                "max_tokens": 1000,
-                "temperature": 0.7
-            }
-
-            try:
-                response = await client.post(
-                    ai_config.api_url,
-                    headers=headers,
-                    json=payload
-                )
-
-                if response.status_code == 200:
-                    result = response.json()
-                    # 提取AI回复内容
-                    if "choices" in result and len(result["choices"]) > 0:
-                        ai_response = result["choices"][0]["message"]["content"]
-                        return AITestResponse(
-                            success=True,
-                            message="AI连接测试成功",
-                            ai_response=ai_response
-                        )
-                    else:
-                        return AITestResponse(
-                            success=False,
-                            message="AI响应格式异常",
-                            ai_response=None
-                        )
-                else:
-                    error_detail = response.text
-                    try:
-                        error_json = response.json()
-                        if "error" in error_json:
-                            error_detail = error_json["error"].get("message", error_detail)
-                    except:
-                        pass
-
-                    return AITestResponse(
-                        success=False,
-                        message=f"AI服务请求失败 ({response.status_code}): {error_detail}",
-                        ai_response=None
-                    )
-
-            except httpx.TimeoutException:
-                return AITestResponse(
-                    success=False,
-                    message="请求超时，请检查网络连接或API地址",
-                    ai_response=None
-                )
-            except httpx.ConnectError:
-                return AITestResponse(
-                    success=False,
-                    message="无法连接到AI服务，请检查API地址",
-                    ai_response=None
-                )
-            except Exception as e:
-                return AITestResponse(
-                    success=False,
-                    message=f"网络请求异常: {str(e)}",
-                    ai_response=None
-                )
+        started = time.perf_counter()
+        try:
+            completion = await complete_chat(ai_config, test_request.message, max_tokens=1000,
+                                             timeout=httpx.Timeout(30.0))
+            usage_ledger.record(UsageRecord(
+                user_id=user.id, project_id=None, provider="默认", model=ai_config.model_name,
+                task=USAGE_TASK_CONNECTION_TEST, outcome=OUTCOME_OK,
+                prompt_tokens=completion.prompt_tokens or 0, completion_tokens=completion.completion_tokens or 0,
+                latency_ms=round((time.perf_counter() - started) * 1000, 1),
+                estimated=completion.prompt_tokens is None
+            ))
+            return AITestResponse(
+                success=True,
+                message="AI连接测试成功",
+                ai_response=completion.content
+            )
+        except AIServiceError as e:
+            usage_ledger.record(UsageRecord(
+                user_id=user.id, project_id=None, provider="默认", model=ai_config.model_name,
+                task=USAGE_TASK_CONNECTION_TEST, outcome=OUTCOME_ERROR
+            ))
+            return AITestResponse(
+                success=False,
+                message=str(e),
+                ai_response=None
+            )
+        except Exception as e:
+            return AITestResponse(
+                success=False,
+                message=f"网络请求异常: {str(e)}",
+                ai_response=None
+            )
 
     except Exception as e:
         return AITestResponse(
@@ -193,24 +168,138 @@ async def delete_ai_config(token_data: dict = Depends(get_current_user)):
         # 获取当前用户信息
         user = storage.get_user_by_email(token_data.email)
         if not user:
-            return JSONResponse(
+            return FastJSONResponse(
                 status_code=status.HTTP_404_NOT_FOUND,
                 content={"success": False, "message": "用户不存在"}
             )
 
         # 删除AI配置
         if storage.delete_ai_config(user.id):
-            return JSONResponse(
+            return FastJSONResponse(
                 content={"success": True, "message": "AI配置删除成功"}
             )
         else:
-            return JSONResponse(
+            return FastJSONResponse(
                 status_code=status.HTTP_404_NOT_FOUND,
                 content={"success": False, "message": "AI配置不存在"}
             )
 
     except Exception as e:
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             content={"success": False, "message": f"删除配置失败: {str(e)}"}
         )
+
+@router.get("/providers")
+async def list_ai_providers(token_data: dict = Depends(get_current_user)):
+    """AI服务列表及其调用统计（当前worker进程内的延迟、错误率、暂停状态）"""
+    try:
+        user = storage.get_user_by_email(token_data.email)
+        if not user:
+            return FastJSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"success": False, "message": "用户不存在"}
+            )
+
+        ai_config = storage.get_ai_config_by_user_id(user.id)
+        providers = provider_balancer.stats(ai_providers(ai_config)) if ai_config else []
+        return FastJSONResponse(content={"success": True, "providers": providers})
+
+    except Exception as e:
+        return FastJSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"success": False, "message": f"获取AI服务失败: {str(e)}"}
+        )
+
+@router.post("/providers")
+async def add_ai_provider(
+    provider_data: AIProviderCreate,
+    token_data: dict = Depends(get_current_user)
+):
+    """登记备用AI服务"""
+    try:
+        user = storage.get_user_by_email(token_data.email)
+        if not user:
+            return FastJSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"success": False, "message": "用户不存在"}
+            )
+
+        try:
+            provider = storage.add_ai_provider(user.id, provider_data)
+        except ValueError as e:
+            return FastJSONResponse(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                content={"success": False, "message": str(e)}
+            )
+        return FastJSONResponse(content={"success": True, "message": "备用AI服务添加成功", "id": provider.id})
+
+    except Exception as e:
+        return FastJSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"success": False, "message": f"添加AI服务失败: {str(e)}"}
+        )
+
+@router.delete("/providers/{provider_id}")
+async def delete_ai_provider(provider_id: int, token_data: dict = Depends(get_current_user)):
+    """删除备用AI服务"""
+    try:
+        user = storage.get_user_by_email(token_data.email)
+        if not user:
+            return FastJSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"success": False, "message": "用户不存在"}
+            )
+
+        if storage.delete_ai_provider(user.id, provider_id):
+            return FastJSONResponse(content={"success": True, "message": "备用AI服务删除成功"})
+        return FastJSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"success": False, "message": "AI服务不存在"}
+        )
+
+    except Exception as e:
+        return FastJSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"success": False, "message": f"删除AI服务失败: {str(e)}"}
+        )
+
+@router.get("/usage")
+async def get_usage_summary(days: int = 30, token_data: dict = Depends(get_current_user)):
+    """AI调用用量汇总：按天、按模型（含延迟分位数）、按项目、按增强类型"""
+    try:
+        user = storage.get_user_by_email(token_data.email)
+        if not user:
+            return FastJSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"success": False, "message": "用户不存在"}
+            )
+
+        summary = await asyncio.to_thread(usage_ledger.summary, user.id, days)
+        return FastJSONResponse(content={"success": True, **summary})
+
+    except Exception as e:
+        return FastJSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"success": False, "message": f"获取用量统计失败: {str(e)}"}
+        )
+
+@router.get("/usage/calls")
+async def get_usage_calls(limit: int = 50, token_data: dict = Depends(get_current_user)):
+    """最近的AI调用明细"""
+    try:
+        user = storage.get_user_by_email(token_data.email)
+        if not user:
+            return FastJSONResponse(
+                status_code=status.HTTP_404_NOT_FOUND,
+                content={"success": False, "message": "用户不存在"}
+            )
+
+        calls = await asyncio.to_thread(usage_ledger.recent_calls, user.id, limit)
+        return FastJSONResponse(content={"success": True, "calls": calls})
+
+    except Exception as e:
+        return FastJSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"success": False, "message": f"获取调用明细失败: {str(e)}"}
+        )
@@ -1,13 +1,13 @@
 from fastapi import APIRouter, HTTPException, status, Request, Depends, Form
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from typing import Optional
 from auth import get_current_user
 from storage import storage
 from models import Project, ProjectCreate, ProjectUpdate, ApiResponse, User         
+from templating import templates
+from prompt_history import prompt_history
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
 
 @router.get("/", response_class=HTMLResponse)
 async def get_projects_page(request: Request, token_data: dict = Depends(get_current_user)):
@@ -18,9 +18,9 @@ async def get_projects_page(request: Request, token_data: dict = Depends(get_cur
         if not user:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="用户不存在")
 
-        # 获取用户的项目列表
-        projects = storage.get_projects_by_user_id(user.id)
-        can_create = storage.can_create_project(user.id)
+        # 列表页只需要项目摘要，完整内容在编辑时通过 /projects/{id} 按需加载
+        projects = storage.get_project_summaries_by_user_id(user.id)
+        can_create = len(projects) < 5
 
         return templates.TemplateResponse("projects.html", {
             "request": request,
@@ -236,6 +236,9 @@ async def delete_project(project_id: int, token_data: dict = Depends(get_current
         if not success:
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="删除项目失败")
 
+        # 项目删除后其生成历史不再可访问，一并删除（blob在启动清理时回收）
+        prompt_history.delete_project(project_id)
+
         return RedirectResponse(url="/projects", status_code=302)
 
     except Exception as e:
@@ -1,17 +1,53 @@
-from fastapi import APIRouter, HTTPException, status, Request, Depends
+from fastapi import APIRouter, HTTPException, status, Request, Depends, WebSocket, WebSocketDisconnect
 from fastapi.responses import HTMLResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
-from auth import get_current_user
+from auth import get_current_user, verify_token
 from storage import storage
+from http_pool import DEFAULT_TIMEOUT
+from ai_adapters import AIServiceError, AICompletion, adapter_for, complete_chat
+from usage_accounting import (
+    usage_ledger, usage_scope, current_usage_scope, UsageRecord,
+    OUTCOME_OK, OUTCOME_ERROR, OUTCOME_CANCELLED
+)
 from models import InterfaceTaskRequest, InterfaceTaskResponse, RequestParamField, ResponseField, BugFixTaskRequest
+from field_matcher import (
+    match_interface_fields, build_data_source_table, merge_data_source_tables,
+    dedupe_ddls, strip_unused_columns, normalize_name, leaf_parameter_name
+)
+from token_budget import PromptBudget, PromptSection, BudgetReport, COMPLETION_TOKENS, count_tokens
+from templating import templates
+from live_preview import PreviewSession, preview_ready_message, PREVIEW_MAX_MESSAGE_CHARS
+import codec
+from tracing import span, traced, inject_trace_headers
+from provider_balancer import provider_balancer, ai_providers
+from speculation import speculative_enhancer, SPECULATION_ENABLED
+from deadline import Deadline, ClientDisconnected, current_deadline, deadline_scope, gather_within_deadline, AI_ENHANCE_BUDGET
+from prompt_history import (
+    prompt_history, request_fingerprint, refresh_prompt_date,
+    KIND_INTERFACE, KIND_AI_ENHANCED, KIND_BUG_FIX, HISTORY_PAGE_SIZE
+)
+from spec_index import (
+    similar_spec_finder, reuse_data_source_rows, build_reused_table, parse_data_source_rows, SimilarSpec
+)
+from prompt_sections import (
+    SectionBuilder, section_fingerprint, render_business_logic, render_data_sources,
+    business_logic_ai_inputs, data_sources_ai_inputs, data_sources_context_inputs
+)
 import json
 import httpx
 from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional, Tuple
 import logging
+import asyncio
+import time
 import os
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
+
+# 不影响生成结果、不参与历史指纹计算的请求字段
+HISTORY_EXCLUDED_FIELDS = {"use_history", "base_history_id"}
+
+# AI生成的段落名称（超出时间预算未完成时在响应消息中提示）
+AI_SECTION_LABELS = {"data_sources": "接口参数数据源", "business_logic": "业务逻辑"}
 
 @router.get("/{project_id}/interface", response_class=HTMLResponse)
 async def get_interface_task_form(project_id: int, request: Request, token_data: dict = Depends(get_current_user)):
@@ -36,6 +72,51 @@ async def get_interface_task_form(project_id: int, request: Request, token_data:
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
+@router.websocket("/{project_id}/interface/preview")
+async def interface_preview(websocket: WebSocket, project_id: int):
+    """接口类任务表单的实时预览
+
+    用户和项目在建立连接时校验一次；之后客户端只发送修改过的字段 {"type": "patch", "fields": {...}}，
+    服务端合并短时间内的连续修改后重新渲染，只推送内容变化的段落。
+    """
+    try:
+        token_data = verify_token(websocket)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    user = storage.get_user_by_email(token_data.email)
+    project = storage.get_project_by_id(project_id)
+    if not user or not project or project.user_id != user.id:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    session = PreviewSession(websocket.send_json, user.username, project)
+    await websocket.send_json(preview_ready_message())
+    try:
+        while True:
+            message = await websocket.receive_text()
+            if len(message) > PREVIEW_MAX_MESSAGE_CHARS:
+                await websocket.close(code=status.WS_1009_MESSAGE_TOO_BIG)
+                break
+            try:
+                data = codec.loads(message)
+            except codec.JSONDecodeError:
+                await websocket.send_json({"type": "error", "errors": ["消息不是有效的JSON"]})
+                continue
+            if not isinstance(data, dict) or data.get("type") != "patch" or not isinstance(data.get("fields"), dict):
+                await websocket.send_json({"type": "error", "errors": ["不支持的消息"]})
+                continue
+            errors = session.apply(data["fields"])
+            if errors:
+                await websocket.send_json({"type": "error", "errors": errors})
+            session.schedule()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.close()
+
 @router.get("/{project_id}/mechanism", response_class=HTMLResponse)
 async def get_mechanism_task_form(project_id: int, request: Request, token_data: dict = Depends(get_current_user)):
     """获取机制类任务表单页面"""
@@ -111,6 +192,114 @@ async def get_fault_task_form(project_id: int, request: Request, token_data: dic
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
+@router.get("/{project_id}/history")
+async def list_prompt_history(project_id: int, cursor: Optional[str] = None, limit: int = HISTORY_PAGE_SIZE,
+                              kind: Optional[str] = None, token_data: dict = Depends(get_current_user)):
+    """按时间倒序分页列出项目的Prompt生成历史，next_cursor为空表示没有更多"""
+    try:
+        user = storage.get_user_by_email(token_data.email)
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="用户不存在")
+
+        project = storage.get_project_by_id(project_id)
+        if not project:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="项目不存在")
+
+        if project.user_id != user.id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="无权访问此项目")
+
+        page = prompt_history.list_entries(project_id, cursor=cursor, limit=limit, kind=kind)
+        return {
+            "items": [_format_history_entry(entry) for entry in page["items"]],
+            "next_cursor": page["next_cursor"]
+        }
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+@router.get("/history/{entry_id}")
+async def get_prompt_history_entry(entry_id: int, token_data: dict = Depends(get_current_user)):
+    """获取一条历史记录的完整内容（请求输入、生成结果、AI段落）"""
+    try:
+        user = storage.get_user_by_email(token_data.email)
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="用户不存在")
+
+        entry = prompt_history.get(entry_id)
+        if not entry:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="历史记录不存在")
+
+        project = storage.get_project_by_id(entry["project_id"])
+        if not project or project.user_id != user.id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="无权访问此历史记录")
+
+        return _format_history_entry(entry)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+
+def _format_history_entry(entry: dict) -> dict:
+    """历史记录的时间戳转换为ISO格式，去掉内部使用的指纹"""
+    entry = dict(entry)
+    entry.pop("fingerprint", None)
+    entry.pop("fingerprints", None)
+    for field in ("created_at", "last_used_at"):
+        entry[field] = datetime.fromtimestamp(entry[field]).isoformat()
+    return entry
+
+def _previous_sections(project, kind: str, request: InterfaceTaskRequest) -> Optional[dict]:
+    """上一次生成的段落：优先使用请求指定的历史记录，否则取同一接口最近一次同类生成"""
+    if not request.use_history:
+        return None
+    try:
+        entry_id = request.base_history_id or prompt_history.latest_id(project.id, kind, request.interface_name)
+        entry = prompt_history.get(entry_id) if entry_id else None
+        if entry and entry["project_id"] == project.id:
+            return entry
+    except Exception as e:
+        print(f"读取上次生成的段落失败: {str(e)}")
+    return None
+
+def _previous_field_rows(previous: Optional[dict], request: InterfaceTaskRequest, ai_config) -> Optional[SimilarSpec]:
+    """DDL和模型未变化时，上次已分析过且字段描述未修改的字段数据源可以直接复用"""
+    if not previous or "data_sources" not in previous["sections"]:
+        return None
+    context = section_fingerprint(*data_sources_context_inputs(request, ai_config))
+    if previous["fingerprints"].get("data_sources_context") != context:
+        return None
+    previous_input = previous["input"]
+    previous_fields = {(f["parameter"], f["description"]) for f in
+                       previous_input.get("request_structure_table", []) + previous_input.get("response_structure_table", [])}
+    unchanged = {f.parameter for f in request.request_structure_table + request.response_structure_table
+                 if (f.parameter, f.description) in previous_fields}
+    rows = {parameter: row for parameter, row in parse_data_source_rows(previous["sections"]["data_sources"]).items()
+            if parameter in unchanged}
+    return SimilarSpec(previous["id"], previous["title"], 1.0, rows) if rows else None
+
+def _history_response(entry: dict, message: str) -> InterfaceTaskResponse:
+    """用历史记录构建响应，生成日期更新为当天"""
+    return InterfaceTaskResponse(
+        success=True,
+        message=f"{message}（来自历史记录）",
+        prompt_content=refresh_prompt_date(entry["prompt_content"]),
+        history_id=entry["id"],
+        from_history=True
+    )
+
+def _record_history(project, kind: str, fingerprint: str, title: str, payload: dict,
+                    prompt_content: str, builder: SectionBuilder = None) -> Optional[int]:
+    """保存生成结果（及各段落内容和指纹）到历史记录，保存失败不影响本次生成"""
+    try:
+        return prompt_history.record(project.id, project.user_id, kind, fingerprint, title, payload, prompt_content,
+                                     builder.texts if builder else None, builder.fingerprints if builder else None)
+    except Exception as e:
+        print(f"保存Prompt历史失败: {str(e)}")
+        return None
+
 @router.post("/generate-interface-prompt", response_model=InterfaceTaskResponse)
 async def generate_interface_prompt(request: InterfaceTaskRequest, token_data: dict = Depends(get_current_user)):
     """生成接口类任务的Prompt"""
@@ -126,13 +315,28 @@ async def generate_interface_prompt(request: InterfaceTaskRequest, token_data: d
         if project.user_id != user.id:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="无权访问此项目")
 
-        # 生成Prompt内容
-        prompt_content = generate_interface_prompt_content(request, user.username, project)
+        # 相同请求直接返回历史结果
+        payload = request.dict(exclude=HISTORY_EXCLUDED_FIELDS)
+        fingerprint = request_fingerprint(KIND_INTERFACE, payload, author=user.username,
+                                          standard=project.development_standard)
+        if request.use_history:
+            entry = prompt_history.find(project.id, fingerprint)
+            if entry:
+                return _history_response(entry, "Prompt生成成功")
+
+        # 按段落生成Prompt内容，与上一次生成相比输入未变化的段落直接复用
+        previous = _previous_sections(project, KIND_INTERFACE, request)
+        builder = SectionBuilder(request, user.username, project, previous).render()
+        prompt_content = builder.assemble()
+        history_id = _record_history(project, KIND_INTERFACE, fingerprint, request.interface_name,
+                                     payload, prompt_content, builder)
 
         return InterfaceTaskResponse(
             success=True,
             message="Prompt生成成功",
-            prompt_content=prompt_content
+            prompt_content=prompt_content,
+            history_id=history_id,
+            reused_sections=builder.reused
         )
 
     except Exception as e:
@@ -143,94 +347,16 @@ async def generate_interface_prompt(request: InterfaceTaskRequest, token_data: d
 
 def generate_interface_prompt_content(request: InterfaceTaskRequest, username: str, project) -> str:
     """生成接口类任务的Prompt内容"""
-
-    # 获取当前日期
-    current_date = datetime.now().strftime("%Y/%m/%d")
-
-    # 构建请求报文结构表（扩展为六列）
-    request_structure_md = ""
-    if request.request_structure_table:
-        request_structure_md = "| 参数字段 | 字段描述 |\n"
-        request_structure_md += "|---------|---------|\n"
-        for field in request.request_structure_table:
-            request_structure_md += f"| {field.parameter} | {field.description} |\n"
-
-    # 构建响应报文结构表（扩展为六列）
-    response_structure_md = ""
-    if request.response_structure_table:
-        response_structure_md = "| 参数字段 | 字段描述 |\n"
-        response_structure_md += "|---------|---------|\n"
-        for field in request.response_structure_table:
-            response_structure_md += f"| {field.parameter} | {field.description} |\n"
-
-    # 构建关联数据库表DDL
-    ddl_content = ""
-    for ddl in request.database_ddls:
-        ddl_content += f"```sql\n{ddl}\n```\n\n"
-
-    # 构建请求参数列表
-    request_params_md = ""
-    if request.request_params:
-        for param in request.request_params:
-            request_params_md += f"- {param}\n"
-
-    # 模板内容
-    template = f"""- sinci: {current_date}
-- author: {username}
-
-# 核心任务
-
-{request.interface_name}是一个{request.interface_description}的接口，请你按要求完成{request.interface_name}的开发，接口将存放至（待填充）。
-
-# 业务逻辑
-
-{request.business_logic_description}
-
-# 要求
-
-{project.development_standard}
-
-# 接口API
-
-## 接口路径
-
-```http
-{request.interface_path}
-```
-
-## 请求体结构
-
-{request_structure_md}
-
-## 请求体示例
-
-{request_params_md}
-
-```json
-{request.request_body_example}
-```
-
-## 响应体结构
-
-{response_structure_md}
-
-## 响应体示例
-
-```json
-{request.response_body_example}
-```
-
-# 关联数据库信息
-
-{ddl_content}"""
-
-
-
-    return template
+    return SectionBuilder(request, username, project).render().assemble()
 
 @router.post("/generate-ai-enhanced-prompt", response_model=InterfaceTaskResponse)
-async def generate_ai_enhanced_prompt(request: InterfaceTaskRequest, token_data: dict = Depends(get_current_user)):
-    """生成AI增强的接口类任务Prompt"""
+async def generate_ai_enhanced_prompt(request: InterfaceTaskRequest, http_request: Request,
+                                      token_data: dict = Depends(get_current_user)):
+    """生成AI增强的接口类任务Prompt
+
+    整个请求受 AI_ENHANCE_BUDGET 时间预算约束，到期时返回已完成的段落；客户端断开连接时取消进行中的AI调用。
+    """
+    deadline = Deadline(AI_ENHANCE_BUDGET)
     try:
         user = storage.get_user_by_email(token_data.email)
         if not user:
@@ -252,19 +378,74 @@ async def generate_ai_enhanced_prompt(request: InterfaceTaskRequest, token_data:
                 prompt_content=None
             )
 
-        # 生成基础Prompt内容
-        base_prompt = generate_interface_prompt_content(request, user.username, project)
-
-        # 调用AI服务增强响应结构表
-        enhanced_prompt = await enhance_prompt_with_ai(request, base_prompt, ai_config, user.username)
-
-        # 调用AI服务生成业务逻辑描述
-        enhanced_prompt = await enhance_business_logic_with_ai(request, enhanced_prompt, ai_config, user.username)
+        # 相同请求、相同模型已生成过时直接返回历史结果，不再调用AI服务
+        payload = request.dict(exclude=HISTORY_EXCLUDED_FIELDS)
+        fingerprint = request_fingerprint(KIND_AI_ENHANCED, payload, author=user.username,
+                                          standard=project.development_standard,
+                                          api_url=ai_config.api_url, model=ai_config.model_name)
+        if request.use_history:
+            entry = prompt_history.find(project.id, fingerprint)
+            if entry:
+                _record_cache_hits(user.id, project.id, ai_config, ("data_sources", "business_logic"))
+                return _history_response(entry, "AI增强Prompt生成成功")
+
+        # 查找相似的历史接口，相似度足够高时复用其字段数据源（强制重新生成时不复用）
+        similar_specs = await _find_similar_specs(user.id, request) if request.use_history else []
+
+        # 按段落生成基础Prompt内容，与上一次生成相比输入未变化的段落直接复用
+        previous = _previous_sections(project, KIND_AI_ENHANCED, request)
+        builder = SectionBuilder(request, user.username, project, previous).render()
+        base_prompt = builder.assemble()
+
+        planned = _plan_ai_sections(request, user.username, ai_config, builder, previous, similar_specs)
+        _record_cache_hits(user.id, project.id, ai_config,
+                           [name for name in ("data_sources", "business_logic") if name in builder.reused])
+
+        # 已在编辑时预先增强过的段落直接使用其结果（进行中时等待其完成），其余段落现在调用AI
+        ai_steps = {
+            name: speculative_enhancer.take(user.id, name, fingerprint, factory)
+            for name, (fingerprint, factory) in planned.items()
+        }
+
+        # 两个AI段落互不依赖，并发调用；超出时间预算时取消未完成的调用，客户端断开时全部取消
+        with deadline_scope(deadline.remaining()), usage_scope(user.id, project.id):
+            results, skipped = await gather_within_deadline(ai_steps, http_request)
+        if "data_sources" in results:
+            table = results["data_sources"]
+            builder.set("data_sources", render_data_sources(table), planned["data_sources"][0] if table else "")
+        if results.get("business_logic"):
+            builder.set("business_logic", render_business_logic(results["business_logic"]), planned["business_logic"][0])
+
+        # AI调用全部失败时结果与基础Prompt相同；部分段落未完成时同样不记入历史，下次请求重新调用
+        enhanced_prompt = builder.assemble()
+        history_id = None
+        if enhanced_prompt != base_prompt and not skipped:
+            history_id = _record_history(project, KIND_AI_ENHANCED, fingerprint, request.interface_name,
+                                         payload, enhanced_prompt, builder)
+
+        message = "AI增强Prompt生成成功"
+        if skipped:
+            message = (f"AI增强Prompt部分生成：超出时间预算（{deadline.budget:g}秒），"
+                       f"未完成：{'、'.join(AI_SECTION_LABELS[name] for name in skipped)}")
 
         return InterfaceTaskResponse(
             success=True,
-            message="AI增强Prompt生成成功",
-            prompt_content=enhanced_prompt
+            message=message,
+            prompt_content=enhanced_prompt,
+            history_id=history_id,
+            reused_sections=builder.reused,
+            skipped_sections=skipped,
+            similar_specs=[
+                {"history_id": spec.history_id, "title": spec.title, "similarity": spec.similarity}
+                for spec in similar_specs
+            ]
+        )
+
+    except ClientDisconnected:
+        print(f"客户端已断开连接，取消AI调用: {request.interface_name}")
+        return InterfaceTaskResponse(
+            success=False,
+            message="客户端已断开连接，AI调用已取消"
         )
 
     except Exception as e:
@@ -273,8 +454,87 @@ async def generate_ai_enhanced_prompt(request: InterfaceTaskRequest, token_data:
             message=f"AI增强Prompt生成失败: {str(e)}"
         )
 
-async def enhance_prompt_with_ai(request: InterfaceTaskRequest, base_prompt: str, ai_config, username: str) -> str:
-    """使用AI增强Prompt中的响应结构表"""
+@router.post("/speculate-ai-enhancement")
+async def speculate_ai_enhancement(request: InterfaceTaskRequest, token_data: dict = Depends(get_current_user)):
+    """登记表单当前的输入，在后台预先生成AI段落，之后点击AI增强时直接使用
+
+    只在用户开启预先增强、AI依赖的输入停止变化几秒后由表单调用；受每个用户的并发和每小时次数限制。
+    """
+    try:
+        if not SPECULATION_ENABLED:
+            return {"success": False, "message": "未开启预先增强", "sections": {}}
+
+        user = storage.get_user_by_email(token_data.email)
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="用户不存在")
+
+        project = storage.get_project_by_id(request.project_id)
+        if not project:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="项目不存在")
+
+        if project.user_id != user.id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="无权访问此项目")
+
+        ai_config = storage.get_ai_config_by_user_id(user.id)
+        if not ai_config:
+            return {"success": False, "message": "请先配置AI服务信息", "sections": {}}
+
+        # 与AI增强生成相同的准备过程，保证预先生成的段落与点击时需要的一致；
+        # 与上次生成相比AI依赖的输入未变化的段落会直接复用，不会启动预先增强
+        similar_specs = await _find_similar_specs(user.id, request) if request.use_history else []
+        previous = _previous_sections(project, KIND_AI_ENHANCED, request)
+        builder = SectionBuilder(request, user.username, project, previous).render()
+        planned = _plan_ai_sections(request, user.username, ai_config, builder, previous, similar_specs)
+
+        sections = await speculative_enhancer.start(user.id, project.id, planned)
+        return {"success": True, "message": "已登记预先增强", "sections": sections}
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        return {"success": False, "message": f"预先增强失败: {str(e)}", "sections": {}}
+
+def _plan_ai_sections(request: InterfaceTaskRequest, username: str, ai_config, builder: SectionBuilder,
+                      previous: Optional[dict], similar_specs: list) -> Dict[str, Tuple[str, Callable[[], Awaitable[str]]]]:
+    """需要调用AI的段落：名称 -> (AI输入指纹, 生成函数)；AI依赖的输入未变化的段落直接复用上次的结果"""
+    planned = {}
+
+    # 字段数据源：AI依赖的输入未变化时整段复用，否则只分析新增或修改过的字段
+    data_sources_fingerprint = section_fingerprint("data_sources", *data_sources_ai_inputs(request, ai_config))
+    if not builder.reuse("data_sources", data_sources_fingerprint):
+        previous_rows = _previous_field_rows(previous, request, ai_config)
+        specs = ([previous_rows] if previous_rows else []) + similar_specs
+        planned["data_sources"] = (data_sources_fingerprint,
+                                   lambda: analyze_data_sources(request, ai_config, username, specs))
+    builder.fingerprints["data_sources_context"] = section_fingerprint(*data_sources_context_inputs(request, ai_config))
+
+    # 业务逻辑：AI依赖的输入未变化时复用上次AI推测的结果
+    business_logic_fingerprint = section_fingerprint("business_logic", *business_logic_ai_inputs(request, ai_config))
+    if not builder.reuse("business_logic", business_logic_fingerprint):
+        planned["business_logic"] = (business_logic_fingerprint,
+                                     lambda: infer_business_logic(request, ai_config, username))
+    return planned
+
+def _record_cache_hits(user_id: int, project_id: int, ai_config, tasks):
+    """命中历史或复用上次AI段落时，按默认服务记录省去的调用"""
+    for task in tasks:
+        usage_ledger.record_cache_hit(user_id, project_id, "默认", ai_config.model_name, task)
+
+async def _find_similar_specs(user_id: int, request: InterfaceTaskRequest) -> list:
+    """查找相似的历史接口，查找失败时按没有相似接口处理
+
+    第一次查找时要从SQLite加载该用户的全部历史并计算签名，在线程中执行，不阻塞事件循环。
+    """
+    try:
+        return await asyncio.to_thread(similar_spec_finder.search, user_id, request)
+    except Exception as e:
+        print(f"查找相似接口失败: {str(e)}")
+        return []
+
+@traced("ai.analyze_data_sources")
+async def analyze_data_sources(request: InterfaceTaskRequest, ai_config, username: str,
+                               similar_specs: list = None) -> str:
+    """分析报文字段的数据源，返回接口参数数据源表格（本地匹配 + 复用 + AI分析，全部失败时为空）"""
 
     # 构建AI请求报文模板
     ai_request_template = f"""# 核心任务
@@ -308,107 +568,159 @@ async def enhance_prompt_with_ai(request: InterfaceTaskRequest, base_prompt: str
 
 """
 
-    # 构建请求报文结构表
+    # 本地预先匹配能直接确定数据源的字段（名称一致、驼峰转译或仅大小写/分隔符不同，且只在一个表中出现）；
+    # 多个表中都有同名列或名称近似的字段交给AI，并附上本地找到的候选列
+    field_matches = match_interface_fields(request)
+    local_data_source_table = build_data_source_table(field_matches)
+    resolved_parameters = {m.parameter for m in field_matches if m.resolved}
+    match_hints = {m.parameter: m for m in field_matches if m.hint()}
+    unresolved_request_fields = [f for f in request.request_structure_table if f.parameter not in resolved_parameters]
+    unresolved_response_fields = [f for f in request.response_structure_table if f.parameter not in resolved_parameters]
+
+    # 高度相似的历史接口已由AI分析过的字段直接复用其数据源，只把剩余字段交给AI
+    reused_rows = reuse_data_source_rows(similar_specs or [], [f.parameter for f in unresolved_request_fields + unresolved_response_fields])
+    if reused_rows:
+        local_data_source_table = merge_data_source_tables(local_data_source_table, build_reused_table(reused_rows.values())) + "\n"
+        unresolved_request_fields = [f for f in unresolved_request_fields if f.parameter not in reused_rows]
+        unresolved_response_fields = [f for f in unresolved_response_fields if f.parameter not in reused_rows]
+
+    # 所有字段都已在本地确定数据源，无需调用AI
+    if request.database_ddls and not unresolved_request_fields and not unresolved_response_fields and local_data_source_table:
+        return local_data_source_table.rstrip("\n")
+
+    # 构建请求报文结构表（只包含未匹配的字段）
     request_structure_md = ""
-    if request.request_structure_table:
+    if unresolved_request_fields:
         request_structure_md = "| 参数字段 | 字段描述 | 主关联数据 | 关系描述 | 辅关联数据 | 关系描述 |\n"
         request_structure_md += "|---------|---------|-----------|----------|-----------|----------|\n"
-        for field in request.request_structure_table:
-            request_structure_md += f"| {field.parameter} | {field.description} |  |  |  |  |\n"
+        for field in unresolved_request_fields:
+            request_structure_md += _unresolved_field_row(field, match_hints.get(field.parameter))
 
-    # 构建响应报文结构表（原始的）
+    # 构建响应报文结构表（只包含未匹配的字段）
     original_response_structure_md = ""
-    if request.response_structure_table:
+    if unresolved_response_fields:
         original_response_structure_md = "| 参数字段 | 字段描述 | 主关联数据 | 关系描述 | 辅关联数据 | 关系描述 |\n"
         original_response_structure_md += "|---------|---------|-----------|----------|-----------|----------|\n"
-        for field in request.response_structure_table:
-            original_response_structure_md += f"| {field.parameter} | {field.description} |  |  |  |  |\n"
-
-    # 构建关联数据库表DDL
-    database_ddls = ""
-    for ddl in request.database_ddls:
-        database_ddls += f"```sql\n{ddl}\n```\n\n"
+        for field in unresolved_response_fields:
+            original_response_structure_md += _unresolved_field_row(field, match_hints.get(field.parameter))
+
+    # 按模型预算压缩Prompt：DDL始终去重，超出预算时再精简未使用的列、截断低优先级段落
+    unique_ddls = dedupe_ddls(request.database_ddls)
+    keep_columns = {normalize_name(leaf_parameter_name(f.parameter))
+                    for f in request.request_structure_table + request.response_structure_table}
+    keep_columns |= {normalize_name(c.name) for m in field_matches for c in m.candidates + m.related_columns}
+
+    budget = PromptBudget(ai_config.model_name)
+    sections, token_report = budget.fit(ai_request_template, [
+        PromptSection("interface_name", request.interface_name or "", truncatable=False),
+        PromptSection("interface_description", request.interface_description or "", priority=1),
+        PromptSection("business_logic_description", request.business_logic_description or "", priority=3),
+        PromptSection("database_ddls", _format_ddl_blocks(unique_ddls), priority=2,
+                      original=_format_ddl_blocks(request.database_ddls),
+                      reducers=[lambda _: _format_ddl_blocks([strip_unused_columns(ddl, keep_columns) for ddl in unique_ddls])]),
+        PromptSection("request_structure_md", request_structure_md, priority=1),
+        PromptSection("response_structure_md", original_response_structure_md, priority=1),
+    ])
 
     # 填充AI请求模板
-    ai_request_content = ai_request_template.replace("【interface_name】", request.interface_name or "")
-    ai_request_content = ai_request_content.replace("【interface_description】", request.interface_description or "")
-    ai_request_content = ai_request_content.replace("【business_logic_description】", request.business_logic_description or "")
-    ai_request_content = ai_request_content.replace("【database_ddls】", database_ddls)
-    ai_request_content = ai_request_content.replace("【request_structure_md】", request_structure_md)
-    ai_request_content = ai_request_content.replace("【response_structure_md】", original_response_structure_md)
+    ai_request_content = ai_request_template
+    for name, text in sections.items():
+        ai_request_content = ai_request_content.replace(f"【{name}】", text)
 
     # 调用AI服务
-    ai_response = await call_ai_service(ai_request_content, ai_config, username)
-
-    # 记录AI调用日志
-    log_ai_call(username, ai_config, ai_request_content, ai_response)
-
-    # 如果AI调用成功，将AI答复拼装到最后面
-    if ai_response and ai_response.strip():
-        enhanced_prompt = base_prompt + "\n\n# 接口参数数据源\n" + ai_response.strip()
-        return enhanced_prompt
-    else:
-        # 如果AI调用失败，返回原始prompt
-        return base_prompt
-
-async def call_ai_service(prompt: str, ai_config, username: str) -> str:
-    """调用AI服务"""
-    try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            headers = {
-                "Authorization": f"Bearer {ai_config.api_key}",
-                "Content-Type": "application/json"
-            }
-
-            payload = {
-                "model": ai_config.model_name,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "temperature": 0.7,
-                "max_tokens": 2000
-            }
-
-            response = await client.post(
-                ai_config.api_url,
-                headers=headers,
-                json=payload
-            )
-
-            if response.status_code == 200:
-                result = response.json()
-                if "choices" in result and len(result["choices"]) > 0:
-                    ai_response = result["choices"][0]["message"]["content"]
-                    return ai_response
-                else:
-                    print(f"AI响应格式异常: {result}")
-                    return ""
-            else:
-                error_detail = response.text
-                try:
-                    error_json = response.json()
-                    if "error" in error_json:
-                        error_detail = error_json["error"].get("message", error_detail)
-                except:
-                    pass
-                print(f"AI服务请求失败 ({response.status_code}): {error_detail}")
-                return ""
-
-    except httpx.TimeoutException:
-        print("AI服务请求超时")
-        return ""
-    except httpx.RequestError as e:
-        print(f"无法连接到AI服务: {str(e)}")
-        return ""
-    except Exception as e:
-        print(f"AI调用异常: {str(e)}")
-        return ""
-
-async def enhance_business_logic_with_ai(request: InterfaceTaskRequest, current_prompt: str, ai_config, username: str) -> str:
-    """使用AI增强业务逻辑描述"""
+    ai_response = await call_ai_service(ai_request_content, ai_config, username, max_tokens=budget.completion_tokens,
+                                        task="data_sources", token_report=token_report)
+
+    # 将本地匹配结果与AI答复合并（AI调用失败且本地没有匹配结果时为空）
+    return merge_data_source_tables(local_data_source_table, ai_response)
+
+def _unresolved_field_row(field, match) -> str:
+    """交给AI分析的报文字段行，本地有候选列时预填在主关联数据中请AI确认"""
+    if match is None:
+        return f"| {field.parameter} | {field.description} |  |  |  |  |\n"
+    candidates = "、".join(c.qualified_name for c in match.candidates)
+    return f"| {field.parameter} | {field.description} | {candidates}（候选） | {match.hint()} |  |  |\n"
+
+def _format_ddl_blocks(ddls: list) -> str:
+    """将DDL列表格式化为SQL代码块"""
+    return "".join(f"```sql\n{ddl}\n```\n\n" for ddl in ddls)
+
+async def call_ai_service(prompt: str, ai_config, username: str, max_tokens: int = COMPLETION_TOKENS,
+                          task: str = "data_sources", token_report: BudgetReport = None) -> str:
+    """调用AI服务并记录调用日志，全部服务都失败时返回空字符串
+
+    按 provider_balancer 的排序依次尝试默认配置和承担该任务的备用服务，任何异常都视为该服务失败并切换到下一个。
+    超时时间不超过当前请求剩余的时间预算；请求被取消（客户端断开、预算用尽）时取消异常直接向上抛出，不记录结果。
+    """
+    ai_response = ""
+    provider = None
+    for provider in provider_balancer.rank(ai_providers(ai_config), task):
+        deadline = current_deadline()
+        if deadline is not None and deadline.expired:
+            print("AI服务请求已超过截止时间，跳过调用")
+            break
+        started = time.perf_counter()
+        with span("ai.call", **{"ai.provider": provider.name, "ai.model": provider.model_name,
+                                "ai.url": provider.api_url, "ai.task": task, "ai.max_tokens": max_tokens,
+                                "ai.request_bytes": len(prompt.encode("utf-8"))}) as ai_span:
+            try:
+                completion = await _post_ai_request(prompt, provider, max_tokens, ai_span)
+            except asyncio.CancelledError:
+                _record_usage(provider, task, OUTCOME_CANCELLED, started, prompt)
+                raise
+            except Exception as e:
+                # 适配器未归类的异常（如地址格式错误）同样按该服务失败处理，切换到下一个服务
+                error = str(e) if isinstance(e, AIServiceError) else f"{type(e).__name__}: {str(e)}"
+                provider_balancer.record(provider, time.perf_counter() - started, ok=False, error=error)
+                _record_usage(provider, task, OUTCOME_ERROR, started, prompt)
+                ai_span.record_error(e)
+                print(f"AI服务 {provider.name} 调用失败: {error}")
+                continue
+            ai_response = completion.content
+            ai_span.set_attribute("ai.response_bytes", len(ai_response.encode("utf-8")))
+        provider_balancer.record(provider, time.perf_counter() - started, ok=True)
+        _record_usage(provider, task, OUTCOME_OK, started, prompt, completion)
+        break
+
+    if provider is not None:
+        log_ai_call(username, provider, prompt, ai_response, token_report)
+    return ai_response
+
+def _record_usage(provider, task: str, outcome: str, started: float, prompt: str, completion: AICompletion = None):
+    """记录一次AI调用的用量；服务未返回token数时按离线估算（失败、取消的调用只估算请求部分）"""
+    scope = current_usage_scope()
+    if scope is None:
+        return
+    prompt_tokens = completion.prompt_tokens if completion else None
+    completion_tokens = completion.completion_tokens if completion else 0
+    estimated = prompt_tokens is None or completion_tokens is None
+    if prompt_tokens is None:
+        prompt_tokens = count_tokens(prompt)
+    if completion_tokens is None:
+        completion_tokens = count_tokens(completion.content)
+    usage_ledger.record(UsageRecord(
+        user_id=scope[0], project_id=scope[1], provider=provider.name, model=provider.model_name, task=task,
+        outcome=outcome, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+        latency_ms=round((time.perf_counter() - started) * 1000, 1), estimated=estimated
+    ))
+
+async def _post_ai_request(prompt: str, provider, max_tokens: int, ai_span) -> AICompletion:
+    """向一个AI服务发送请求并返回答复，失败时抛出 AIServiceError"""
+    deadline = current_deadline()
+    timeout = DEFAULT_TIMEOUT
+    if deadline is not None:
+        timeout = httpx.Timeout(deadline.cap(DEFAULT_TIMEOUT.read), connect=deadline.cap(DEFAULT_TIMEOUT.connect))
+    completion = await complete_chat(provider, prompt, max_tokens, timeout=timeout, headers=inject_trace_headers({}))
+    ai_span.set_attributes({
+        "ai.adapter": adapter_for(provider.api_url).name,
+        "ai.prompt_tokens": completion.prompt_tokens,
+        "ai.completion_tokens": completion.completion_tokens
+    })
+    return completion
+
+@traced("ai.infer_business_logic")
+async def infer_business_logic(request: InterfaceTaskRequest, ai_config, username: str) -> str:
+    """使用AI推测接口的业务逻辑描述，AI调用失败时返回空字符串"""
 
     # 构建AI请求报文模板
     ai_request_template = """# 核心任务
@@ -458,40 +770,29 @@ async def enhance_business_logic_with_ai(request: InterfaceTaskRequest, current_
         for param in request.request_params:
             request_params_md += f"- {param}\n"
 
+    # 按模型预算压缩Prompt，报文样例优先截断
+    budget = PromptBudget(ai_config.model_name)
+    sections, token_report = budget.fit(ai_request_template, [
+        PromptSection("interface_info", f"{request.interface_name}\n{request.interface_description}\n{request.business_logic_description}", priority=1),
+        PromptSection("request_structure_md", request_structure_md, priority=2),
+        PromptSection("response_structure_md", response_structure_md, priority=2),
+        PromptSection("request_body_example", request.request_body_example, priority=3),
+        PromptSection("response_body_example", request.response_body_example, priority=3),
+    ])
+
     # 填充AI请求模板
-    ai_request_content = ai_request_template.replace("# 接口信息\n\n\n\n", f"# 接口信息\n\n{request.interface_name}\n{request.interface_description}\n{request.business_logic_description}\n\n")
-    ai_request_content = ai_request_content.replace("# 请求报文样例\n\n\n\n", f"# 请求报文样例\n\n{request_structure_md}\n\n```json\n{request.request_body_example}\n```\n\n")
-    ai_request_content = ai_request_content.replace("# 响应报文样例\n\n\n", f"# 响应报文样例\n\n{response_structure_md}\n\n```json\n{request.response_body_example}\n```\n\n")
+    ai_request_content = ai_request_template.replace("# 接口信息\n\n\n\n", f"# 接口信息\n\n{sections['interface_info']}\n\n")
+    ai_request_content = ai_request_content.replace("# 请求报文样例\n\n\n\n", f"# 请求报文样例\n\n{sections['request_structure_md']}\n\n```json\n{sections['request_body_example']}\n```\n\n")
+    ai_request_content = ai_request_content.replace("# 响应报文样例\n\n\n", f"# 响应报文样例\n\n{sections['response_structure_md']}\n\n```json\n{sections['response_body_example']}\n```\n\n")
 
     # 调用AI服务
-    ai_response = await call_ai_service(ai_request_content, ai_config, username)
-
-    # 记录AI调用日志
-    log_ai_call(username, ai_config, ai_request_content, ai_response)
-
-    # 如果AI调用成功，将AI答复替换业务逻辑部分
-    if ai_response and ai_response.strip():
-        # 查找业务逻辑部分并替换
-        import re
-
-        # 使用正则表达式查找业务逻辑部分
-        business_logic_pattern = r'# 业务逻辑\n\n[^\n]*\n'
-        replacement = f'# 业务逻辑\n\n{ai_response.strip()}\n\n'
-
-        if re.search(business_logic_pattern, current_prompt):
-            enhanced_prompt = re.sub(business_logic_pattern, replacement, current_prompt, flags=re.MULTILINE)
-            return enhanced_prompt
-        else:
-            # 如果没有找到业务逻辑部分，直接在核心任务后添加
-            core_task_pattern = r'# 核心任务\n\n[^\n]*\n\n'
-            replacement = f'# 核心任务\n\n{request.interface_name}是一个{request.interface_description}的接口，请你按要求完成{request.interface_name}的开发，接口将存放至（待填充）。\n\n# 业务逻辑\n\n{ai_response.strip()}\n\n'
-            enhanced_prompt = re.sub(core_task_pattern, replacement, current_prompt, flags=re.MULTILINE | re.DOTALL)
-            return enhanced_prompt
-    else:
-        # 如果AI调用失败，返回原始prompt
-        return current_prompt
-
-def log_ai_call(username: str, ai_config, request_body: str, response_body: str):
+    ai_response = await call_ai_service(ai_request_content, ai_config, username, max_tokens=budget.completion_tokens,
+                                        task="business_logic", token_report=token_report)
+
+    return (ai_response or "").strip()
+
+@traced("log.ai_call")
+def log_ai_call(username: str, ai_config, request_body: str, response_body: str, token_report: BudgetReport = None):
     """记录AI调用日志"""
     try:
         # 创建日志目录
@@ -507,9 +808,11 @@ def log_ai_call(username: str, ai_config, request_body: str, response_body: str)
 [{timestamp}]
 用户名: {username}
 AI配置信息:
+  - 服务: {getattr(ai_config, "name", "默认")}
   - API URL: {ai_config.api_url}
   - Model: {ai_config.model_name}
   - API Key: {ai_config.api_key[:10]}...{ai_config.api_key[-10:] if len(ai_config.api_key) > 20 else ai_config.api_key}
+Token预算: {token_report.summary() if token_report else "未统计"}
 
 原生请求体:
 {request_body}
@@ -541,13 +844,25 @@ async def generate_bug_fix_prompt(request: BugFixTaskRequest, token_data: dict =
         if project.user_id != user.id:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="无权访问此项目")
 
+        # 相同请求直接返回历史结果
+        payload = request.dict(exclude=HISTORY_EXCLUDED_FIELDS)
+        fingerprint = request_fingerprint(KIND_BUG_FIX, payload, author=user.username,
+                                          standard=project.development_standard)
+        if request.use_history:
+            entry = prompt_history.find(project.id, fingerprint)
+            if entry:
+                return _history_response(entry, "故障类Prompt生成成功")
+
         # 生成Prompt内容
         prompt_content = generate_bug_fix_prompt_content(request, user.username, project)
+        title = next((line.strip() for line in request.bash_info.splitlines() if line.strip()), "故障信息")
+        history_id = _record_history(project, KIND_BUG_FIX, fingerprint, title, payload, prompt_content)
 
         return InterfaceTaskResponse(
             success=True,
             message="故障类Prompt生成成功",
-            prompt_content=prompt_content
+            prompt_content=prompt_content,
+            history_id=history_id
         )
 
     except Exception as e:
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Prompt Generator 生产环境启动脚本
+
+与 start.py / main.py 不同，这里不开启文件监听和自动重载：
+- 单worker时在当前进程中预先导入应用和模板，再交给uvicorn运行
+- 多worker时每个worker在开始接收请求前完成预热（模板预编译、存储和连接池预热）
+- 就绪检查: GET /readyz，返回启动耗时和首个请求耗时
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# 尽早记录启动时间，用于统计冷启动耗时（worker进程通过环境变量继承）
+os.environ.setdefault("PROMPT_LAUNCH_TIME", str(time.time()))
+
+
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="Prompt Generator 生产环境启动器")
+    parser.add_argument("--host", default="0.0.0.0", help="监听地址")
+    parser.add_argument("--port", type=int, default=4397, help="监听端口")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker进程数")
+    parser.add_argument("--warm-ai-hosts", action="store_true", help="启动时预先连接已配置的AI服务主机")
+    parser.add_argument("--log-level", default="warning", help="uvicorn日志级别")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.warm_ai_hosts:
+        os.environ["PROMPT_WARMUP_AI_HOSTS"] = "1"
+    if args.workers > 1:
+        # 多worker时验证码、限流等状态必须跨进程共享
+        os.environ.setdefault("PROMPT_STATE_BACKEND", "sqlite")
+
+    import uvicorn
+
+    if args.workers > 1:
+        app = "main:app"
+    else:
+        # 单worker时直接预加载应用对象
+        from main import app
+
+    print(f"🚀 Prompt Generator 生产模式: http://{args.host}:{args.port}，worker数 {args.workers}")
+    uvicorn.run(
+        app,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+        proxy_headers=True,
+        timeout_keep_alive=30,
+    )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,375 @@
+"""
+跨进程共享状态
+
+验证码、限流计数和缓存等需要在多个worker之间共享的状态统一通过这里的后端存取。
+通过环境变量 PROMPT_STATE_BACKEND 选择后端：
+  - memory                      进程内存（默认，仅适用于单worker）
+  - sqlite 或 sqlite:///<路径>   本机多worker共享（默认路径 data/shared_state.db）
+  - redis://<host>:<port>/<db>  多节点共享，兼容Redis协议的服务均可
+"""
+
+import os
+import time
+import socket
+import sqlite3
+import threading
+from typing import Optional
+from urllib.parse import urlparse
+
+STATE_BACKEND_ENV = "PROMPT_STATE_BACKEND"
+DEFAULT_SQLITE_PATH = os.path.join("data", "shared_state.db")
+
+
+class StateBackend:
+    """共享状态后端接口，值统一为字符串"""
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None):
+        raise NotImplementedError
+
+    def set_if_absent(self, key: str, value: str, ttl: Optional[int] = None) -> bool:
+        """键不存在时写入，返回是否写入成功"""
+        raise NotImplementedError
+
+    def pop(self, key: str) -> Optional[str]:
+        """原子地读取并删除"""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def incr(self, key: str, ttl: Optional[int] = None) -> int:
+        """计数加一并返回新值，首次创建时设置过期时间"""
+        raise NotImplementedError
+
+    def size(self) -> int:
+        """当前存储的键数量（用于诊断）"""
+        raise NotImplementedError
+
+
+class MemoryBackend(StateBackend):
+    """进程内存后端"""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def _get_alive(self, key: str):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.time():
+            del self._data[key]
+            return None
+        return value
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self._get_alive(key)
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+
+    def set_if_absent(self, key: str, value: str, ttl: Optional[int] = None) -> bool:
+        with self._lock:
+            if self._get_alive(key) is not None:
+                return False
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+            return True
+
+    def pop(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._get_alive(key)
+            self._data.pop(key, None)
+            return value
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key: str, ttl: Optional[int] = None) -> int:
+        with self._lock:
+            current = self._get_alive(key)
+            if current is None:
+                self._data[key] = ("1", time.time() + ttl if ttl else None)
+                return 1
+            value = int(current) + 1
+            self._data[key] = (str(value), self._data[key][1])
+            return value
+
+    def size(self) -> int:
+        with self._lock:
+            now = time.time()
+            expired = [k for k, (_, exp) in self._data.items() if exp is not None and exp <= now]
+            for k in expired:
+                del self._data[k]
+            return len(self._data)
+
+
+class SQLiteBackend(StateBackend):
+    """SQLite后端，同一台机器上的多个worker共享一个数据库文件"""
+
+    # 每写入多少次清理一次过期数据
+    PURGE_INTERVAL = 200
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _maybe_purge(self, conn: sqlite3.Connection):
+        self._writes += 1
+        if self._writes % self.PURGE_INTERVAL == 0:
+            conn.execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+
+    @staticmethod
+    def _expires_at(ttl: Optional[int]) -> Optional[float]:
+        return time.time() + ttl if ttl else None
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._connect().execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None):
+        conn = self._connect()
+        conn.execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, self._expires_at(ttl))
+        )
+        self._maybe_purge(conn)
+
+    def set_if_absent(self, key: str, value: str, ttl: Optional[int] = None) -> bool:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM kv WHERE key = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+                         (key, time.time()))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, self._expires_at(ttl))
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount == 1
+
+    def pop(self, key: str) -> Optional[str]:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT value, expires_at FROM kv WHERE key = ?", (key,)
+            ).fetchone()
+            conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if not row or (row[1] is not None and row[1] <= time.time()):
+            return None
+        return row[0]
+
+    def delete(self, key: str):
+        self._connect().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def incr(self, key: str, ttl: Optional[int] = None) -> int:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            row = conn.execute(
+                "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, now)
+            ).fetchone()
+            if row is None:
+                value = 1
+                conn.execute(
+                    "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, "1", self._expires_at(ttl))
+                )
+            else:
+                value = int(row[0]) + 1
+                conn.execute("UPDATE kv SET value = ? WHERE key = ?", (str(value), key))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._maybe_purge(conn)
+        return value
+
+    def size(self) -> int:
+        row = self._connect().execute(
+            "SELECT COUNT(*) FROM kv WHERE expires_at IS NULL OR expires_at > ?", (time.time(),)
+        ).fetchone()
+        return row[0]
+
+
+class RedisBackend(StateBackend):
+    """Redis协议后端（内置最小RESP客户端，不依赖redis包）"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6379, db: int = 0,
+                 password: Optional[str] = None, timeout: float = 5.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._local = threading.local()
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBackend":
+        parsed = urlparse(url)
+        db = int(parsed.path.lstrip("/") or 0)
+        return cls(host=parsed.hostname or "127.0.0.1", port=parsed.port or 6379,
+                   db=db, password=parsed.password)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            conn = (sock, sock.makefile("rb"))
+            self._local.conn = conn
+            try:
+                if self.password:
+                    self._command("AUTH", self.password)
+                if self.db:
+                    self._command("SELECT", str(self.db))
+            except Exception:
+                # 认证或选库失败的连接不能复用
+                self._close()
+                raise
+        return conn
+
+    def _close(self):
+        conn = getattr(self._local, "conn", None)
+        self._local.conn = None
+        if conn is not None:
+            conn[1].close()
+            conn[0].close()
+
+    def _command(self, *args: str):
+        sock, reader = self._connection()
+        payload = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg.encode("utf-8")
+            payload.append(f"${len(data)}\r\n".encode() + data + b"\r\n")
+        try:
+            sock.sendall(b"".join(payload))
+            return self._read_reply(reader)
+        except (OSError, ConnectionError):
+            # 连接失效时丢弃，下次调用重新连接
+            self._close()
+            raise
+
+    def _read_reply(self, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Redis连接已关闭")
+        prefix, body = line[:1], line[1:-2]
+        if prefix == b"+":
+            return body.decode()
+        if prefix == b"-":
+            raise RuntimeError(body.decode())
+        if prefix == b":":
+            return int(body)
+        if prefix == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2].decode("utf-8")
+        if prefix == b"*":
+            count = int(body)
+            if count < 0:
+                return None
+            return [self._read_reply(reader) for _ in range(count)]
+        raise RuntimeError(f"无法解析的Redis响应: {line!r}")
+
+    def get(self, key: str) -> Optional[str]:
+        return self._command("GET", key)
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None):
+        if ttl:
+            self._command("SET", key, value, "EX", str(int(ttl)))
+        else:
+            self._command("SET", key, value)
+
+    def set_if_absent(self, key: str, value: str, ttl: Optional[int] = None) -> bool:
+        args = ["SET", key, value, "NX"]
+        if ttl:
+            args += ["EX", str(int(ttl))]
+        return self._command(*args) == "OK"
+
+    def pop(self, key: str) -> Optional[str]:
+        return self._command("GETDEL", key)
+
+    def delete(self, key: str):
+        self._command("DEL", key)
+
+    def incr(self, key: str, ttl: Optional[int] = None) -> int:
+        value = self._command("INCR", key)
+        if value == 1 and ttl:
+            self._command("EXPIRE", key, str(int(ttl)))
+        return value
+
+    def size(self) -> int:
+        return self._command("DBSIZE")
+
+
+def create_backend(spec: Optional[str] = None) -> StateBackend:
+    """根据配置创建共享状态后端"""
+    spec = (spec if spec is not None else os.environ.get(STATE_BACKEND_ENV, "memory")).strip()
+    if not spec or spec == "memory":
+        return MemoryBackend()
+    if spec == "sqlite":
+        return SQLiteBackend()
+    if spec.startswith("sqlite:///"):
+        return SQLiteBackend(spec[len("sqlite:///"):])
+    if spec.startswith("redis://"):
+        return RedisBackend.from_url(spec)
+    raise ValueError(f"不支持的共享状态后端: {spec}")
+
+
+def _rate_limit_key(key: str, window_seconds: int) -> str:
+    return f"ratelimit:{key}:{int(time.time() // window_seconds)}"
+
+
+def check_rate_limit(key: str, limit: int, window_seconds: int) -> bool:
+    """固定窗口限流：计数加一，未超过限制时返回True"""
+    count = shared_state.incr(_rate_limit_key(key, window_seconds), ttl=window_seconds)
+    return count <= limit
+
+
+def is_rate_limited(key: str, limit: int, window_seconds: int) -> bool:
+    """只读检查当前窗口是否已达到限制（不计数）"""
+    count = shared_state.get(_rate_limit_key(key, window_seconds))
+    return count is not None and int(count) >= limit
+
+
+# 创建全局共享状态实例
+shared_state = create_backend()
@@ -0,0 +1,256 @@
+import os
+import re
+import random
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from models import InterfaceTaskRequest
+from field_matcher import dedupe_ddls, parse_ddl_columns, normalize_name, leaf_parameter_name
+from prompt_history import prompt_history, KIND_AI_ENHANCED
+from tracing import traced
+
+# MinHash签名长度，相似度估计误差约为 1/sqrt(签名长度)
+SPEC_SIGNATURE_SIZE = 64
+
+# LSH分桶：签名分为若干段，任意一段完全相同即为候选（每段2位时相似度0.5的接口几乎必然成为候选）
+SPEC_LSH_BANDS = 32
+
+# 相似度达到该值时直接复用历史接口的字段数据源，不再交给AI分析
+SPEC_REUSE_THRESHOLD = float(os.environ.get("PROMPT_SPEC_REUSE_THRESHOLD", "0.75"))
+
+# 相似度达到该值时在响应中提示相似的历史接口
+SPEC_SUGGEST_THRESHOLD = 0.5
+
+# 排列哈希 (a*x + b) mod p 使用的梅森素数，x为32位哈希，乘积不超过uint64
+_PRIME = (1 << 31) - 1
+
+_WORD_PATTERN = re.compile(r"[0-9a-z]+")
+
+
+def _text_tokens(text: str) -> Set[str]:
+    """描述文本的特征：英文单词、中文相邻两字"""
+    text = text.lower()
+    tokens = {"w:" + word for word in _WORD_PATTERN.findall(text)}
+    chars = [c for c in text if not c.isspace() and not c.isascii()]
+    tokens.update("d:" + a + b for a, b in zip(chars, chars[1:]))
+    return tokens
+
+
+def spec_tokens(request: InterfaceTaskRequest) -> Set[str]:
+    """提取接口的特征：报文字段名及描述、DDL表和列、接口描述
+
+    接口名称不参与比较：同一组表上的接口往往只是名称不同（查询订单/查询订单列表），字段数据源是一致的。
+    """
+    tokens = set()
+    for f in request.request_structure_table + request.response_structure_table:
+        tokens.add("f:" + normalize_name(leaf_parameter_name(f.parameter)))
+        tokens |= _text_tokens(f.description)
+    for ddl in dedupe_ddls(request.database_ddls):
+        for column in parse_ddl_columns(ddl):
+            tokens.add("t:" + column.table.lower())
+            tokens.add("c:" + column.table.lower() + "." + normalize_name(column.name))
+    tokens |= _text_tokens(request.interface_description)
+    return tokens
+
+
+def _token_hash(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+class MinHasher:
+    """MinHash签名：两个签名对应位置相等的比例即为特征集合Jaccard相似度的估计"""
+
+    def __init__(self, size: int = SPEC_SIGNATURE_SIZE, seed: int = 20240601):
+        rng = random.Random(seed)
+        self.size = size
+        self.a = [rng.randrange(1, _PRIME) for _ in range(size)]
+        self.b = [rng.randrange(0, _PRIME) for _ in range(size)]
+
+    def signature(self, tokens: Iterable[str]) -> Tuple[int, ...]:
+        hashes = [_token_hash(token) for token in tokens] or [0]
+        return tuple(min((a * x + b) % _PRIME for x in hashes) for a, b in zip(self.a, self.b))
+
+
+class SignatureIndex:
+    """MinHash签名索引
+
+    按LSH分桶查找候选，只与候选签名逐位比较，不扫描全部签名。
+    """
+
+    def __init__(self, size: int = SPEC_SIGNATURE_SIZE, bands: int = SPEC_LSH_BANDS):
+        self.size = size
+        self.bands = bands
+        # 删除的签名只从分桶中移除，所在位置的key记为None，不再成为候选
+        self.keys: List[Optional[int]] = []
+        self._positions: Dict[int, int] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+        self._signatures: List[Tuple[int, ...]] = []
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._positions
+
+    def ids(self) -> List[int]:
+        return list(self._positions)
+
+    def _band_keys(self, signature: Sequence[int]):
+        rows = self.size // self.bands
+        for band in range(self.bands):
+            yield band, tuple(signature[band * rows:(band + 1) * rows])
+
+    def add(self, key: int, signature: Sequence[int]):
+        """加入签名，key已存在时替换原签名"""
+        self.remove(key)
+        position = len(self.keys)
+        self.keys.append(key)
+        self._positions[key] = position
+        self._signatures.append(tuple(signature))
+        for band_key in self._band_keys(signature):
+            self._buckets.setdefault(band_key, []).append(position)
+
+    def remove(self, key: int):
+        """删除签名，key不存在时忽略"""
+        position = self._positions.pop(key, None)
+        if position is None:
+            return
+        signature = self._signatures[position]
+        for band_key in self._band_keys(signature):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.remove(position)
+                if not bucket:
+                    del self._buckets[band_key]
+        self.keys[position] = None
+
+    def query(self, signature: Sequence[int], limit: int = 3, threshold: float = 0.0) -> List[Tuple[int, float]]:
+        """返回相似度不低于阈值的最多limit条 (key, 相似度)，按相似度降序"""
+        candidates = set()
+        for band_key in self._band_keys(signature):
+            candidates.update(self._buckets.get(band_key, ()))
+        if not candidates:
+            return []
+        scored = [
+            (p, sum(x == y for x, y in zip(self._signatures[p], signature)) / self.size)
+            for p in candidates
+        ]
+        scored.sort(key=lambda item: -item[1])
+        return [(self.keys[p], similarity) for p, similarity in scored[:limit] if similarity >= threshold]
+
+
+@dataclass
+class SimilarSpec:
+    """相似的历史接口：历史记录ID、相似度及其AI分析得到的字段数据源（字段名 -> 表格行）"""
+    history_id: int
+    title: str
+    similarity: float
+    rows: Dict[str, str] = field(default_factory=dict)
+
+
+def parse_data_source_rows(table: str) -> Dict[str, str]:
+    """解析数据源表格，返回字段名到表格行的映射（跳过表头和分隔行）"""
+    rows = {}
+    lines = [line.strip() for line in (table or "").splitlines() if line.strip().startswith("|")]
+    for line in lines[1:]:
+        cells = [cell.strip() for cell in line.strip("|").split("|")]
+        if cells and cells[0] and not set(cells[0]) <= set("-: "):
+            rows.setdefault(cells[0], line)
+    return rows
+
+
+def build_reused_table(rows: Iterable[str]) -> str:
+    """用复用的表格行构建与AI返回格式一致的数据源表格"""
+    table_md = "| 字段名 | 主数据源 | 关联数据源 | 关联数据源关系描述 |\n"
+    table_md += "|---------|---------|-----------|----------|\n"
+    return table_md + "".join(row + "\n" for row in rows)
+
+
+class SimilarSpecFinder:
+    """按用户维护历史AI增强接口的相似度索引
+
+    数据来自Prompt生成历史，首次查询时构建，之后每次查询只加载版本号更新的记录（新增或被覆盖），
+    其他worker写入的历史同样会被加载；被保留策略或删除项目移除的记录同时从索引中删除。
+    只在同一用户的历史中查找。
+    """
+
+    def __init__(self, history=prompt_history):
+        self.history = history
+        self.hasher = MinHasher()
+        self._indexes: Dict[int, SignatureIndex] = {}
+        self._specs: Dict[int, SimilarSpec] = {}
+        self._loaded_versions: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def _refresh(self, user_id: int) -> SignatureIndex:
+        """加载该用户新增或被覆盖的AI增强历史"""
+        index = self._indexes.setdefault(user_id, SignatureIndex())
+        last_version = self._loaded_versions.get(user_id, 0)
+        changed = False
+        for entry in self.history.iter_entries(user_id, KIND_AI_ENHANCED, after_version=last_version):
+            last_version = max(last_version, entry["version"])
+            changed = True
+            rows = parse_data_source_rows(entry["sections"].get("data_sources", ""))
+            if not rows:
+                self._remove(index, [entry["id"]])
+                continue
+            request = InterfaceTaskRequest(**entry["input"])
+            self._specs[entry["id"]] = SimilarSpec(entry["id"], entry["title"], 0.0, rows)
+            index.add(entry["id"], self.hasher.signature(spec_tokens(request)))
+        self._loaded_versions[user_id] = last_version
+        if changed:
+            # 写入历史时会执行保留策略，删除已不存在的记录
+            self._prune(index, index.ids())
+        return index
+
+    def _prune(self, index: SignatureIndex, history_ids: List[int]) -> List[int]:
+        """从索引中删除已不存在的历史记录，返回删除的ID"""
+        existing = self.history.existing_ids(history_ids)
+        missing = [history_id for history_id in history_ids if history_id not in existing]
+        self._remove(index, missing)
+        return missing
+
+    def _remove(self, index: SignatureIndex, history_ids: List[int]):
+        for history_id in history_ids:
+            index.remove(history_id)
+            self._specs.pop(history_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        """已建立索引的用户数和签名数"""
+        return {"users": len(self._indexes), "signatures": sum(len(index) for index in self._indexes.values())}
+
+    @traced("spec_index.search")
+    def search(self, user_id: int, request: InterfaceTaskRequest, limit: int = 3,
+               threshold: float = SPEC_SUGGEST_THRESHOLD) -> List[SimilarSpec]:
+        """查找与当前接口相似的历史接口（已被保留策略删除的记录会被跳过）"""
+        signature = self.hasher.signature(spec_tokens(request))
+        with self._lock:
+            index = self._refresh(user_id)
+            # 删除项目等不经过写入的删除在命中时才发现：删除后重新查询，已删除的记录不会挤掉存在的记录
+            while True:
+                matches = index.query(signature, limit=limit, threshold=threshold)
+                if not self._prune(index, [history_id for history_id, _ in matches]):
+                    break
+            return [
+                SimilarSpec(history_id, self._specs[history_id].title, round(similarity, 3), self._specs[history_id].rows)
+                for history_id, similarity in matches
+            ]
+
+
+def reuse_data_source_rows(similar_specs: List[SimilarSpec], parameters: Iterable[str],
+                           threshold: float = SPEC_REUSE_THRESHOLD) -> Dict[str, str]:
+    """从相似度达到阈值的历史接口中取出字段的数据源行，优先使用最相似的接口"""
+    reused = {}
+    for spec in similar_specs:
+        if spec.similarity < threshold:
+            continue
+        for parameter in parameters:
+            if parameter not in reused and parameter in spec.rows:
+                reused[parameter] = spec.rows[parameter]
+    return reused
+
+
+# 创建全局相似接口查找实例
+similar_spec_finder = SimilarSpecFinder()
@@ -0,0 +1,136 @@
+"""
+AI增强的预先生成
+
+用户开启预先增强后，接口表单中AI依赖的输入（名称、描述、报文结构、DDL）停止变化几秒，
+客户端即登记当前输入，服务端在后台开始生成AI段落。之后点击AI增强时，
+已完成的段落直接使用（结果在共享状态中保存 PROMPT_SPECULATION_TTL 秒，其他worker同样可用），
+进行中的段落等待其完成，不再重新调用AI。
+每个用户同时进行的预先增强和每小时启动的次数受限；输入变化后，旧输入的预先增强立即取消。
+"""
+
+import os
+import asyncio
+from typing import Awaitable, Callable, Dict, Tuple
+
+from shared_state import shared_state
+from deadline import deadline_scope, AI_ENHANCE_BUDGET
+from usage_accounting import usage_scope
+
+# 是否允许预先增强（客户端另需用户主动开启）
+SPECULATION_ENABLED = os.environ.get("PROMPT_SPECULATION", "1") == "1"
+
+# 每个用户每小时最多启动的预先增强段落数
+SPECULATION_HOURLY_LIMIT = int(os.environ.get("PROMPT_SPECULATION_HOURLY_LIMIT", "30"))
+
+# 每个用户同时进行的预先增强段落数
+SPECULATION_MAX_RUNNING = 2
+
+# 预先增强结果的保存时间（秒）
+SPECULATION_TTL = int(os.environ.get("PROMPT_SPECULATION_TTL", "600"))
+
+STATUS_STARTED = "started"
+STATUS_RUNNING = "running"
+STATUS_READY = "ready"
+STATUS_LIMITED = "limited"
+
+SpeculationKey = Tuple[int, str, str]
+
+
+class SpeculativeEnhancer:
+    """按（用户, 段落, AI输入指纹）管理后台预先增强任务及其结果"""
+
+    def __init__(self, state=None):
+        self.state = state or shared_state
+        self._running: Dict[SpeculationKey, asyncio.Task] = {}
+        self.counters = {"started": 0, "limited": 0, "cancelled": 0, "ready_hits": 0, "running_hits": 0, "misses": 0}
+
+    @staticmethod
+    def _result_key(key: SpeculationKey) -> str:
+        user_id, name, fingerprint = key
+        return f"speculation:{user_id}:{name}:{fingerprint}"
+
+    def _user_running(self, user_id: int) -> int:
+        return sum(1 for key in self._running if key[0] == user_id)
+
+    async def start(self, user_id: int, project_id: int,
+                    planned: Dict[str, Tuple[str, Callable[[], Awaitable[str]]]]) -> Dict[str, str]:
+        """为需要AI生成的段落启动预先增强，返回各段落的状态"""
+        # 输入已变化：旧输入的结果不会再被使用，取消该用户其余进行中的预先增强
+        wanted = {(user_id, name, fingerprint) for name, (fingerprint, _) in planned.items()}
+        for key, task in list(self._running.items()):
+            if key[0] == user_id and key not in wanted:
+                task.cancel()
+                self._running.pop(key, None)
+                self.counters["cancelled"] += 1
+
+        statuses = {}
+        for name, (fingerprint, factory) in planned.items():
+            key = (user_id, name, fingerprint)
+            if key in self._running:
+                statuses[name] = STATUS_RUNNING
+                continue
+            # 共享状态后端可能需要网络往返，在线程中访问
+            if await asyncio.to_thread(self.state.get, self._result_key(key)) is not None:
+                statuses[name] = STATUS_READY
+                continue
+            if (self._user_running(user_id) >= SPECULATION_MAX_RUNNING or
+                    await asyncio.to_thread(self.state.incr, f"speculation:budget:{user_id}", 3600)
+                    > SPECULATION_HOURLY_LIMIT):
+                statuses[name] = STATUS_LIMITED
+                self.counters["limited"] += 1
+                continue
+            self._running[key] = asyncio.get_running_loop().create_task(self._run(key, project_id, factory))
+            statuses[name] = STATUS_STARTED
+            self.counters["started"] += 1
+        return statuses
+
+    async def _run(self, key: SpeculationKey, project_id: int, factory: Callable[[], Awaitable[str]]) -> str:
+        try:
+            with usage_scope(key[0], project_id), deadline_scope(AI_ENHANCE_BUDGET):
+                result = await factory()
+            if result:
+                await asyncio.to_thread(self.state.set, self._result_key(key), result, SPECULATION_TTL)
+            return result
+        except Exception as e:
+            print(f"预先增强失败: {str(e)}")
+            return ""
+        finally:
+            if self._running.get(key) is asyncio.current_task():
+                del self._running[key]
+
+    async def take(self, user_id: int, name: str, fingerprint: str, factory: Callable[[], Awaitable[str]]) -> str:
+        """取得段落的AI结果：预先增强已完成时直接返回，进行中时等待其完成，否则立即调用 factory"""
+        key = (user_id, name, fingerprint)
+        task = self._running.get(key)
+        if task is not None:
+            self.counters["running_hits"] += 1
+            try:
+                # 当前请求超时或断开时不取消预先增强，其结果仍保存供下次使用
+                result = await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if not task.cancelled():
+                    raise
+                result = ""
+            if result:
+                return result
+        else:
+            result = await asyncio.to_thread(self.state.get, self._result_key(key))
+            if result is not None:
+                self.counters["ready_hits"] += 1
+                return result
+            self.counters["misses"] += 1
+        return await factory()
+
+    async def stop(self):
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._running.clear()
+
+    def stats(self) -> dict:
+        return {"enabled": SPECULATION_ENABLED, "running": len(self._running), **self.counters}
+
+
+# 创建全局预先增强实例
+speculative_enhancer = SpeculativeEnhancer()
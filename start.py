@@ -5,6 +5,7 @@ Prompt Generator 启动脚本
 
 import os
 import sys
+import argparse
 import subprocess
 
 def check_dependencies():
@@ -13,9 +14,11 @@ def check_dependencies():
         import fastapi
         import uvicorn
         import jinja2
-        import pillow
+        import PIL
         import passlib
-        import python_jose
+        import jose
+        import multipart
+        import httpx
         print("✅ 所有依赖包已安装")
         return True
     except ImportError as e:
@@ -30,22 +33,41 @@ def create_directories():
         os.makedirs(directory, exist_ok=True)
         print(f"✅ 创建目录: {directory}")
 
-def start_server():
+def parse_args():
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="Prompt Generator 启动器")
+    parser.add_argument("--host", default="0.0.0.0", help="监听地址")
+    parser.add_argument("--port", type=int, default=8000, help="监听端口")
+    parser.add_argument("--workers", type=int, default=1, help="worker进程数，大于1时关闭自动重载")
+    return parser.parse_args()
+
+def start_server(host: str = "0.0.0.0", port: int = 8000, workers: int = 1):
     """启动服务器"""
     print("🚀 启动 Prompt Generator...")
-    print("📱 访问地址: http://localhost:8000")
+    print(f"📱 访问地址: http://localhost:{port}")
+    if workers > 1:
+        # 多worker时验证码、限流等状态必须跨进程共享，未指定时使用本机SQLite后端
+        os.environ.setdefault("PROMPT_STATE_BACKEND", "sqlite")
+        print(f"👥 Worker数: {workers}，共享状态后端: {os.environ['PROMPT_STATE_BACKEND']}")
     print("⏹️  按 Ctrl+C 停止服务器")
     print("-" * 50)
 
     try:
         import uvicorn
-        uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+        if workers > 1:
+            uvicorn.run("main:app", host=host, port=port, workers=workers)
+        else:
+            # 单worker为开发模式，开启代码和模板的自动重载
+            os.environ.setdefault("PROMPT_TEMPLATE_AUTO_RELOAD", "1")
+            uvicorn.run("main:app", host=host, port=port, reload=True)
     except KeyboardInterrupt:
         print("\n👋 服务器已停止")
     except Exception as e:
         print(f"❌ 启动失败: {e}")
 
 if __name__ == "__main__":
+    args = parse_args()
+
     print("🎯 Prompt Generator 启动器")
     print("=" * 50)
 
@@ -54,4 +76,4 @@ if __name__ == "__main__":
 
     create_directories()
 
-    start_server()
+    start_server(args.host, args.port, args.workers)
@@ -145,6 +145,50 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 });
 
+// 生成请求的幂等键：请求内容不变时重复提交沿用同一个键，服务端直接返回第一次的结果或等待其完成
+const idempotencyKeys = new Map();
+
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return Date.now().toString(36) + Math.random().toString(36).slice(2);
+}
+
+// 发送生成请求：带 Idempotency-Key，网络错误和409（相同请求仍在处理）时用同一个键重试
+async function postGenerateRequest(url, data, retries = 2) {
+    const body = JSON.stringify(data);
+    let entry = idempotencyKeys.get(url);
+    if (!entry || entry.body !== body) {
+        entry = { body: body, key: newIdempotencyKey() };
+        idempotencyKeys.set(url, entry);
+    }
+
+    for (let attempt = 0; ; attempt++) {
+        try {
+            const response = await fetch(url, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Idempotency-Key': entry.key
+                },
+                body: body
+            });
+            if (response.status === 409 && attempt < retries) {
+                const retryAfter = parseInt(response.headers.get('Retry-After') || '2', 10);
+                await new Promise(resolve => setTimeout(resolve, retryAfter * 1000));
+                continue;
+            }
+            return response;
+        } catch (error) {
+            if (attempt >= retries) {
+                throw error;
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000 * (attempt + 1)));
+        }
+    }
+}
+
 // 添加CSS动画类
 const style = document.createElement('style');
 style.textContent = `
@@ -0,0 +1,130 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const form = document.getElementById('aiConfigForm');
+    const testButton = document.getElementById('testConnection');
+    const testResult = document.getElementById('testResult');
+
+    // 保存配置
+    form.addEventListener('submit', async function(e) {
+        e.preventDefault();
+
+        const formData = new FormData(form);
+        const data = {
+            api_url: formData.get('api_url'),
+            api_key: formData.get('api_key'),
+            model_name: formData.get('model_name')
+        };
+
+        try {
+            const response = await fetch('/profile/config', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify(data)
+            });
+
+            const result = await response.json();
+
+            showMessage(result.message, result.success ? 'success' : 'error');
+        } catch (error) {
+            showMessage('网络错误，请稍后重试', 'error');
+        }
+    });
+
+    // 测试连接
+    testButton.addEventListener('click', async function() {
+        testButton.disabled = true;
+        testButton.innerHTML = '<span class="material-icons">hourglass_empty</span> 测试中...';
+
+        try {
+            const response = await fetch('/profile/test', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ message: '你好' })
+            });
+
+            const result = await response.json();
+
+            if (result.success) {
+                showMessage(`测试成功！\n\nAI回复：${result.ai_response}`, 'success');
+            } else {
+                showMessage(`测试失败：${result.message}`, 'error');
+            }
+        } catch (error) {
+            showMessage('网络错误，请稍后重试', 'error');
+        } finally {
+            testButton.disabled = false;
+            testButton.innerHTML = '<span class="material-icons">send</span> 测试连接';
+        }
+    });
+
+    // 备用AI服务
+    const providerForm = document.getElementById('providerForm');
+    if (providerForm) {
+        providerForm.addEventListener('submit', async function(e) {
+            e.preventDefault();
+
+            const formData = new FormData(providerForm);
+            const data = {
+                name: formData.get('name'),
+                api_url: formData.get('api_url'),
+                api_key: formData.get('api_key'),
+                model_name: formData.get('model_name'),
+                priority: parseInt(formData.get('priority') || '1', 10),
+                tasks: formData.getAll('tasks')
+            };
+            if (data.tasks.length === 0) {
+                showMessage('请至少选择一项任务', 'error');
+                return;
+            }
+
+            try {
+                const response = await fetch('/profile/providers', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                    },
+                    body: JSON.stringify(data)
+                });
+                const result = await response.json();
+                if (result.success) {
+                    window.location.reload();
+                } else {
+                    showMessage(result.message || '添加失败', 'error');
+                }
+            } catch (error) {
+                showMessage('网络错误，请稍后重试', 'error');
+            }
+        });
+    }
+
+    document.querySelectorAll('.provider-delete').forEach(function(button) {
+        button.addEventListener('click', async function() {
+            if (!confirm('确定删除该备用AI服务吗？')) {
+                return;
+            }
+            try {
+                const response = await fetch(`/profile/providers/${button.dataset.id}`, { method: 'DELETE' });
+                const result = await response.json();
+                if (result.success) {
+                    button.closest('tr').remove();
+                } else {
+                    showMessage(result.message || '删除失败', 'error');
+                }
+            } catch (error) {
+                showMessage('网络错误，请稍后重试', 'error');
+            }
+        });
+    });
+
+    function showMessage(message, type) {
+        testResult.style.display = 'block';
+        testResult.className = `message-container ${type}`;
+        testResult.textContent = message;
+
+        // 自动滚动到消息区域
+        testResult.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
+    }
+});
@@ -0,0 +1,139 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // 开发规范管理
+    const standardsBall = document.getElementById('standardsBall');
+    const standardsPanel = document.getElementById('standardsPanel');
+    const standardsList = document.getElementById('standardsList');
+    const standardsCount = document.getElementById('standardsCount');
+    const addStandardBtn = document.getElementById('addStandard');
+    const closeStandardsBtn = document.getElementById('closeStandards');
+    const developmentStandardInput = document.getElementById('development_standard');
+
+    // 存储规范数据
+    let standards = [];
+
+    // 从隐藏字段加载现有规范
+    function loadExistingStandards() {
+        const value = developmentStandardInput.value;
+        if (value) {
+            // 如果是无序列表格式，解析为数组
+            if (value.includes('- ')) {
+                standards = value.split('\n')
+                    .filter(line => line.trim().startsWith('- '))
+                    .map(line => line.trim().substring(2));
+            } else {
+                // 如果是旧格式，按行分割
+                standards = value.split('\n').filter(line => line.trim());
+            }
+        }
+        updateStandardsDisplay();
+        renderStandardsList();
+    }
+
+    // 更新显示
+    function updateStandardsDisplay() {
+        standardsCount.textContent = standards.length;
+    }
+
+    // 渲染规范列表
+    function renderStandardsList() {
+        standardsList.innerHTML = '';
+        standards.forEach((standard, index) => {
+            const standardItem = document.createElement('div');
+            standardItem.className = 'standard-item';
+            standardItem.innerHTML = `
+                <input type="text" class="standard-input" value="${standard}" data-index="${index}">
+                <button type="button" class="btn-delete" data-index="${index}">删除</button>
+            `;
+            standardsList.appendChild(standardItem);
+        });
+
+        // 绑定事件
+        document.querySelectorAll('.standard-input').forEach(input => {
+            input.addEventListener('input', function() {
+                const index = parseInt(this.dataset.index);
+                standards[index] = this.value;
+                updateHiddenField();
+            });
+        });
+
+        document.querySelectorAll('.btn-delete').forEach(btn => {
+            btn.addEventListener('click', function() {
+                const index = parseInt(this.dataset.index);
+                standards.splice(index, 1);
+                updateStandardsDisplay();
+                renderStandardsList();
+                updateHiddenField();
+            });
+        });
+    }
+
+    // 更新隐藏字段
+    function updateHiddenField() {
+        const validStandards = standards.filter(standard => standard.trim());
+        const formattedStandards = validStandards.length > 0
+            ? validStandards.map(standard => `- ${standard.trim()}`).join('\n')
+            : "";
+        developmentStandardInput.value = formattedStandards;
+    }
+
+    // 圆球点击事件
+    standardsBall.addEventListener('click', function() {
+        standardsPanel.style.display = standardsPanel.style.display === 'block' ? 'none' : 'block';
+    });
+
+    // 关闭按钮
+    closeStandardsBtn.addEventListener('click', function() {
+        standardsPanel.style.display = 'none';
+    });
+
+    // 新增规范
+    addStandardBtn.addEventListener('click', function() {
+        standards.push('');
+        updateStandardsDisplay();
+        renderStandardsList();
+        updateHiddenField();
+
+        // 聚焦到新输入框
+        setTimeout(() => {
+            const newInputs = document.querySelectorAll('.standard-input');
+            if (newInputs.length > 0) {
+                newInputs[newInputs.length - 1].focus();
+            }
+        }, 100);
+    });
+
+    // 点击面板外部关闭
+    document.addEventListener('click', function(e) {
+        if (!standardsBall.contains(e.target) && !standardsPanel.contains(e.target)) {
+            standardsPanel.style.display = 'none';
+        }
+    });
+
+    // 初始化
+    loadExistingStandards();
+
+    // 表单验证
+    const form = document.querySelector('.project-form');
+
+    form.addEventListener('submit', function(e) {
+        // 只验证项目名称（唯一必填字段）
+        const nameField = document.getElementById('name');
+        if (!nameField.value.trim()) {
+            nameField.classList.add('error');
+            e.preventDefault();
+            alert('请填写项目空间名称');
+        } else {
+            nameField.classList.remove('error');
+        }
+    });
+
+    // 实时验证项目名称
+    const nameField = document.getElementById('name');
+    nameField.addEventListener('blur', function() {
+        if (!this.value.trim()) {
+            this.classList.add('error');
+        } else {
+            this.classList.remove('error');
+        }
+    });
+});
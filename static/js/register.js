@@ -0,0 +1,32 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // 加载验证码
+    function loadCaptcha() {
+        fetch('/auth/captcha')
+            .then(response => response.json())
+            .then(data => {
+                document.getElementById('captcha-image').src = data.captcha_image;
+                document.getElementById('captcha-id').value = data.captcha_id;
+            })
+            .catch(error => {
+                console.error('Error loading captcha:', error);
+            });
+    }
+
+    // 页面加载时获取验证码
+    loadCaptcha();
+
+    // 点击验证码图片刷新
+    document.getElementById('captcha-image').addEventListener('click', loadCaptcha);
+
+    // 密码确认验证
+    document.getElementById('confirm_password').addEventListener('input', function() {
+        const password = document.getElementById('password').value;
+        const confirmPassword = this.value;
+
+        if (password !== confirmPassword) {
+            this.setCustomValidity('两次输入的密码不一致');
+        } else {
+            this.setCustomValidity('');
+        }
+    });
+});
@@ -0,0 +1,14 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // 添加任务卡片悬停效果
+    const taskCards = document.querySelectorAll('.task-type-card');
+    taskCards.forEach(card => {
+        card.addEventListener('mouseenter', function() {
+            this.style.transform = 'translateY(-5px)';
+            this.style.boxShadow = 'var(--shadow-4)';
+        });
+        card.addEventListener('mouseleave', function() {
+            this.style.transform = 'translateY(0)';
+            this.style.boxShadow = 'var(--shadow-2)';
+        });
+    });
+});
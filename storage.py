@@ -1,120 +1,510 @@
-import json
 import os
+import threading
+import tempfile
+from contextlib import contextmanager
 from datetime import datetime
-from typing import List, Optional, Dict, Any
-from models import User, LoginLog, Project, ProjectCreate, ProjectUpdate, AIConfig, AIConfigCreate, AIConfigUpdate
+from typing import List, Optional, Dict, Any, Set
+from codec import dumps, loads, JSONDecodeError, parse_timestamp, normalize_timestamp, normalize_record_timestamps, TIMESTAMP_FIELDS
+from change_notifier import SharedVersion, create_notifier
+from blob_store import blob_store, is_blob_ref, blob_ref_length, BLOB_REF_KEY
+from tracing import traced
+from models import User, LoginLog, Project, ProjectSummary, ProjectCreate, ProjectUpdate, AIConfig, AIConfigCreate, AIConfigUpdate, AIProvider, AIProviderCreate
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# 进程内每个文件一把锁，跨进程通过 <文件>.lock 上的文件锁互斥
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+@contextmanager
+def file_lock(path: str):
+    """对数据文件加锁（线程间和进程间均互斥）"""
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(os.path.abspath(path), threading.Lock())
+
+    with thread_lock:
+        with open(path + ".lock", "a+b") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+# 数据文件格式版本：2 起时间字段统一为ISO格式，3 起项目的长文本字段保存在blob存储中，
+# 4 起数据按用户分片保存
+STORAGE_FORMAT_VERSION = 4
+
+# 是否在内存中缓存数据文件（通过变更通知在各worker间失效），设置 PROMPT_STORAGE_CACHE=0 关闭
+STORAGE_CACHE_ENABLED = os.environ.get("PROMPT_STORAGE_CACHE", "1") == "1"
+
+# 项目中体积较大的文本字段，列表页不需要加载
+PROJECT_CONTENT_FIELDS = ("development_standard", "interface_example", "entity_example", "mapper_example")
+
+# 项目摘要中开发规范预览的最大字符数
+SUMMARY_PREVIEW_LENGTH = 60
+
+# 每个用户最多登记的备用AI服务数量
+MAX_AI_PROVIDERS = 5
+
+def write_json_atomic(path: str, data: Any):
+    """先写临时文件再替换，读者只会看到完整的旧文件或新文件"""
+    directory = os.path.dirname(path) or "."
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(dumps(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
 
 class JSONStorage:
-    """JSON存储管理器"""
-
-    def __init__(self):
-        self.data_dir = "data"
-        self.users_file = os.path.join(self.data_dir, "users.json")
-        self.projects_file = os.path.join(self.data_dir, "projects.json")
-        self.ai_configs_file = os.path.join(self.data_dir, "ai_configs.json")
+    """JSON存储管理器
+
+    数据按用户分片保存，写操作只涉及所属用户的分片文件：
+    - data/index.json: 全局索引（邮箱/用户名 -> 用户ID，项目ID -> 用户ID，ID计数器）
+    - data/users/<用户ID>/user.json: 用户信息
+    - data/users/<用户ID>/projects.json: 用户的项目列表
+    - data/users/<用户ID>/ai_config.json: 用户的AI配置
+    """
+
+    def __init__(self, data_dir: str = "data"):
+        self.data_dir = data_dir
+        self.users_dir = os.path.join(self.data_dir, "users")
+        self.index_file = os.path.join(self.data_dir, "index.json")
+        self.format_version_file = os.path.join(self.data_dir, "format_version")
         self.logs_dir = "logs"
         self.login_log_file = os.path.join(self.logs_dir, "login.log")
 
-        # 创建必要的目录
-        os.makedirs(self.data_dir, exist_ok=True)
-        os.makedirs(self.logs_dir, exist_ok=True)
-
-        # 初始化用户文件
-        if not os.path.exists(self.users_file):
-            with open(self.users_file, 'w', encoding='utf-8') as f:
-                json.dump([], f, indent=2, ensure_ascii=False)
-
-        # 初始化项目文件
-        if not os.path.exists(self.projects_file):
-            with open(self.projects_file, 'w', encoding='utf-8') as f:
-                json.dump([], f, indent=2, ensure_ascii=False)
-
-        # 初始化AI配置文件
-        if not os.path.exists(self.ai_configs_file):
-            with open(self.ai_configs_file, 'w', encoding='utf-8') as f:
-                json.dump([], f, indent=2, ensure_ascii=False)
-
-    def _load_users(self) -> List[dict]:
-        """加载用户数据"""
+        # 旧版本的单文件数据，只在迁移时读取
+        self.legacy_users_file = os.path.join(self.data_dir, "users.json")
+        self.legacy_projects_file = os.path.join(self.data_dir, "projects.json")
+        self.legacy_ai_configs_file = os.path.join(self.data_dir, "ai_configs.json")
+
+        # 数据文件缓存：每次写入递增共享版本号，读取前发现版本变化时先处理积压的变更通知，
+        # 其他进程写入或手工修改的文件由变更通知精确失效对应的缓存条目
+        self.cache_enabled = False
+        self._cache: Dict[str, Any] = {}
+        self._cache_lock = threading.Lock()
+        self._invalidations = 0
+        self.version_file = os.path.join(self.data_dir, "cache_version")
+        self.shared_version = None
+        self.notifier = None
+
+        # 创建实例不读写任何文件（导入模块不会改动数据目录），第一次访问数据时才创建目录和索引；
+        # 旧格式数据的迁移只在应用启动（lifespan）或命令行 python storage.py 中执行
+        self._opened = False
+        self._open_lock = threading.Lock()
+
+    def _open(self):
+        """第一次访问数据时创建必要的目录、全局索引和共享版本号，并启动变更通知"""
+        if self._opened:
+            return
+        with self._open_lock:
+            if self._opened:
+                return
+
+            # 创建必要的目录
+            os.makedirs(self.users_dir, exist_ok=True)
+            os.makedirs(self.logs_dir, exist_ok=True)
+
+            # 初始化全局索引
+            if not os.path.exists(self.index_file):
+                with file_lock(self.index_file):
+                    if not os.path.exists(self.index_file):
+                        write_json_atomic(self.index_file, self._empty_index())
+
+            self.shared_version = SharedVersion(self.version_file)
+            if STORAGE_CACHE_ENABLED:
+                self._seen_version = self.shared_version.read()
+                self.notifier = create_notifier(self.data_dir, self._invalidate)
+                self.notifier.start()
+                self.cache_enabled = True
+            self._opened = True
+
+    def _lock(self, path: str):
+        """对数据文件加锁（数据目录尚未创建时先创建）"""
+        self._open()
+        return file_lock(path)
+
+    @staticmethod
+    def _empty_index() -> Dict[str, Any]:
+        return {
+            "emails": {},
+            "usernames": {},
+            "projects": {},
+            "next_user_id": 1,
+            "next_project_id": 1,
+            "next_ai_config_id": 1
+        }
+
+    def _read_json_file(self, path: str, default: Any) -> Any:
+        """读取JSON文件，不存在或损坏时返回默认值"""
         try:
-            with open(self.users_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
-
-    def _save_users(self, users: List[dict]):
-        """保存用户数据"""
-        with open(self.users_file, 'w', encoding='utf-8') as f:
-            json.dump(users, f, indent=2, ensure_ascii=False, default=str)
-
-    def _load_projects(self) -> List[dict]:
-        """加载项目数据"""
+            with open(path, 'rb') as f:
+                return loads(f.read())
+        except (FileNotFoundError, JSONDecodeError):
+            return default
+
+    def _read_json(self, path: str, default: Any, fresh: bool = False) -> Any:
+        """读取数据文件，优先使用缓存
+
+        缓存的数据由多个请求共享，调用方不能修改返回值；加锁修改数据时传 fresh=True 直接读文件。
+        """
+        self._open()
+        if fresh or not self.cache_enabled:
+            return self._read_json_file(path, default)
+
+        self._sync_cache()
+        key = os.path.abspath(path)
+        with self._cache_lock:
+            if key in self._cache:
+                value = self._cache[key]
+                return default if value is None else value
+            invalidations = self._invalidations
+
+        # 文件不存在时也缓存（记为None），文件创建时会收到变更通知
+        value = self._read_json_file(path, None)
+        with self._cache_lock:
+            # 读文件期间发生过失效时不写入缓存，避免把旧内容放回去
+            if invalidations == self._invalidations:
+                self._cache[key] = value
+        return default if value is None else value
+
+    def _sync_cache(self):
+        """共享版本号变化说明有其他进程写入过数据，先处理完已到达的变更通知"""
+        current = self.shared_version.read()
+        if current != self._seen_version:
+            self.notifier.drain()
+            self._seen_version = current
+
+    def _invalidate(self, path: Optional[str]):
+        """使文件对应的缓存失效，path 为 None 时清空全部缓存"""
+        with self._cache_lock:
+            self._invalidations += 1
+            if path is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(os.path.abspath(path), None)
+
+    def _write_json(self, path: str, data: Any):
+        """写入数据文件并通知其他进程"""
+        self._open()
+        write_json_atomic(path, data)
+        self._notify_change(path)
+
+    def _remove_file(self, path: str):
+        """删除数据文件并通知其他进程"""
+        os.remove(path)
+        self._notify_change(path)
+
+    def _notify_change(self, path: str):
+        """本进程的缓存立即失效，递增共享版本号让其他进程处理变更通知"""
+        self._invalidate(path)
+        with self._lock(self.version_file):
+            self.shared_version.bump()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """缓存状态"""
+        self._open()
+        return {
+            "enabled": self.cache_enabled,
+            "entries": len(self._cache),
+            "notifier": self.notifier.name if self.notifier else None,
+            "version": self.shared_version.read()
+        }
+
+    # 分片路径
+    def _shard_dir(self, user_id: int) -> str:
+        return os.path.join(self.users_dir, str(user_id))
+
+    def _user_file(self, user_id: int) -> str:
+        return os.path.join(self._shard_dir(user_id), "user.json")
+
+    def _projects_file(self, user_id: int) -> str:
+        return os.path.join(self._shard_dir(user_id), "projects.json")
+
+    def _ai_config_file(self, user_id: int) -> str:
+        return os.path.join(self._shard_dir(user_id), "ai_config.json")
+
+    def _write_shard_file(self, path: str, data: Any):
+        """写入分片文件（分片目录不存在时创建）"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._write_json(path, data)
+
+    # 全局索引
+    def _load_index(self, fresh: bool = False) -> Dict[str, Any]:
+        """加载全局索引"""
+        index = self._empty_index()
+        index.update(self._read_json(self.index_file, {}, fresh))
+        return index
+
+    def _save_index(self, index: Dict[str, Any]):
+        """保存全局索引（需持有索引锁）"""
+        self._write_json(self.index_file, index)
+
+    def _allocate_id(self, index: Dict[str, Any], counter: str) -> int:
+        """从索引中分配下一个ID（需持有索引锁）"""
+        new_id = index[counter]
+        index[counter] = new_id + 1
+        return new_id
+
+    def _iter_user_ids(self) -> List[int]:
+        """所有用户ID"""
+        return sorted(set(self._load_index()["emails"].values()))
+
+    def _project_owner(self, project_id: int) -> Optional[int]:
+        """项目所属用户ID"""
+        return self._load_index()["projects"].get(str(project_id))
+
+    def _read_format_version(self) -> int:
+        """读取数据文件格式版本，没有版本文件的是最早的格式"""
         try:
-            with open(self.projects_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
-
-    def _save_projects(self, projects: List[dict]):
-        """保存项目数据"""
-        with open(self.projects_file, 'w', encoding='utf-8') as f:
-            json.dump(projects, f, indent=2, ensure_ascii=False, default=str)
-
-    def _convert_project_data(self, project_data: Dict[str, Any]) -> Dict[str, Any]:
-        """转换项目数据，确保日期字段正确格式化"""
-        converted_data = project_data.copy()
-
-        # 转换日期字符串为datetime对象
-        if 'created_at' in converted_data and isinstance(converted_data['created_at'], str):
-            try:
-                converted_data['created_at'] = datetime.fromisoformat(converted_data['created_at'].replace(' ', 'T'))
-            except ValueError:
-                # 如果转换失败，尝试其他格式
-                try:
-                    converted_data['created_at'] = datetime.strptime(converted_data['created_at'], '%Y-%m-%d %H:%M:%S.%f')
-                except ValueError:
-                    # 如果还是失败，使用当前时间
-                    converted_data['created_at'] = datetime.now()
-
-        if 'updated_at' in converted_data and isinstance(converted_data['updated_at'], str):
+            with open(self.format_version_file, 'r', encoding='utf-8') as f:
+                return int(f.read().strip() or 1)
+        except (FileNotFoundError, ValueError):
+            return 1
+
+    def migrate_storage_format(self) -> int:
+        """一次性把历史格式的数据迁移为当前格式，返回迁移的记录数"""
+        self._open()
+        if self._read_format_version() >= STORAGE_FORMAT_VERSION:
+            return 0
+
+        with self._lock(self.format_version_file):
+            version = self._read_format_version()
+            if version >= STORAGE_FORMAT_VERSION:
+                return 0
+            migrated = self._migrate_flat_files(version)
+            with open(self.format_version_file, 'w', encoding='utf-8') as f:
+                f.write(str(STORAGE_FORMAT_VERSION))
+
+        if migrated:
+            print(f"🔄 已将 {migrated} 条记录迁移为数据格式 v{STORAGE_FORMAT_VERSION}")
+        return migrated
+
+    def _migrate_flat_files(self, version: int) -> int:
+        """把旧版本的单文件数据按用户拆分到分片中
+
+        逐个用户迁移，每迁移完一个用户就保存索引，中断后重新启动会从未迁移的用户继续；
+        全部完成后旧文件重命名为 *.bak 保留。
+        """
+        legacy_files = (self.legacy_users_file, self.legacy_projects_file, self.legacy_ai_configs_file)
+        if not any(os.path.exists(path) for path in legacy_files):
+            return 0
+
+        users = self._read_json_file(self.legacy_users_file, [])
+        projects = self._read_json_file(self.legacy_projects_file, [])
+        ai_configs = self._read_json_file(self.legacy_ai_configs_file, [])
+
+        # 先完成历史版本的格式转换：v2 统一时间格式，v3 长文本移入blob存储
+        for record in users + projects + ai_configs:
+            if version < 2:
+                normalize_record_timestamps(record)
+        if version < 3:
+            for record in projects:
+                self._pack_project_fields(record)
+
+        projects_by_user: Dict[int, List[dict]] = {}
+        for project in projects:
+            projects_by_user.setdefault(project['user_id'], []).append(project)
+        ai_config_by_user = {config['user_id']: config for config in ai_configs}
+
+        migrated = 0
+        with self._lock(self.index_file):
+            index = self._load_index(fresh=True)
+            for user in users:
+                user_id = user['id']
+                user_projects = projects_by_user.get(user_id, [])
+                if user['email'] not in index["emails"]:
+                    self._write_shard_file(self._projects_file(user_id), user_projects)
+                    if user_id in ai_config_by_user:
+                        self._write_shard_file(self._ai_config_file(user_id), ai_config_by_user[user_id])
+                    self._write_shard_file(self._user_file(user_id), user)
+
+                    index["emails"][user['email']] = user_id
+                    index["usernames"][user['username']] = user_id
+                    for project in user_projects:
+                        index["projects"][str(project['id'])] = user_id
+                    migrated += 1 + len(user_projects) + (user_id in ai_config_by_user)
+
+                index["next_user_id"] = max(index["next_user_id"], user_id + 1)
+                index["next_project_id"] = max([index["next_project_id"]] + [p['id'] + 1 for p in user_projects])
+                if user_id in ai_config_by_user:
+                    index["next_ai_config_id"] = max(index["next_ai_config_id"], ai_config_by_user[user_id].get('id', 0) + 1)
+                self._save_index(index)
+
+        orphans = sum(len(items) for user_id, items in projects_by_user.items()
+                      if user_id not in {u['id'] for u in users})
+        if orphans:
+            print(f"⚠️  {orphans} 个项目找不到所属用户，未迁移（保留在备份文件中）")
+
+        for path in legacy_files:
+            if os.path.exists(path):
+                os.replace(path, path + ".bak")
+        return migrated
+
+    # 用户分片读写
+    def _load_projects(self, user_id: int, fresh: bool = False) -> List[dict]:
+        """加载用户的项目数据"""
+        return self._read_json(self._projects_file(user_id), [], fresh)
+
+    def _save_projects(self, user_id: int, projects: List[dict]):
+        """保存用户的项目数据（需持有该分片的项目文件锁）"""
+        self._write_shard_file(self._projects_file(user_id), projects)
+
+    def _load_ai_config(self, user_id: int, fresh: bool = False) -> Optional[dict]:
+        """加载用户的AI配置数据"""
+        return self._read_json(self._ai_config_file(user_id), None, fresh)
+
+    def _save_ai_config(self, user_id: int, ai_config: dict):
+        """保存用户的AI配置数据（需持有该分片的AI配置文件锁）"""
+        self._write_shard_file(self._ai_config_file(user_id), ai_config)
+
+    def _convert_timestamps(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """把记录中的时间字段解析为datetime（存储中统一为ISO格式，历史格式在启动时迁移）"""
+        converted_data = record.copy()
+        for field in TIMESTAMP_FIELDS:
+            if field not in converted_data:
+                continue
             try:
-                converted_data['updated_at'] = datetime.fromisoformat(converted_data['updated_at'].replace(' ', 'T'))
+                converted_data[field] = parse_timestamp(converted_data[field])
             except ValueError:
+                # 迁移后仍可能有其他进程写入的旧格式数据，兜底按历史格式解析
                 try:
-                    converted_data['updated_at'] = datetime.strptime(converted_data['updated_at'], '%Y-%m-%d %H:%M:%S.%f')
+                    converted_data[field] = parse_timestamp(normalize_timestamp(converted_data[field]))
                 except ValueError:
-                    converted_data['updated_at'] = datetime.now()
-
+                    converted_data[field] = datetime.now()
         return converted_data
 
+    def _convert_project_data(self, project_data: Dict[str, Any]) -> Dict[str, Any]:
+        """转换项目数据，确保日期字段正确格式化"""
+        return self._convert_timestamps(project_data)
+
+    def _pack_project_fields(self, record: Dict[str, Any]) -> bool:
+        """把项目记录中的长文本字段移入blob存储，返回是否有修改"""
+        changed = False
+        for field in PROJECT_CONTENT_FIELDS:
+            value = record.get(field)
+            packed = blob_store.pack(value)
+            if packed is not value:
+                record[field] = packed
+                changed = True
+        return changed
+
+    def _build_project(self, project_data: Dict[str, Any]) -> Project:
+        """由存储数据构建项目模型，blob引用还原为文本"""
+        converted_data = self._convert_project_data(project_data)
+        for field in PROJECT_CONTENT_FIELDS:
+            if is_blob_ref(converted_data.get(field)):
+                converted_data[field] = blob_store.unpack(converted_data[field])
+        return Project.model_construct(**converted_data)
+
+    def collect_unused_blobs(self) -> int:
+        """清理不再被任何项目引用的blob，返回删除的文件数
+
+        只删除超过保留时间的blob，避免误删其他分片刚写入、尚未保存引用的内容。
+        """
+        return blob_store.collect_garbage(self._referenced_blobs())
+
+    @staticmethod
+    def _project_blobs(record: Dict[str, Any]) -> Set[str]:
+        """项目记录引用的blob哈希"""
+        return {record[field][BLOB_REF_KEY] for field in PROJECT_CONTENT_FIELDS if is_blob_ref(record.get(field))}
+
+    def _referenced_blobs(self) -> Set[str]:
+        """全部项目引用的blob哈希"""
+        referenced = set()
+        for user_id in self._iter_user_ids():
+            for project in self._load_projects(user_id):
+                referenced |= self._project_blobs(project)
+        return referenced
+
+    def _release_blobs(self, blob_hashes: Set[str]) -> int:
+        """项目更新或删除后，删除不再被任何项目引用的blob（相同内容可能被其他项目共用）"""
+        if not blob_hashes:
+            return 0
+        return blob_store.release(blob_hashes - self._referenced_blobs())
+
+    def _build_user(self, user_data: Dict[str, Any]) -> User:
+        """由存储数据构建用户模型（数据由本系统写入，跳过校验）"""
+        return User.model_construct(**self._convert_timestamps(user_data))
+
+    def warmup(self) -> Dict[str, int]:
+        """预热存储：读取索引、清理无用blob，返回各类数据的条数"""
+        index = self._load_index()
+        user_ids = self._iter_user_ids()
+        return {
+            "users": len(user_ids),
+            "projects": len(index["projects"]),
+            "ai_configs": sum(1 for user_id in user_ids if os.path.exists(self._ai_config_file(user_id))),
+            "blobs_removed": self.collect_unused_blobs()
+        }
+
+    def get_ai_api_urls(self) -> List[str]:
+        """获取所有已配置的AI服务地址（用于预热连接池）"""
+        urls = []
+        for user_id in self._iter_user_ids():
+            ai_config = self._load_ai_config(user_id)
+            if ai_config and ai_config.get('api_url'):
+                urls.append(ai_config['api_url'])
+            urls.extend(provider['api_url'] for provider in (ai_config or {}).get('providers', []))
+        return urls
+
+    def _get_user_by_id(self, user_id: Optional[int]) -> Optional[User]:
+        """通过ID读取用户分片"""
+        if user_id is None:
+            return None
+        user_data = self._read_json(self._user_file(user_id), None)
+        return self._build_user(user_data) if user_data else None
+
+    @traced("storage.get_user_by_email")
     def get_user_by_email(self, email: str) -> Optional[User]:
         """通过邮箱获取用户"""
-        users = self._load_users()
-        for user_data in users:
-            if user_data['email'] == email:
-                return User(**user_data)
-        return None
+        return self._get_user_by_id(self._load_index()["emails"].get(email))
 
+    @traced("storage.get_user_by_username")
     def get_user_by_username(self, username: str) -> Optional[User]:
         """通过用户名获取用户"""
-        users = self._load_users()
-        for user_data in users:
-            if user_data['username'] == username:
-                return User(**user_data)
-        return None
+        return self._get_user_by_id(self._load_index()["usernames"].get(username))
 
+    @traced("storage.create_user")
     def create_user(self, user: User) -> User:
         """创建新用户"""
-        users = self._load_users()
-
-        # 获取下一个ID
-        max_id = max([u.get('id', 0) for u in users], default=0)
-        user.id = max_id + 1
-        user.created_at = datetime.now()
-
-        users.append(user.dict())
-        self._save_users(users)
-        return user
+        with self._lock(self.index_file):
+            index = self._load_index(fresh=True)
+
+            # 加锁后再次检查唯一性，防止多个worker同时注册
+            if user.email in index["emails"]:
+                raise ValueError("该邮箱已被注册")
+            if user.username in index["usernames"]:
+                raise ValueError("该用户名已被使用")
+
+            user.id = self._allocate_id(index, "next_user_id")
+            user.created_at = datetime.now()
+
+            # 先写用户分片再更新索引，索引中的用户一定存在
+            self._write_shard_file(self._user_file(user.id), user.dict())
+            self._write_shard_file(self._projects_file(user.id), [])
+            index["emails"][user.email] = user.id
+            index["usernames"][user.username] = user.id
+            self._save_index(index)
+            return user
 
     def log_login(self, email: str, username: str, ip_address: str = None, user_agent: str = None):
         """记录登录日志"""
@@ -128,198 +518,272 @@ class JSONStorage:
 
         log_entry += "\n"
 
+        self._open()
         with open(self.login_log_file, 'a', encoding='utf-8') as f:
             f.write(log_entry)
 
     # 项目管理方法
+    @traced("storage.get_projects_by_user_id")
     def get_projects_by_user_id(self, user_id: int) -> List[Project]:
         """获取用户的项目列表"""
-        projects = self._load_projects()
-        user_projects = []
-        for project_data in projects:
-            if project_data['user_id'] == user_id:
-                converted_data = self._convert_project_data(project_data)
-                user_projects.append(Project(**converted_data))
-        return user_projects
+        return [self._build_project(project_data) for project_data in self._load_projects(user_id)]
+
+    @traced("storage.get_project_summaries_by_user_id")
+    def get_project_summaries_by_user_id(self, user_id: int) -> List[ProjectSummary]:
+        """获取用户的项目摘要列表（只取列表页需要的字段，不构建完整的项目模型）"""
+        return [self._summarize_project(project_data) for project_data in self._load_projects(user_id)]
+
+    def _summarize_project(self, project_data: Dict[str, Any]) -> ProjectSummary:
+        """从原始项目数据生成摘要，大文本字段只统计长度和截取预览"""
+        # 规范以每行一条保存（保存时已过滤空行），只计数换行、截取首行，不复制整段文本
+        standard = project_data.get('development_standard') or ""
+        if is_blob_ref(standard):
+            # 行数和首行预览都记录在blob引用中，不读取blob内容
+            standards_count = standard.get("lines", 0)
+            standard = standard.get("preview", "")
+        else:
+            has_standard = bool(standard) and not standard.isspace()
+            standards_count = standard.count("\n") + 1 if has_standard else 0
+        first_line_end = standard.find("\n")
+        preview = standard[:first_line_end if first_line_end >= 0 else None].strip().lstrip("- ")
+        if len(preview) > SUMMARY_PREVIEW_LENGTH:
+            preview = preview[:SUMMARY_PREVIEW_LENGTH] + "…"
+
+        dates = self._convert_project_data({
+            key: project_data[key] for key in ('created_at', 'updated_at') if key in project_data
+        })
+        return ProjectSummary(
+            id=project_data['id'],
+            user_id=project_data['user_id'],
+            name=project_data['name'],
+            created_at=dates.get('created_at'),
+            updated_at=dates.get('updated_at'),
+            standards_count=standards_count,
+            content_size=sum(blob_ref_length(project_data.get(field)) for field in PROJECT_CONTENT_FIELDS),
+            preview=preview
+        )
 
+    def count_projects_by_user_id(self, user_id: int) -> int:
+        """统计用户的项目数量"""
+        return len(self._load_projects(user_id))
+
+    @traced("storage.get_project_by_id")
     def get_project_by_id(self, project_id: int) -> Optional[Project]:
         """通过ID获取项目"""
-        projects = self._load_projects()
-        for project_data in projects:
+        user_id = self._project_owner(project_id)
+        if user_id is None:
+            return None
+        for project_data in self._load_projects(user_id):
             if project_data['id'] == project_id:
-                converted_data = self._convert_project_data(project_data)
-                return Project(**converted_data)
+                return self._build_project(project_data)
         return None
 
+    @traced("storage.create_project")
     def create_project(self, user_id: int, project_data: ProjectCreate) -> Project:
         """创建新项目"""
-        projects = self._load_projects()
-
-        # 检查用户项目数量限制
-        user_projects = [p for p in projects if p['user_id'] == user_id]
-        if len(user_projects) >= 5:
-            raise ValueError("每个用户最多只能创建5个项目")
-
-        # 获取下一个ID
-        max_id = max([p.get('id', 0) for p in projects], default=0)
-        project_id = max_id + 1
-
-        now = datetime.now()
-        project = Project(
-            id=project_id,
-            user_id=user_id,
-            name=project_data.name,
-            development_standard=project_data.development_standard,
-            interface_example=project_data.interface_example,
-            entity_example=project_data.entity_example,
-            mapper_example=project_data.mapper_example,
-            created_at=now,
-            updated_at=now
-        )
-
-        projects.append(project.dict())
-        self._save_projects(projects)
-        return project
-
+        projects_file = self._projects_file(user_id)
+        with self._lock(projects_file):
+            projects = self._load_projects(user_id, fresh=True)
+
+            # 检查用户项目数量限制
+            if len(projects) >= 5:
+                raise ValueError("每个用户最多只能创建5个项目")
+
+            # 分配ID并登记到索引（先登记再写分片，索引中找不到的项目一定不存在）
+            with self._lock(self.index_file):
+                index = self._load_index(fresh=True)
+                project_id = self._allocate_id(index, "next_project_id")
+                index["projects"][str(project_id)] = user_id
+                self._save_index(index)
+
+            now = datetime.now()
+            project = Project(
+                id=project_id,
+                user_id=user_id,
+                name=project_data.name,
+                development_standard=project_data.development_standard,
+                interface_example=project_data.interface_example,
+                entity_example=project_data.entity_example,
+                mapper_example=project_data.mapper_example,
+                created_at=now,
+                updated_at=now
+            )
+
+            record = project.dict()
+            self._pack_project_fields(record)
+            projects.append(record)
+            self._save_projects(user_id, projects)
+            return project
+
+    @traced("storage.update_project")
     def update_project(self, project_id: int, update_data: ProjectUpdate) -> Optional[Project]:
         """更新项目信息"""
-        projects = self._load_projects()
-
-        for i, project_data in enumerate(projects):
-            if project_data['id'] == project_id:
-                # 更新提供的数据
-                update_dict = update_data.dict(exclude_unset=True)
-                if update_dict:
-                    projects[i].update(update_dict)
-                    projects[i]['updated_at'] = datetime.now().isoformat()
-
-                self._save_projects(projects)
-                converted_data = self._convert_project_data(projects[i])
-                return Project(**converted_data)
-
-        return None
-
+        user_id = self._project_owner(project_id)
+        if user_id is None:
+            return None
+
+        with self._lock(self._projects_file(user_id)):
+            projects = self._load_projects(user_id, fresh=True)
+
+            for i, project_data in enumerate(projects):
+                if project_data['id'] == project_id:
+                    # 更新提供的数据
+                    update_dict = update_data.dict(exclude_unset=True)
+                    old_blobs = self._project_blobs(project_data)
+                    if update_dict:
+                        self._pack_project_fields(update_dict)
+                        projects[i].update(update_dict)
+                        projects[i]['updated_at'] = datetime.now().isoformat()
+
+                    self._save_projects(user_id, projects)
+                    self._release_blobs(old_blobs - self._project_blobs(projects[i]))
+                    return self._build_project(projects[i])
+
+            return None
+
+    @traced("storage.delete_project")
     def delete_project(self, project_id: int) -> bool:
         """删除项目"""
-        projects = self._load_projects()
-
-        for i, project_data in enumerate(projects):
-            if project_data['id'] == project_id:
-                del projects[i]
-                self._save_projects(projects)
-                return True
-
-        return False
+        user_id = self._project_owner(project_id)
+        if user_id is None:
+            return False
+
+        with self._lock(self._projects_file(user_id)):
+            projects = self._load_projects(user_id, fresh=True)
+
+            for i, project_data in enumerate(projects):
+                if project_data['id'] == project_id:
+                    del projects[i]
+                    self._save_projects(user_id, projects)
+                    with self._lock(self.index_file):
+                        index = self._load_index(fresh=True)
+                        index["projects"].pop(str(project_id), None)
+                        self._save_index(index)
+                    self._release_blobs(self._project_blobs(project_data))
+                    return True
+
+            return False
 
     def can_create_project(self, user_id: int) -> bool:
         """检查用户是否可以创建新项目"""
-        user_projects = self.get_projects_by_user_id(user_id)
-        return len(user_projects) < 5
-
-    def _load_ai_configs(self) -> List[dict]:
-        """加载AI配置数据"""
-        try:
-            with open(self.ai_configs_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
-
-    def _save_ai_configs(self, ai_configs: List[dict]):
-        """保存AI配置数据"""
-        with open(self.ai_configs_file, 'w', encoding='utf-8') as f:
-            json.dump(ai_configs, f, indent=2, ensure_ascii=False, default=str)
+        return self.count_projects_by_user_id(user_id) < 5
 
     def _convert_ai_config_data(self, ai_config_data: Dict[str, Any]) -> Dict[str, Any]:
         """转换AI配置数据，确保日期字段正确格式化"""
-        converted_data = ai_config_data.copy()
-
-        # 转换日期字符串为datetime对象
-        if 'created_at' in converted_data and isinstance(converted_data['created_at'], str):
-            try:
-                converted_data['created_at'] = datetime.fromisoformat(converted_data['created_at'].replace(' ', 'T'))
-            except ValueError:
-                try:
-                    converted_data['created_at'] = datetime.strptime(converted_data['created_at'], '%Y-%m-%d %H:%M:%S.%f')
-                except ValueError:
-                    converted_data['created_at'] = datetime.now()
-
-        if 'updated_at' in converted_data and isinstance(converted_data['updated_at'], str):
-            try:
-                converted_data['updated_at'] = datetime.fromisoformat(converted_data['updated_at'].replace(' ', 'T'))
-            except ValueError:
-                try:
-                    converted_data['updated_at'] = datetime.strptime(converted_data['updated_at'], '%Y-%m-%d %H:%M:%S.%f')
-                except ValueError:
-                    converted_data['updated_at'] = datetime.now()
-
+        converted_data = self._convert_timestamps(ai_config_data)
+        converted_data['providers'] = [
+            AIProvider.model_construct(**self._convert_timestamps(provider))
+            for provider in ai_config_data.get('providers', [])
+        ]
         return converted_data
 
+    @traced("storage.get_ai_config_by_user_id")
     def get_ai_config_by_user_id(self, user_id: int) -> Optional[AIConfig]:
         """通过用户ID获取AI配置"""
-        ai_configs = self._load_ai_configs()
-        for ai_config_data in ai_configs:
-            if ai_config_data['user_id'] == user_id:
-                converted_data = self._convert_ai_config_data(ai_config_data)
-                return AIConfig(**converted_data)
-        return None
+        ai_config_data = self._load_ai_config(user_id)
+        if ai_config_data is None:
+            return None
+        converted_data = self._convert_ai_config_data(ai_config_data)
+        return AIConfig.model_construct(**converted_data)
 
+    @traced("storage.create_ai_config")
     def create_ai_config(self, user_id: int, ai_config_data: AIConfigCreate) -> AIConfig:
         """创建AI配置"""
-        ai_configs = self._load_ai_configs()
-
-        # 检查用户是否已有AI配置
-        for config in ai_configs:
-            if config['user_id'] == user_id:
+        with self._lock(self._ai_config_file(user_id)):
+            # 检查用户是否已有AI配置
+            if self._load_ai_config(user_id, fresh=True) is not None:
                 raise ValueError("用户已存在AI配置")
 
-        # 获取下一个ID
-        max_id = max([c.get('id', 0) for c in ai_configs], default=0)
-        ai_config_id = max_id + 1
-
-        now = datetime.now()
-        ai_config = AIConfig(
-            id=ai_config_id,
-            user_id=user_id,
-            api_key=ai_config_data.api_key,
-            api_url=ai_config_data.api_url,
-            model_name=ai_config_data.model_name,
-            created_at=now,
-            updated_at=now
-        )
-
-        ai_configs.append(ai_config.dict())
-        self._save_ai_configs(ai_configs)
-        return ai_config
-
+            with self._lock(self.index_file):
+                index = self._load_index(fresh=True)
+                ai_config_id = self._allocate_id(index, "next_ai_config_id")
+                self._save_index(index)
+
+            now = datetime.now()
+            ai_config = AIConfig(
+                id=ai_config_id,
+                user_id=user_id,
+                api_key=ai_config_data.api_key,
+                api_url=ai_config_data.api_url,
+                model_name=ai_config_data.model_name,
+                created_at=now,
+                updated_at=now
+            )
+
+            self._save_ai_config(user_id, ai_config.dict())
+            return ai_config
+
+    @traced("storage.add_ai_provider")
+    def add_ai_provider(self, user_id: int, provider_data: AIProviderCreate) -> AIProvider:
+        """登记备用AI服务（需先有默认AI配置）"""
+        with self._lock(self._ai_config_file(user_id)):
+            ai_config_data = self._load_ai_config(user_id, fresh=True)
+            if ai_config_data is None:
+                raise ValueError("请先配置默认AI服务")
+
+            providers = ai_config_data.get('providers', [])
+            if len(providers) >= MAX_AI_PROVIDERS:
+                raise ValueError(f"最多登记{MAX_AI_PROVIDERS}个备用AI服务")
+
+            provider = AIProvider(
+                id=max((p['id'] for p in providers), default=0) + 1,
+                created_at=datetime.now(),
+                **provider_data.dict()
+            )
+            ai_config_data['providers'] = providers + [provider.dict()]
+            ai_config_data['updated_at'] = datetime.now().isoformat()
+            self._save_ai_config(user_id, ai_config_data)
+            return provider
+
+    @traced("storage.delete_ai_provider")
+    def delete_ai_provider(self, user_id: int, provider_id: int) -> bool:
+        """删除备用AI服务"""
+        with self._lock(self._ai_config_file(user_id)):
+            ai_config_data = self._load_ai_config(user_id, fresh=True)
+            if ai_config_data is None:
+                return False
+
+            providers = ai_config_data.get('providers', [])
+            remaining = [p for p in providers if p['id'] != provider_id]
+            if len(remaining) == len(providers):
+                return False
+            ai_config_data['providers'] = remaining
+            ai_config_data['updated_at'] = datetime.now().isoformat()
+            self._save_ai_config(user_id, ai_config_data)
+            return True
+
+    @traced("storage.update_ai_config")
     def update_ai_config(self, user_id: int, update_data: AIConfigUpdate) -> Optional[AIConfig]:
         """更新AI配置"""
-        ai_configs = self._load_ai_configs()
-
-        for i, ai_config_data in enumerate(ai_configs):
-            if ai_config_data['user_id'] == user_id:
-                # 更新提供的数据
-                update_dict = update_data.dict(exclude_unset=True)
-                if update_dict:
-                    ai_configs[i].update(update_dict)
-                    ai_configs[i]['updated_at'] = datetime.now().isoformat()
-
-                self._save_ai_configs(ai_configs)
-                converted_data = self._convert_ai_config_data(ai_configs[i])
-                return AIConfig(**converted_data)
-
-        return None
-
+        with self._lock(self._ai_config_file(user_id)):
+            ai_config_data = self._load_ai_config(user_id, fresh=True)
+            if ai_config_data is None:
+                return None
+
+            # 更新提供的数据
+            update_dict = update_data.dict(exclude_unset=True)
+            if update_dict:
+                ai_config_data.update(update_dict)
+                ai_config_data['updated_at'] = datetime.now().isoformat()
+
+            self._save_ai_config(user_id, ai_config_data)
+            converted_data = self._convert_ai_config_data(ai_config_data)
+            return AIConfig.model_construct(**converted_data)
+
+    @traced("storage.delete_ai_config")
     def delete_ai_config(self, user_id: int) -> bool:
         """删除AI配置"""
-        ai_configs = self._load_ai_configs()
-
-        for i, ai_config_data in enumerate(ai_configs):
-            if ai_config_data['user_id'] == user_id:
-                del ai_configs[i]
-                self._save_ai_configs(ai_configs)
-                return True
-
-        return False
+        ai_config_file = self._ai_config_file(user_id)
+        with self._lock(ai_config_file):
+            if not os.path.exists(ai_config_file):
+                return False
+            self._remove_file(ai_config_file)
+            return True
 
 # 创建全局存储实例
 storage = JSONStorage()
+
+if __name__ == "__main__":
+    # 手动迁移旧格式的数据: python storage.py
+    migrated = storage.migrate_storage_format()
+    print(f"✅ 数据格式 v{STORAGE_FORMAT_VERSION}，本次迁移 {migrated} 条记录")
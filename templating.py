@@ -0,0 +1,115 @@
+import os
+import threading
+from collections import OrderedDict
+
+from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+from assets import asset_url
+
+TEMPLATES_DIR = "templates"
+
+# 编译后的模板字节码缓存目录，worker重启后无需重新编译
+BYTECODE_CACHE_DIR = os.path.join(".cache", "jinja")
+
+# 开发时通过 PROMPT_TEMPLATE_AUTO_RELOAD=1 开启模板自动重载（同时关闭片段缓存）
+AUTO_RELOAD = os.environ.get("PROMPT_TEMPLATE_AUTO_RELOAD", "0") == "1"
+
+# 片段缓存最多保存的条目数
+FRAGMENT_CACHE_SIZE = 256
+
+
+class FragmentCache:
+    """模板片段渲染结果的LRU缓存"""
+
+    def __init__(self, max_entries: int = FRAGMENT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FragmentCacheExtension(Extension):
+    """片段缓存标签
+
+    用法: {% cache "片段名" %}...{% endcache %}
+    片段内容依赖变量时把变量作为附加键: {% cache "片段名", project.id %}...{% endcache %}
+    """
+
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=FragmentCache(), fragment_cache_enabled=True)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        call = self.call_method("_render_cached", [nodes.List(args)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render_cached(self, key_parts, caller):
+        if not self.environment.fragment_cache_enabled:
+            return caller()
+        key = tuple(str(part) for part in key_parts)
+        cached = self.environment.fragment_cache.get(key)
+        if cached is not None:
+            return cached
+        rendered = caller()
+        self.environment.fragment_cache.set(key, rendered)
+        return rendered
+
+
+def _create_templates() -> Jinja2Templates:
+    """创建全局共享的模板对象"""
+    os.makedirs(BYTECODE_CACHE_DIR, exist_ok=True)
+    shared_templates = Jinja2Templates(
+        directory=TEMPLATES_DIR,
+        auto_reload=AUTO_RELOAD,
+        bytecode_cache=FileSystemBytecodeCache(BYTECODE_CACHE_DIR),
+        extensions=[FragmentCacheExtension],
+    )
+    shared_templates.env.fragment_cache_enabled = not AUTO_RELOAD
+    shared_templates.env.globals["asset_url"] = asset_url
+    return shared_templates
+
+
+def precompile_templates() -> int:
+    """预编译所有模板，返回编译的模板数量"""
+    names = templates.env.list_templates(extensions=["html"])
+    for name in names:
+        templates.env.get_template(name)
+    return len(names)
+
+
+# 创建全局模板实例，应用和所有路由共用
+templates = _create_templates()
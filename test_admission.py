@@ -0,0 +1,34 @@
+"""
+准入控制测试
+"""
+
+from admission import AdmissionController, LOOP_LAG_SUSTAIN_SAMPLES, classify_route
+
+
+def test_single_lag_spike_does_not_shed():
+    controller = AdmissionController(shed_lag_ms=200)
+    # 启动后第一次采样就遇到一次bcrypt计算
+    controller.monitor.record(1500)
+    assert not controller.overloaded(controller.classes["ai"])
+
+    for _ in range(LOOP_LAG_SUSTAIN_SAMPLES):
+        controller.monitor.record(1.0)
+    assert not controller.overloaded(controller.classes["ai"])
+
+
+def test_sustained_lag_sheds_low_priority_only():
+    controller = AdmissionController(shed_lag_ms=200, critical_lag_ms=1000)
+    for _ in range(LOOP_LAG_SUSTAIN_SAMPLES + 3):
+        controller.monitor.record(500)
+
+    assert controller.overloaded(controller.classes["ai"])
+    assert not controller.overloaded(controller.classes["storage"])
+    assert not controller.overloaded(controller.classes["page"])
+
+
+def test_classify_route():
+    assert classify_route("POST", "/tasks/generate-ai-enhanced-prompt") == "ai"
+    assert classify_route("POST", "/auth/login") == "auth"
+    assert classify_route("GET", "/auth/captcha") == "captcha"
+    assert classify_route("GET", "/projects/1/interface") == "page"
+    assert classify_route("GET", "/tasks/1/history") == "storage"
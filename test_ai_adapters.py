@@ -0,0 +1,178 @@
+"""
+AI服务适配器测试：请求构建、响应和流式数据块解析、错误归类
+"""
+
+import json
+import asyncio
+
+import httpx
+import pytest
+
+import ai_adapters
+from ai_adapters import AIServiceError, OfflineAdapter, adapter_for, complete_chat
+from models import AIProvider
+
+
+def make_provider(api_url: str) -> AIProvider:
+    return AIProvider(id=1, name="测试", api_key="sk-test", api_url=api_url, model_name="model-x")
+
+
+def sse(*events) -> bytes:
+    lines = []
+    for event in events:
+        lines.append(event if isinstance(event, str) else "data: " + json.dumps(event))
+        lines.append("")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """让适配器把请求发给本地处理函数，返回收到的请求列表"""
+    requests = []
+
+    def install(handler):
+        def record(request: httpx.Request) -> httpx.Response:
+            requests.append(request)
+            return handler(request)
+        client = httpx.AsyncClient(transport=httpx.MockTransport(record))
+        monkeypatch.setattr(ai_adapters, "get_http_client", lambda: client)
+        return requests
+
+    return install
+
+
+def call(api_url: str, stream: bool = False):
+    return asyncio.run(complete_chat(make_provider(api_url), "你好", 100, stream=stream))
+
+
+def test_adapter_selection():
+    assert adapter_for("https://api.openai.com/v1/chat/completions").name == "openai"
+    assert adapter_for("https://api.anthropic.com/v1/messages").name == "anthropic"
+    assert adapter_for("https://proxy.example.com/anthropic/v1/messages/").name == "anthropic"
+    assert adapter_for("offline://local").name == "offline"
+    assert adapter_for("").name == "openai"
+
+
+def test_openai_response(serve):
+    requests = serve(lambda request: httpx.Response(200, json={
+        "choices": [{"message": {"content": "答复"}}], "usage": {"prompt_tokens": 12, "completion_tokens": 3}}))
+    completion = call("https://api.openai.com/v1/chat/completions")
+    assert (completion.content, completion.prompt_tokens, completion.completion_tokens) == ("答复", 12, 3)
+
+    body = json.loads(requests[0].content)
+    assert requests[0].headers["authorization"] == "Bearer sk-test"
+    assert body["model"] == "model-x" and body["max_tokens"] == 100 and "stream" not in body
+    assert body["messages"] == [{"role": "user", "content": "你好"}]
+
+
+def test_openai_stream_chunks(serve):
+    serve(lambda request: httpx.Response(200, content=sse(
+        ": keep-alive",
+        {"choices": [{"delta": {"role": "assistant"}}]},
+        {"choices": [{"delta": {"content": "分段"}}]},
+        {"choices": [{"delta": {"content": "答复"}}]},
+        {"choices": [], "usage": {"prompt_tokens": 7, "completion_tokens": 2}},
+        "data: [DONE]",
+        {"choices": [{"delta": {"content": "结束后的内容"}}]},
+    )))
+    completion = call("https://api.openai.com/v1/chat/completions", stream=True)
+    assert (completion.content, completion.prompt_tokens, completion.completion_tokens) == ("分段答复", 7, 2)
+
+
+def test_anthropic_response(serve):
+    requests = serve(lambda request: httpx.Response(200, json={
+        "content": [{"type": "text", "text": "第一段"}, {"type": "tool_use"}, {"type": "text", "text": "第二段"}],
+        "usage": {"input_tokens": 20, "output_tokens": 4}}))
+    completion = call("https://api.anthropic.com/v1/messages")
+    assert (completion.content, completion.prompt_tokens, completion.completion_tokens) == ("第一段第二段", 20, 4)
+    assert requests[0].headers["x-api-key"] == "sk-test"
+    assert requests[0].headers["anthropic-version"] == ai_adapters.ANTHROPIC_VERSION
+
+
+def test_anthropic_stream_events(serve):
+    serve(lambda request: httpx.Response(200, content=sse(
+        "event: message_start",
+        {"type": "message_start", "message": {"usage": {"input_tokens": 9}}},
+        {"type": "content_block_start", "index": 0},
+        {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "流式"}},
+        {"type": "content_block_delta", "delta": {"type": "input_json_delta", "partial_json": "{"}},
+        {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "答复"}},
+        {"type": "message_delta", "usage": {"output_tokens": 3}},
+        {"type": "message_stop"},
+        {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "结束后的内容"}},
+    )))
+    completion = call("https://api.anthropic.com/v1/messages", stream=True)
+    assert (completion.content, completion.prompt_tokens, completion.completion_tokens) == ("流式答复", 9, 3)
+
+
+@pytest.mark.parametrize("api_url, response", [
+    ("https://api.openai.com/v1/chat/completions", httpx.Response(200, text="<html>网关错误</html>")),
+    ("https://api.openai.com/v1/chat/completions", httpx.Response(200, json={"choices": []})),
+    ("https://api.openai.com/v1/chat/completions", httpx.Response(200, json={"choices": [{"text": "旧接口"}]})),
+    ("https://api.openai.com/v1/chat/completions", httpx.Response(200, json=["不是对象"])),
+    ("https://api.anthropic.com/v1/messages", httpx.Response(200, json={"content": "不是列表"})),
+    ("https://api.anthropic.com/v1/messages", httpx.Response(200, json={"type": "message"})),
+])
+def test_malformed_responses_raise_service_error(serve, api_url, response):
+    serve(lambda request: response)
+    with pytest.raises(AIServiceError, match="格式异常"):
+        call(api_url)
+
+
+@pytest.mark.parametrize("api_url, body", [
+    ("https://api.openai.com/v1/chat/completions", b"data: {not json}\n\n"),
+    ("https://api.openai.com/v1/chat/completions", sse({"choices": [{"delta": "不是对象"}]})),
+    ("https://api.openai.com/v1/chat/completions", sse([1, 2])),
+    ("https://api.anthropic.com/v1/messages", sse({"type": "content_block_delta"})),
+    ("https://api.anthropic.com/v1/messages", sse({"type": "message_start", "message": "不是对象"})),
+])
+def test_malformed_stream_chunks_raise_service_error(serve, api_url, body):
+    serve(lambda request: httpx.Response(200, content=body))
+    with pytest.raises(AIServiceError, match="流式响应格式异常"):
+        call(api_url, stream=True)
+
+
+def test_error_responses(serve):
+    serve(lambda request: httpx.Response(429, json={"error": {"message": "请求过于频繁"}}))
+    with pytest.raises(AIServiceError, match=r"\(429\): 请求过于频繁"):
+        call("https://api.openai.com/v1/chat/completions")
+    with pytest.raises(AIServiceError, match=r"\(429\): 请求过于频繁"):
+        call("https://api.openai.com/v1/chat/completions", stream=True)
+
+    serve(lambda request: httpx.Response(200, content=sse(
+        {"type": "error", "error": {"type": "overloaded_error", "message": "服务过载"}})))
+    with pytest.raises(AIServiceError, match="服务过载"):
+        call("https://api.anthropic.com/v1/messages", stream=True)
+
+
+def test_transport_errors_raise_service_error(serve):
+    def refuse(request):
+        raise httpx.ConnectError("连接被拒绝", request=request)
+
+    serve(refuse)
+    with pytest.raises(AIServiceError, match="无法连接"):
+        call("https://api.openai.com/v1/chat/completions")
+
+    def timeout(request):
+        raise httpx.ReadTimeout("读取超时", request=request)
+
+    serve(timeout)
+    with pytest.raises(AIServiceError, match="超时"):
+        call("https://api.openai.com/v1/chat/completions", stream=True)
+
+    with pytest.raises(AIServiceError, match="无法连接"):
+        call("https://exa mple.com:notaport/v1/chat/completions")
+
+
+def test_offline_adapter_is_deterministic():
+    provider = make_provider("offline://local")
+    first = asyncio.run(OfflineAdapter().complete(provider, "你好", 100))
+    assert asyncio.run(complete_chat(provider, "你好", 100)).content == first.content
+    assert asyncio.run(complete_chat(provider, "其他", 100)).content != first.content
+    assert first.prompt_tokens == 2
+
+
+def test_offline_latency_respects_timeout():
+    provider = make_provider("offline://local?latency_ms=200")
+    with pytest.raises(AIServiceError, match="超时"):
+        asyncio.run(complete_chat(provider, "你好", 100, timeout=httpx.Timeout(0.05)))
@@ -25,7 +25,7 @@ def test_server_connection():
 
 def test_data_files():
     """测试数据文件"""
-    data_files = ["data/users.json", "logs/login.log"]
+    data_files = ["data/index.json", "logs/login.log"]
     for file_path in data_files:
         path = Path(file_path)
         if path.exists():
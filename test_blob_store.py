@@ -0,0 +1,92 @@
+"""
+blob存储测试
+"""
+
+import os
+import time
+
+import pytest
+
+from blob_store import BlobStore, BLOB_MIN_LENGTH, BLOB_PREVIEW_CHARS, BLOB_REF_KEY, is_blob_ref, blob_ref_length
+
+
+def blob_files(store: BlobStore) -> list:
+    return [name for _, _, files in os.walk(store.blob_dir) for name in files if not name.startswith(".tmp-")]
+
+
+def test_round_trip_and_dedup(tmp_path):
+    store = BlobStore(str(tmp_path))
+    text = "- 开发规范\n" * 200
+
+    ref = store.put(text)
+    assert ref["length"] == len(text)
+    assert ref["lines"] == text.count("\n") + 1
+    assert store.put(text) == ref
+    assert len(blob_files(store)) == 1
+    assert os.path.getsize(os.path.join(tmp_path, ref[BLOB_REF_KEY][:2], blob_files(store)[0])) < len(text.encode())
+
+    # 新实例没有缓存，从磁盘解压读取
+    assert BlobStore(str(tmp_path)).get(ref[BLOB_REF_KEY]) == text
+
+
+def test_directory_is_created_on_first_write(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    assert not os.path.exists(store.blob_dir)
+    assert store.stats()["blobs"] == 0
+    assert store.collect_garbage([]) == 0
+
+    store.put("内容")
+    assert store.stats()["blobs"] == 1
+
+
+def test_pack_keeps_short_text_inline(tmp_path):
+    store = BlobStore(str(tmp_path))
+    assert store.pack("短文本") == "短文本"
+    assert store.unpack("短文本") == "短文本"
+
+    long_text = "x" * BLOB_MIN_LENGTH
+    packed = store.pack(long_text)
+    assert is_blob_ref(packed)
+    assert packed["preview"] == "x" * BLOB_PREVIEW_CHARS
+    assert store.pack("首行\n" + long_text)["preview"] == "首行"
+    assert blob_ref_length(packed) == BLOB_MIN_LENGTH
+    assert store.unpack(packed) == long_text
+
+
+def test_missing_blob_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        BlobStore(str(tmp_path)).get("0" * 64)
+
+
+def test_garbage_collection_keeps_referenced_and_recent_blobs(tmp_path):
+    store = BlobStore(str(tmp_path))
+    kept = store.put("被引用的内容")[BLOB_REF_KEY]
+    unused = store.put("不再引用的内容")[BLOB_REF_KEY]
+
+    # 刚写入的blob在保留时间内不会被删除
+    assert store.collect_garbage([kept]) == 0
+
+    assert store.collect_garbage([kept], min_age=-1) == 1
+    assert store.get(kept) == "被引用的内容"
+    with pytest.raises(FileNotFoundError):
+        store.get(unused)  # 缓存同时失效
+
+
+def test_put_refreshes_mtime_of_existing_blob(tmp_path):
+    store = BlobStore(str(tmp_path))
+    blob_hash = store.put("内容")[BLOB_REF_KEY]
+    path = store._find(blob_hash)
+    os.utime(path, (time.time() - 7200, time.time() - 7200))
+
+    store.put("内容")
+    assert store.collect_garbage([]) == 0
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    store = BlobStore(str(tmp_path), cache_chars=10)
+    first = store.put("a" * 6)[BLOB_REF_KEY]
+    store.put("b" * 6)
+
+    info = store.cache_info()
+    assert info["entries"] == 1 and info["chars"] == 6
+    assert store.get(first) == "a" * 6  # 从磁盘重新读取
@@ -0,0 +1,100 @@
+"""
+JSON编解码和时间格式测试
+"""
+
+import json
+from datetime import datetime, timezone, timedelta
+
+import pytest
+
+import codec
+from codec import FastJSONResponse, normalize_timestamp, normalize_record_timestamps, parse_timestamp
+
+RECORD = {
+    "id": 1,
+    "name": "订单服务",
+    "development_standard": {"$blob": "ab" * 32, "length": 600, "lines": 2, "preview": "- 使用MyBatis"},
+    "created_at": datetime(2024, 1, 2, 3, 4, 5, 678901),
+    "updated_at": None,
+    "tags": ["a", "b"],
+}
+
+
+@pytest.fixture(params=["orjson", "json"])
+def backend(request, monkeypatch):
+    """分别测试orjson和标准库json两条路径"""
+    if request.param == "orjson":
+        if codec.orjson is None:
+            pytest.skip("未安装orjson")
+    else:
+        monkeypatch.setattr(codec, "orjson", None)
+    return request.param
+
+
+def test_round_trip_of_stored_record(backend):
+    for pretty in (True, False):
+        raw = codec.dumps(RECORD, pretty=pretty)
+        assert isinstance(raw, bytes)
+        assert "订单服务".encode("utf-8") in raw  # 中文不转义
+        loaded = codec.loads(raw)
+        assert loaded["created_at"] == "2024-01-02T03:04:05.678901"
+        assert parse_timestamp(loaded["created_at"]) == RECORD["created_at"]
+        assert {k: v for k, v in loaded.items() if k != "created_at"} == {
+            k: v for k, v in RECORD.items() if k != "created_at"}
+    assert codec.loads(codec.dumps(RECORD).decode("utf-8")) == codec.loads(codec.dumps(RECORD))
+
+
+def test_both_backends_write_the_same_timestamps(monkeypatch):
+    if codec.orjson is None:
+        pytest.skip("未安装orjson")
+    fast = codec.loads(codec.dumps(RECORD, pretty=False))
+    monkeypatch.setattr(codec, "orjson", None)
+    assert codec.loads(codec.dumps(RECORD, pretty=False)) == fast
+
+
+def test_pretty_output_matches_stdlib_layout():
+    # 手工编辑数据文件时看到的是两空格缩进的格式
+    assert codec.dumps({"a": [1]}).decode("utf-8") == json.dumps({"a": [1]}, indent=2)
+
+
+@pytest.mark.parametrize("legacy, expected", [
+    ("2025-08-27 09:39:46.565372", "2025-08-27T09:39:46.565372"),
+    ("2025-08-27 09:39:46", "2025-08-27T09:39:46"),
+    ("2025-08-27T09:39:46.565372", "2025-08-27T09:39:46.565372"),
+    ("2025-08-27T09:39:46+08:00", "2025-08-27T09:39:46+08:00"),
+    ("2025-08-27", "2025-08-27T00:00:00"),
+    ("2025/08/27", "2025/08/27"),  # 无法识别时原样保留
+    ("", ""),
+    (None, None),
+])
+def test_normalize_legacy_timestamps(legacy, expected):
+    assert normalize_timestamp(legacy) == expected
+
+
+def test_normalize_record_only_touches_timestamp_fields():
+    record = {"created_at": "2025-08-27 09:39:46", "updated_at": "2025-08-28T10:00:00",
+              "last_login": "2025-08-27 09:39:46", "name": "2025-08-27 09:39:46"}
+    assert normalize_record_timestamps(record)
+    assert record == {"created_at": "2025-08-27T09:39:46", "updated_at": "2025-08-28T10:00:00",
+                      "last_login": "2025-08-27 09:39:46", "name": "2025-08-27 09:39:46"}
+    assert not normalize_record_timestamps(record)  # 再次迁移不做修改
+
+
+def test_parse_timestamp():
+    value = datetime(2024, 1, 1, 8, tzinfo=timezone(timedelta(hours=8)))
+    assert parse_timestamp(value) is value
+    assert parse_timestamp(None) is None
+    assert parse_timestamp("2024-01-01T08:00:00+08:00") == value
+    with pytest.raises(ValueError):
+        parse_timestamp("2024/01/01")
+
+
+def test_fast_json_response():
+    response = FastJSONResponse(content={"message": "成功", "created_at": RECORD["created_at"], "items": [1, None]},
+                                status_code=201)
+    assert response.status_code == 201
+    assert response.headers["content-type"] == "application/json"
+    body = json.loads(response.body)
+    assert body == {"message": "成功", "created_at": "2024-01-02T03:04:05.678901", "items": [1, None]}
+    if codec.orjson is not None:
+        assert b"\\u" not in response.body
@@ -0,0 +1,138 @@
+"""
+请求截止时间测试
+"""
+
+import time
+import asyncio
+
+import pytest
+
+from deadline import Deadline, ClientDisconnected, current_deadline, deadline_scope, gather_within_deadline
+
+
+class Tracked:
+    """记录是否完成或被取消的协程"""
+
+    def __init__(self, seconds: float, result: str):
+        self.seconds = seconds
+        self.result = result
+        self.cancelled = False
+
+    async def __call__(self) -> str:
+        try:
+            await asyncio.sleep(self.seconds)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self.result
+
+
+class FakeRequest:
+    """disconnected 设置后 receive() 返回断开消息"""
+
+    def __init__(self):
+        self.disconnected = asyncio.Event()
+
+    async def receive(self):
+        await self.disconnected.wait()
+        return {"type": "http.disconnect"}
+
+
+def test_deadline_remaining_and_cap():
+    deadline = Deadline(0.5)
+    assert 0 < deadline.remaining() <= 0.5
+    assert deadline.cap(60) <= 0.5
+    assert deadline.cap(0.1) == 0.1
+    assert not deadline.expired
+    assert Deadline(0).expired
+    assert Deadline(-1).remaining() == 0
+
+
+def test_nested_deadlines_use_the_tighter_one():
+    assert current_deadline() is None
+    with deadline_scope(10) as outer:
+        assert current_deadline() is outer
+        with deadline_scope(0.5) as inner:
+            assert inner is not outer and current_deadline() is inner
+        # 内层更宽松时沿用外层
+        with deadline_scope(60) as loose:
+            assert loose is outer
+        assert current_deadline() is outer
+    assert current_deadline() is None
+
+
+def test_partial_results_on_timeout():
+    fast, slow = Tracked(0.01, "快"), Tracked(5, "慢")
+
+    async def main():
+        with deadline_scope(0.2):
+            return await gather_within_deadline({"fast": fast(), "slow": slow()})
+
+    started = time.monotonic()
+    results, skipped = asyncio.run(main())
+    assert time.monotonic() - started < 2
+    assert results == {"fast": "快"}
+    assert skipped == ["slow"]
+    assert slow.cancelled and not fast.cancelled
+
+
+def test_without_deadline_waits_for_all():
+    async def main():
+        return await gather_within_deadline({"a": Tracked(0.01, "a")(), "b": Tracked(0.05, "b")()})
+
+    assert asyncio.run(main()) == ({"a": "a", "b": "b"}, [])
+
+
+def test_expired_deadline_cancels_everything():
+    task = Tracked(1, "x")
+
+    async def main():
+        with deadline_scope(0):
+            return await gather_within_deadline({"x": task()})
+
+    assert asyncio.run(main()) == ({}, ["x"])
+    assert task.cancelled
+
+
+def test_tasks_inherit_the_deadline():
+    async def read_deadline():
+        return current_deadline()
+
+    async def main():
+        with deadline_scope(1) as deadline:
+            results, _ = await gather_within_deadline({"d": read_deadline()})
+            return results["d"] is deadline
+
+    assert asyncio.run(main())
+
+
+def test_client_disconnect_cancels_all_tasks():
+    first, second = Tracked(5, "1"), Tracked(5, "2")
+
+    async def main():
+        request = FakeRequest()
+        asyncio.get_running_loop().call_later(0.05, request.disconnected.set)
+        with deadline_scope(10):
+            await gather_within_deadline({"first": first(), "second": second()}, request=request)
+
+    with pytest.raises(ClientDisconnected):
+        asyncio.run(main())
+    assert first.cancelled and second.cancelled
+
+
+def test_errors_propagate_and_cancel_the_rest():
+    slow = Tracked(5, "慢")
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("AI服务异常")
+
+    async def main():
+        with deadline_scope(10):
+            await gather_within_deadline({"failing": failing(), "slow": slow()})
+
+    started = time.monotonic()
+    with pytest.raises(ValueError):
+        asyncio.run(main())
+    assert time.monotonic() - started < 2  # 不等待其余协程完成
+    assert slow.cancelled
@@ -0,0 +1,122 @@
+"""
+报文字段数据源匹配测试
+"""
+
+from field_matcher import FieldMatcher, build_data_source_table, dedupe_ddls, strip_unused_columns, normalize_name
+
+DDLS = [
+    """CREATE TABLE orders (
+  id bigint NOT NULL,
+  user_id bigint COMMENT '下单用户',
+  amount decimal(10,2),
+  create_time datetime,
+  PRIMARY KEY (id),
+  FOREIGN KEY (user_id) REFERENCES users(id)
+);""",
+    """CREATE TABLE users (
+  id bigint NOT NULL,
+  user_name varchar(20) COMMENT '用户名',
+  create_time datetime,
+  PRIMARY KEY (id)
+);""",
+]
+
+
+def make_matcher() -> FieldMatcher:
+    return FieldMatcher.from_ddls(DDLS)
+
+
+def test_exact_and_camel_case_on_single_table_are_resolved():
+    matcher = make_matcher()
+
+    user_name = matcher.match("data.userName")
+    assert user_name.resolved
+    assert user_name.match_type == "camel"
+    assert user_name.column.qualified_name == "users.user_name"
+
+    amount = matcher.match("amount")
+    assert amount.resolved
+    assert amount.match_type == "exact"
+    assert amount.hint() == ""
+
+
+def test_match_is_described_by_its_kind():
+    matcher = make_matcher()
+    cases = {
+        "amount": ("exact", "字段名与数据库列名一致"),
+        "userName": ("camel", "user_name转译为驼峰命名即为该字段"),
+        "AMOUNT": ("case", "字段名与amount仅大小写不同"),
+        "user-name": ("normalized", "忽略大小写和分隔符后字段名与user_name一致"),
+    }
+    matches = [matcher.match(parameter) for parameter in cases]
+    assert [m.match_type for m in matches] == [kind for kind, _ in cases.values()]
+    assert all(m.resolved for m in matches)
+
+    rows = build_data_source_table(matches).splitlines()[2:]
+    for row, (_, description) in zip(rows, cases.values()):
+        assert description in row
+    assert "驼峰" not in rows[2] and "驼峰" not in rows[3]
+
+
+def test_column_in_several_tables_is_left_to_ai():
+    match = make_matcher().match("createTime")
+
+    assert not match.resolved
+    assert match.ambiguous
+    assert [c.qualified_name for c in match.candidates] == ["orders.create_time", "users.create_time"]
+    assert match.related_columns == []
+    assert match.match_type == "camel"
+    assert match.hint() == "orders.create_time、users.create_time中都有驼峰转译后同名的列，请确认"
+    assert "同名列" in make_matcher().match("create_time").hint()
+    assert build_data_source_table([match]) == ""
+
+
+def test_fuzzy_match_is_left_to_ai_with_hint():
+    match = make_matcher().match("amounts")
+
+    assert not match.resolved
+    assert match.match_type == "fuzzy"
+    assert 0.85 <= match.score < 1.0
+    assert "orders.amount" in match.hint()
+
+
+def test_unknown_field_has_no_hint():
+    match = make_matcher().match("nothingLikeIt")
+
+    assert not match.resolved
+    assert match.candidates == []
+    assert match.hint() == ""
+
+
+def test_related_columns_only_come_from_foreign_keys():
+    matcher = make_matcher()
+    user_id = matcher.match("userId")
+
+    assert user_id.resolved
+    assert [c.qualified_name for c in user_id.related_columns] == ["users.id"]
+
+    table = build_data_source_table([user_id, matcher.match("userName")])
+    rows = table.splitlines()[2:]
+    assert rows[0].startswith("| userId | orders.user_id | users.id |")
+    assert "外键" in rows[0]
+    assert rows[1].startswith("| userName | users.user_name |  |")
+    assert "关联" not in rows[1]
+
+
+def test_inline_references_are_parsed():
+    matcher = FieldMatcher.from_ddls(DDLS + ["CREATE TABLE items (id bigint, order_id bigint REFERENCES orders (id));"])
+
+    match = matcher.match("orderId")
+    assert match.resolved
+    assert [c.qualified_name for c in match.related_columns] == ["orders.id"]
+
+
+def test_dedupe_and_strip_ddls():
+    unique = dedupe_ddls(DDLS + [DDLS[0]])
+    assert len(unique) == 2
+
+    stripped = strip_unused_columns(DDLS[0], {normalize_name("amount")})
+    assert "amount" in stripped
+    assert "id bigint" in stripped  # 主键列保留
+    assert "create_time" not in stripped
+    assert "FOREIGN KEY" not in stripped
@@ -0,0 +1,136 @@
+"""
+生成接口幂等键测试
+"""
+
+import asyncio
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+import idempotency
+from auth import create_access_token
+from idempotency import IdempotencyMiddleware, IDEMPOTENCY_KEY_MAX_LENGTH
+from shared_state import MemoryBackend
+
+PATH = "/tasks/generate-interface-prompt"
+
+
+class FakeGenerator:
+    """记录执行次数的生成接口，可以让执行暂停或返回失败"""
+
+    def __init__(self):
+        self.calls = 0
+        self.success = True
+        self.release = None
+
+    async def endpoint(self, request):
+        self.calls += 1
+        body = await request.json()
+        if self.release is not None:
+            await self.release.wait()
+        return JSONResponse({"success": self.success, "prompt_content": f"{body['name']}#{self.calls}"})
+
+
+@pytest.fixture
+def generator():
+    return FakeGenerator()
+
+
+def run(generator, scenario):
+    """在幂等中间件后运行生成接口，scenario(post) 中发送请求"""
+    app = IdempotencyMiddleware(Starlette(routes=[Route(PATH, generator.endpoint, methods=["POST"])]), MemoryBackend())
+    token = create_access_token({"sub": "alice@example.com"})
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async def post(key=None, body=None, user_token=token):
+                headers = {"Authorization": f"Bearer {user_token}"}
+                if key is not None:
+                    headers["Idempotency-Key"] = key
+                return await client.post(PATH, json=body or {"name": "查询订单"}, headers=headers)
+            return await scenario(post)
+
+    return asyncio.run(main())
+
+
+def test_replay_runs_the_endpoint_once(generator):
+    async def scenario(post):
+        first = await post("key-1")
+        second = await post("key-1")
+        return first, second, await post("key-2")
+
+    first, second, other = run(generator, scenario)
+    assert generator.calls == 2
+    assert first.json() == second.json() == {"success": True, "prompt_content": "查询订单#1"}
+    assert "idempotent-replayed" not in first.headers
+    assert second.headers["idempotent-replayed"] == "true"
+    assert second.headers["content-type"] == "application/json"
+    assert other.json()["prompt_content"] == "查询订单#2"
+
+
+def test_changed_body_is_rejected(generator):
+    async def scenario(post):
+        await post("key-1")
+        return await post("key-1", body={"name": "查询用户"})
+
+    response = run(generator, scenario)
+    assert response.status_code == 422
+    assert generator.calls == 1
+
+
+def test_keys_are_scoped_per_user(generator):
+    async def scenario(post):
+        await post("key-1")
+        return await post("key-1", user_token=create_access_token({"sub": "bob@example.com"}))
+
+    assert "idempotent-replayed" not in run(generator, scenario).headers
+    assert generator.calls == 2
+
+
+def test_requests_without_key_or_token_pass_through(generator):
+    async def scenario(post):
+        await post()
+        await post()
+        await post("key-1", user_token="invalid")
+        return await post("x" * (IDEMPOTENCY_KEY_MAX_LENGTH + 1))
+
+    assert run(generator, scenario).status_code == 400
+    assert generator.calls == 3
+
+
+def test_failed_results_are_not_stored(generator):
+    generator.success = False
+
+    async def scenario(post):
+        await post("key-1")
+        generator.success = True
+        return await post("key-1")
+
+    response = run(generator, scenario)
+    assert generator.calls == 2
+    assert response.json()["success"] is True
+
+
+def test_concurrent_duplicate_waits_for_first_result(generator, monkeypatch):
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_POLL_INTERVAL", 0.01)
+
+    async def scenario(post):
+        generator.release = asyncio.Event()
+        first = asyncio.create_task(post("key-1"))
+        second = asyncio.create_task(post("key-1"))
+        conflict = asyncio.create_task(post("key-1", body={"name": "查询用户"}))
+        while generator.calls == 0:
+            await asyncio.sleep(0.01)
+        rejected = await conflict  # 执行中的请求内容不同，立即拒绝
+        generator.release.set()
+        return await first, await second, rejected
+
+    first, second, rejected = run(generator, scenario)
+    assert generator.calls == 1
+    assert second.json() == first.json()
+    assert second.headers["idempotent-replayed"] == "true"
+    assert rejected.status_code == 422
@@ -0,0 +1,113 @@
+"""
+Prompt生成历史测试
+"""
+
+import os
+import time
+
+import pytest
+
+from prompt_history import (
+    PromptHistory, KIND_INTERFACE, KIND_BUG_FIX, request_fingerprint, refresh_prompt_date, decode_cursor
+)
+
+
+def record(history: PromptHistory, fingerprint: str, project_id: int = 1, kind: str = KIND_INTERFACE,
+           prompt: str = "生成的Prompt", sections=None) -> int:
+    return history.record(project_id, 1, kind, fingerprint, f"接口{fingerprint}", {"interface_name": "查询订单"},
+                          prompt, sections=sections or {"ddl": "CREATE TABLE orders (id bigint);"},
+                          fingerprints={"ddl": "abc"})
+
+
+def blob_count(history: PromptHistory) -> int:
+    return sum(len(files) for _, _, files in os.walk(history.blobs.blob_dir))
+
+
+def test_fingerprint_covers_kind_and_context():
+    assert request_fingerprint("a", {"x": 1}, model="m") != request_fingerprint("a", {"x": 1}, model="n")
+    assert request_fingerprint("a", {"x": 1}) != request_fingerprint("b", {"x": 1})
+
+
+def test_same_fingerprint_overwrites_and_counts_hits(tmp_path):
+    history = PromptHistory(str(tmp_path))
+    entry_id = record(history, "fp", prompt="第一次")
+    assert record(history, "fp", prompt="第二次") == entry_id
+    assert history.find(1, "missing") is None
+    assert history.find(2, "fp") is None  # 指纹按项目隔离
+
+    entry = history.find(1, "fp")
+    assert entry["id"] == entry_id
+    assert entry["prompt_content"] == "第二次"
+    assert entry["fingerprints"] == {"ddl": "abc"}
+    assert entry["hits"] == 1
+    assert history.find(1, "fp")["hits"] == 2
+    assert len(history.list_entries(1)["items"]) == 1
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    history = PromptHistory(str(tmp_path))
+    record(history, "fp1")
+    blobs = blob_count(history)
+    assert blobs == 3  # 请求输入、生成结果、DDL段落
+
+    record(history, "fp2")
+    assert blob_count(history) == blobs
+    record(history, "fp3", prompt="不同的结果")
+    assert blob_count(history) == blobs + 1
+
+    entry = history.get(record(history, "fp4", sections={"ddl": "CREATE TABLE users (id bigint);", "empty": ""}))
+    assert entry["input"] == {"interface_name": "查询订单"}
+    assert entry["sections"] == {"ddl": "CREATE TABLE users (id bigint);"}  # 空段落不保存
+
+
+def test_pagination_with_cursor(tmp_path):
+    history = PromptHistory(str(tmp_path))
+    ids = [record(history, f"fp{i}", kind=KIND_BUG_FIX if i % 2 else KIND_INTERFACE) for i in range(5)]
+    record(history, "other", project_id=2)
+
+    page = history.list_entries(1, limit=2)
+    seen = [item["id"] for item in page["items"]]
+    assert "input_blob" not in page["items"][0]
+    while page["next_cursor"]:
+        page = history.list_entries(1, cursor=page["next_cursor"], limit=2)
+        seen += [item["id"] for item in page["items"]]
+    assert seen == ids[::-1]
+
+    assert [item["id"] for item in history.list_entries(1, kind=KIND_BUG_FIX)["items"]] == [ids[3], ids[1]]
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_retention_and_garbage_collection(tmp_path):
+    history = PromptHistory(str(tmp_path), max_entries=2, max_age_days=1)
+    first = record(history, "fp1", prompt="结果1")
+    second = record(history, "fp2", prompt="结果2")
+    third = record(history, "fp3", prompt="结果3")
+    assert history.existing_ids([first, second, third]) == {second, third}
+
+    # 超过保留天数未使用的记录在清理时删除
+    history._connect().execute("UPDATE prompt_history SET last_used_at = ? WHERE id = ?",
+                               (time.time() - 2 * 86400, second))
+    assert history.collect_garbage()["entries_expired"] == 1
+    assert history.existing_ids([second, third]) == {third}
+
+    assert history.delete_project(1) == 1
+    assert history.list_entries(1)["items"] == []
+
+
+def test_iter_entries_follows_versions(tmp_path):
+    history = PromptHistory(str(tmp_path))
+    first = record(history, "fp1")
+    second = record(history, "fp2")
+    versions = {entry["id"]: entry["version"] for entry in history.iter_entries(1, KIND_INTERFACE)}
+    assert versions[first] < versions[second]
+
+    # 覆盖后的记录获得新版本号
+    record(history, "fp1", prompt="新结果")
+    changed = list(history.iter_entries(1, KIND_INTERFACE, after_version=versions[second]))
+    assert [entry["id"] for entry in changed] == [first]
+
+
+def test_refresh_prompt_date():
+    prompt = "- author: x\n- sinci: 2020/01/01\n内容"
+    assert refresh_prompt_date(prompt) == prompt.replace("2020/01/01", time.strftime("%Y/%m/%d"))
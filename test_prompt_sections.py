@@ -0,0 +1,80 @@
+"""
+接口Prompt分段生成测试
+"""
+
+from types import SimpleNamespace
+
+from models import InterfaceTaskRequest
+from prompt_sections import SectionBuilder, INTERFACE_SECTIONS, section_fingerprint, render_data_sources
+
+PROJECT = SimpleNamespace(development_standard="- 使用MyBatis")
+
+
+def make_request(**changes) -> InterfaceTaskRequest:
+    fields = dict(
+        interface_name="查询订单", interface_description="分页查询用户订单", business_logic_description="按用户过滤",
+        interface_path="/orders", request_body_example="{}", response_body_example="{}", project_id=1,
+        database_ddls=["CREATE TABLE orders (id bigint);"],
+        response_structure_table=[{"parameter": "orderNo", "description": "订单号"}]
+    )
+    fields.update(changes)
+    return InterfaceTaskRequest(**fields)
+
+
+def previous_of(builder: SectionBuilder) -> dict:
+    return {"sections": dict(builder.texts), "fingerprints": dict(builder.fingerprints)}
+
+
+def test_first_render_builds_every_section():
+    builder = SectionBuilder(make_request(), "alice", PROJECT).render()
+    assert builder.reused == []
+    assert set(builder.texts) == set(INTERFACE_SECTIONS) - {"data_sources"}
+    prompt = builder.assemble()
+    assert "- author: alice" in prompt
+    assert prompt.index("# 核心任务") < prompt.index("# 要求") < prompt.index("# 关联数据库信息")
+
+
+def test_only_changed_sections_are_rebuilt():
+    first = SectionBuilder(make_request(), "alice", PROJECT).render()
+    request = make_request(interface_path="/v2/orders")
+    second = SectionBuilder(request, "alice", PROJECT, previous_of(first)).render()
+
+    assert "api" not in second.reused
+    assert set(second.reused) == set(first.texts) - {"api"}
+    assert "/v2/orders" in second.texts["api"]
+    # 复用段落后拼接的结果与全量生成一致
+    assert second.assemble() == SectionBuilder(request, "alice", PROJECT).render().assemble()
+
+    # 项目规范变化时要求段落重新生成
+    third = SectionBuilder(request, "alice", SimpleNamespace(development_standard="- 使用JPA"),
+                           previous_of(second)).render()
+    assert "requirements" not in third.reused
+    assert "- 使用JPA" in third.texts["requirements"]
+
+
+def test_reuse_requires_matching_fingerprint_and_text():
+    first = SectionBuilder(make_request(), "alice", PROJECT).render()
+    previous = previous_of(first)
+    previous["sections"]["core_task"] = "手工修改的段落"
+    del previous["sections"]["ddl"]
+
+    second = SectionBuilder(make_request(), "alice", PROJECT, previous).render()
+    assert second.texts["core_task"] == "手工修改的段落"  # 指纹一致即复用
+    assert "ddl" not in second.reused
+    assert second.texts["ddl"] == first.texts["ddl"]
+
+
+def test_ai_sections_reuse_and_override():
+    table = "| orderNo | orders.order_no |  | AI分析 |"
+    fingerprint = section_fingerprint("data_sources", "ai", "gpt-4o")
+    previous = {"sections": {"data_sources": render_data_sources(table)}, "fingerprints": {"data_sources": fingerprint}}
+
+    builder = SectionBuilder(make_request(), "alice", PROJECT, previous).render()
+    assert builder.reuse("data_sources", fingerprint)
+    assert builder.assemble().endswith(table)
+    assert not builder.reuse("data_sources", section_fingerprint("data_sources", "ai", "gpt-4"))
+
+    # 重新生成的内容覆盖复用结果
+    builder.set("data_sources", render_data_sources("| orderNo | orders.id |  |  |"), fingerprint)
+    assert "data_sources" not in builder.reused
+    assert builder.assemble().endswith("| orderNo | orders.id |  |  |")
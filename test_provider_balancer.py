@@ -0,0 +1,157 @@
+"""
+AI服务调度测试
+"""
+
+import time
+import asyncio
+
+import httpx
+import pytest
+
+import provider_balancer as balancer_module
+from ai_adapters import AICompletion, AIServiceError
+from models import AIConfig, AIProvider
+from provider_balancer import ProviderBalancer, PROVIDER_EWMA_ALPHA, PROVIDER_FAILURE_THRESHOLD
+from routers import task_router
+
+
+def make_provider(provider_id: int, name: str, priority: int = 1, tasks=("data_sources", "business_logic")) -> AIProvider:
+    return AIProvider(id=provider_id, name=name, api_key="k", api_url=f"https://{name}.example.com/v1",
+                      model_name="gpt-4o", priority=priority, tasks=list(tasks))
+
+
+@pytest.fixture
+def balancer(monkeypatch):
+    balancer = ProviderBalancer()
+    monkeypatch.setattr(task_router, "provider_balancer", balancer)
+    monkeypatch.setattr(task_router, "log_ai_call", lambda *args, **kwargs: None)
+    return balancer
+
+
+def names(providers) -> list:
+    return [p.name for p in providers]
+
+
+def test_rank_filters_by_task_and_uses_priority_without_data():
+    balancer = ProviderBalancer()
+    fast, slow, logic_only = make_provider(1, "fast", priority=2), make_provider(2, "slow"), \
+        make_provider(3, "logic", priority=0, tasks=("business_logic",))
+    assert names(balancer.rank([fast, slow, logic_only], "data_sources")) == ["slow", "fast"]
+    assert names(balancer.rank([fast, slow, logic_only], "business_logic")) == ["logic", "slow", "fast"]
+
+
+def test_record_updates_latency_ewma():
+    balancer = ProviderBalancer()
+    provider = make_provider(1, "a")
+    balancer.record(provider, 1.0, ok=True)
+    balancer.record(provider, 2.0, ok=True)
+    stats = balancer.stats([provider])[0]
+    assert stats["latency_ms"] == pytest.approx(1000 + PROVIDER_EWMA_ALPHA * 1000)
+    assert stats["calls"] == 2 and stats["error_rate"] == 0
+
+    # 失败的调用不计入延迟，只提高错误率
+    balancer.record(provider, 30.0, ok=False, error="超时")
+    stats = balancer.stats([provider])[0]
+    assert stats["latency_ms"] == pytest.approx(1000 + PROVIDER_EWMA_ALPHA * 1000)
+    assert stats["error_rate"] == pytest.approx(PROVIDER_EWMA_ALPHA, abs=1e-3)
+    assert stats["last_error"] == "超时"
+
+
+def test_faster_provider_ranks_first_and_errors_penalize():
+    balancer = ProviderBalancer()
+    a, b, new = make_provider(1, "a"), make_provider(2, "b"), make_provider(3, "new")
+    balancer.record(a, 0.5, ok=True)
+    balancer.record(b, 0.2, ok=True)
+    # 没有观测数据的服务按已知最快的延迟估计
+    assert names(balancer.rank([a, new, b], "data_sources")) == ["new", "b", "a"]
+
+    balancer.record(b, 0.2, ok=False)
+    balancer.record(b, 0.2, ok=False)
+    assert names(balancer.rank([a, b], "data_sources")) == ["a", "b"]
+
+
+def test_consecutive_failures_cool_down_until_recovery(monkeypatch):
+    monkeypatch.setattr(balancer_module, "PROVIDER_COOLDOWN_SECONDS", 0.05)
+    balancer = ProviderBalancer()
+    primary, backup = make_provider(1, "primary", priority=0), make_provider(2, "backup", priority=3)
+    for _ in range(PROVIDER_FAILURE_THRESHOLD - 1):
+        balancer.record(primary, 0.1, ok=False)
+    assert not balancer.stats([primary])[0]["cooling_down"]
+
+    balancer.record(primary, 0.1, ok=False)
+    assert balancer.stats([primary])[0]["cooling_down"]
+    # 暂停中的服务排在最后，仍作为兜底
+    assert names(balancer.rank([primary, backup], "data_sources")) == ["backup", "primary"]
+
+    # 暂停结束后重新参与调度，成功一次即清除连续失败计数，错误率随后续成功逐渐恢复
+    time.sleep(0.1)
+    assert not balancer.stats([primary])[0]["cooling_down"]
+    balancer.record(primary, 0.1, ok=True)
+    for _ in range(5):
+        balancer.record(backup, 0.1, ok=True)
+    stats = balancer.stats([primary])[0]
+    assert stats["consecutive_failures"] == 0 and not stats["cooling_down"]
+    assert names(balancer.rank([primary, backup], "data_sources")) == ["backup", "primary"]
+    for _ in range(10):
+        balancer.record(primary, 0.1, ok=True)
+    assert names(balancer.rank([primary, backup], "data_sources")) == ["primary", "backup"]
+
+
+def test_stats_are_keyed_by_url_model_and_key():
+    balancer = ProviderBalancer()
+    balancer.record(make_provider(1, "a"), 0.1, ok=True)
+    # 同一服务地址、模型和密钥在不同用户间共享统计
+    assert balancer.stats([make_provider(9, "a")])[0]["calls"] == 1
+    assert balancer.stats([make_provider(1, "b")])[0]["calls"] == 0
+    assert "api_key" not in balancer.stats([make_provider(1, "a")])[0]
+
+
+def fake_complete_chat(failures: dict, calls: list):
+    """按服务地址返回答复或抛出异常的 complete_chat"""
+    async def complete_chat(provider, prompt, max_tokens, timeout=None, headers=None):
+        calls.append(provider.name)
+        error = failures.get(provider.name)
+        if error is not None:
+            raise error
+        return AICompletion(content=f"{provider.name}的答复", prompt_tokens=10, completion_tokens=5)
+    return complete_chat
+
+
+@pytest.mark.parametrize("error", [
+    AIServiceError("AI服务请求失败 (500)"),
+    httpx.InvalidURL("无效的地址"),
+    KeyError("choices"),
+])
+def test_call_ai_service_fails_over_on_any_error(balancer, monkeypatch, error):
+    calls = []
+    monkeypatch.setattr(task_router, "complete_chat", fake_complete_chat({"默认": error}, calls))
+    ai_config = AIConfig(user_id=1, api_key="k", api_url="https://primary.example.com/v1", model_name="gpt-4o",
+                         providers=[make_provider(1, "backup")])
+
+    result = asyncio.run(task_router.call_ai_service("prompt", ai_config, "alice"))
+    assert result == "backup的答复"
+    assert calls == ["默认", "backup"]
+    stats = {s["name"]: s for s in balancer.stats(task_router.ai_providers(ai_config))}
+    assert stats["默认"]["failures"] == 1
+    assert stats["backup"]["failures"] == 0 and stats["backup"]["calls"] == 1
+
+
+def test_call_ai_service_returns_empty_when_all_fail(balancer, monkeypatch):
+    calls = []
+    monkeypatch.setattr(task_router, "complete_chat",
+                        fake_complete_chat({"默认": ValueError("x"), "backup": AIServiceError("y")}, calls))
+    ai_config = AIConfig(user_id=1, api_key="k", api_url="https://primary.example.com/v1", model_name="gpt-4o",
+                         providers=[make_provider(1, "backup")])
+    assert asyncio.run(task_router.call_ai_service("prompt", ai_config, "alice")) == ""
+    assert calls == ["默认", "backup"]
+
+
+def test_call_ai_service_propagates_cancellation(balancer, monkeypatch):
+    calls = []
+    monkeypatch.setattr(task_router, "complete_chat",
+                        fake_complete_chat({"默认": asyncio.CancelledError()}, calls))
+    ai_config = AIConfig(user_id=1, api_key="k", api_url="https://primary.example.com/v1", model_name="gpt-4o",
+                         providers=[make_provider(1, "backup")])
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(task_router.call_ai_service("prompt", ai_config, "alice"))
+    assert calls == ["默认"]
@@ -0,0 +1,211 @@
+"""
+共享状态后端测试
+
+Redis后端通过本地的最小RESP服务（FakeRedisServer）测试，不需要真实的Redis。
+"""
+
+import time
+import socket
+import threading
+import socketserver
+
+import pytest
+
+from shared_state import MemoryBackend, SQLiteBackend, RedisBackend, create_backend
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    """只实现共享状态用到的命令的RESP服务：GET、SET（NX/EX）、GETDEL、DEL、INCR、EXPIRE、DBSIZE、AUTH、SELECT"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, password=None):
+        super().__init__(("127.0.0.1", 0), _FakeRedisHandler)
+        self.password = password
+        self.databases = {}
+        self.commands = []
+        self.connections = []
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def disconnect_all(self):
+        """模拟服务端重启：断开全部客户端连接"""
+        with self.lock:
+            for connection in self.connections:
+                try:
+                    connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass  # 客户端已关闭的连接
+            self.connections.clear()
+
+    @property
+    def url(self) -> str:
+        auth = f":{self.password}@" if self.password else ""
+        return f"redis://{auth}127.0.0.1:{self.server_address[1]}/2"
+
+
+class _FakeRedisHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        with self.server.lock:
+            self.server.connections.append(self.request)
+        self.db = 0
+        self.authenticated = self.server.password is None
+        while True:
+            try:
+                line = self.rfile.readline()
+            except OSError:
+                return
+            if not line:
+                return
+            args = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2].decode("utf-8"))
+            with self.server.lock:
+                self.server.commands.append(args[0].upper())
+                reply = self.execute(args[0].upper(), args[1:])
+            self.wfile.write(reply)
+
+    def _data(self) -> dict:
+        data = self.server.databases.setdefault(self.db, {})
+        now = time.time()
+        for key in [k for k, (_, expires_at) in data.items() if expires_at is not None and expires_at <= now]:
+            del data[key]
+        return data
+
+    @staticmethod
+    def _bulk(value) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+        encoded = value.encode("utf-8")
+        return b"$%d\r\n%s\r\n" % (len(encoded), encoded)
+
+    def execute(self, command: str, args: list) -> bytes:
+        if command == "AUTH":
+            self.authenticated = args[0] == self.server.password
+            return b"+OK\r\n" if self.authenticated else b"-WRONGPASS invalid password\r\n"
+        if not self.authenticated:
+            return b"-NOAUTH Authentication required.\r\n"
+        if command == "SELECT":
+            self.db = int(args[0])
+            return b"+OK\r\n"
+
+        data = self._data()
+        if command == "GET":
+            item = data.get(args[0])
+            return self._bulk(item[0] if item else None)
+        if command == "SET":
+            key, value, options = args[0], args[1], [a.upper() for a in args[2:]]
+            if "NX" in options and key in data:
+                return b"$-1\r\n"
+            expires_at = time.time() + int(args[2 + options.index("EX") + 1]) if "EX" in options else None
+            data[key] = (value, expires_at)
+            return b"+OK\r\n"
+        if command == "GETDEL":
+            item = data.pop(args[0], None)
+            return self._bulk(item[0] if item else None)
+        if command == "DEL":
+            return b":%d\r\n" % (data.pop(args[0], None) is not None)
+        if command == "INCR":
+            value, expires_at = data.get(args[0], ("0", None))
+            data[args[0]] = (str(int(value) + 1), expires_at)
+            return b":%d\r\n" % (int(value) + 1)
+        if command == "EXPIRE":
+            if args[0] not in data:
+                return b":0\r\n"
+            data[args[0]] = (data[args[0]][0], time.time() + int(args[1]))
+            return b":1\r\n"
+        if command == "DBSIZE":
+            return b":%d\r\n" % len(data)
+        return b"-ERR unknown command '%s'\r\n" % command.encode()
+
+
+@pytest.fixture
+def redis_server():
+    server = FakeRedisServer(password="secret")
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        yield MemoryBackend()
+    elif request.param == "sqlite":
+        yield SQLiteBackend(str(tmp_path / "state.db"))
+    else:
+        server = FakeRedisServer(password="secret")
+        yield create_backend(server.url)
+        server.shutdown()
+        server.server_close()
+
+
+def test_get_set_delete(backend):
+    assert backend.get("k") is None
+    backend.set("k", "值")
+    assert backend.get("k") == "值"
+    backend.delete("k")
+    assert backend.get("k") is None
+
+
+def test_set_if_absent(backend):
+    assert backend.set_if_absent("lock", "a", ttl=60)
+    assert not backend.set_if_absent("lock", "b", ttl=60)
+    assert backend.get("lock") == "a"
+
+
+def test_pop_is_single_use(backend):
+    backend.set("captcha", "ABCD", ttl=60)
+    assert backend.pop("captcha") == "ABCD"
+    assert backend.pop("captcha") is None
+
+
+def test_incr_and_size(backend):
+    assert backend.incr("counter", ttl=60) == 1
+    assert backend.incr("counter", ttl=60) == 2
+    backend.set("other", "x")
+    assert backend.size() == 2
+
+
+def test_ttl_expires(backend):
+    backend.set("short", "x", ttl=1)
+    assert backend.incr("window", ttl=1) == 1
+    time.sleep(1.1)
+    assert backend.get("short") is None
+    assert backend.incr("window", ttl=1) == 1
+
+
+def test_redis_url_auth_and_db(redis_server):
+    backend = RedisBackend.from_url(redis_server.url)
+    assert (backend.host, backend.db, backend.password) == ("127.0.0.1", 2, "secret")
+
+    backend.set("k", "v")
+    assert redis_server.commands[:2] == ["AUTH", "SELECT"]
+    assert redis_server.databases[2]["k"][0] == "v"
+    assert 0 not in redis_server.databases
+
+
+def test_redis_errors_and_reconnect(redis_server):
+    wrong = RedisBackend.from_url(redis_server.url.replace("secret", "wrong"))
+    with pytest.raises(RuntimeError):
+        wrong.get("k")
+    # 认证失败的连接不会被复用，每次调用重新认证
+    with pytest.raises(RuntimeError):
+        wrong.get("k")
+    assert redis_server.commands.count("AUTH") == 2
+    assert "GET" not in redis_server.commands
+
+    backend = RedisBackend.from_url(redis_server.url)
+    backend.set("k", "v")
+    with pytest.raises(RuntimeError):
+        backend._command("NOSUCHCOMMAND")
+    assert backend.get("k") == "v"  # 命令错误不影响连接
+
+    # 服务端断开后下一次调用失败并丢弃连接，之后重新连接
+    redis_server.disconnect_all()
+    with pytest.raises(OSError):
+        backend.get("k")
+    assert backend.get("k") == "v"
@@ -0,0 +1,125 @@
+"""
+相似接口索引测试
+"""
+
+from models import InterfaceTaskRequest
+from prompt_history import PromptHistory, KIND_AI_ENHANCED
+from spec_index import (
+    SimilarSpecFinder, SignatureIndex, SimilarSpec, MinHasher, spec_tokens,
+    parse_data_source_rows, reuse_data_source_rows
+)
+
+DDL = "CREATE TABLE orders (id bigint, order_no varchar(32), user_id bigint, amount decimal);"
+
+
+def make_request(name: str = "查询订单", fields=("orderNo", "userId", "amount"), project_id: int = 1) -> InterfaceTaskRequest:
+    return InterfaceTaskRequest(
+        interface_name=name, interface_description="分页查询用户订单", business_logic_description="",
+        interface_path="/orders", request_body_example="{}", response_body_example="{}", project_id=project_id,
+        database_ddls=[DDL], response_structure_table=[{"parameter": f, "description": ""} for f in fields]
+    )
+
+
+def data_sources(source: str) -> str:
+    return ("| 字段名 | 主数据源 | 关联数据源 | 关联数据源关系描述 |\n"
+            "|---------|---------|-----------|----------|\n"
+            f"| orderNo | {source} |  | AI分析 |\n")
+
+
+def record(history: PromptHistory, request: InterfaceTaskRequest, fingerprint: str, source: str) -> int:
+    return history.record(request.project_id, 1, KIND_AI_ENHANCED, fingerprint, request.interface_name,
+                          request.dict(), "prompt", sections={"data_sources": data_sources(source)})
+
+
+def test_signature_index_add_replace_remove():
+    hasher = MinHasher()
+    a = hasher.signature(spec_tokens(make_request()))
+    b = hasher.signature(spec_tokens(make_request(fields=("total", "ownerName"))))
+    index = SignatureIndex()
+    index.add(1, a)
+    index.add(2, b)
+    assert index.query(a, limit=1)[0] == (1, 1.0)
+
+    index.add(1, b)  # 替换
+    assert len(index) == 2
+    assert index.query(a, threshold=0.99) == []
+
+    index.remove(2)
+    index.remove(2)
+    assert 2 not in index
+    assert [key for key, _ in index.query(b)] == [1]
+
+
+def test_finder_reloads_overwritten_entries(tmp_path):
+    history = PromptHistory(str(tmp_path))
+    finder = SimilarSpecFinder(history)
+    request = make_request()
+
+    first_id = record(history, request, "fp", "orders.order_no")
+    assert finder.search(1, request)[0].rows["orderNo"].startswith("| orderNo | orders.order_no")
+
+    # 相同指纹覆盖，记录ID不变
+    assert record(history, request, "fp", "orders.id") == first_id
+    specs = finder.search(1, request)
+    assert [s.history_id for s in specs] == [first_id]
+    assert specs[0].rows["orderNo"].startswith("| orderNo | orders.id")
+
+
+def test_finder_drops_entries_removed_by_retention(tmp_path):
+    history = PromptHistory(str(tmp_path), max_entries=1)
+    finder = SimilarSpecFinder(history)
+    request = make_request()
+
+    old_id = record(history, request, "fp1", "orders.order_no")
+    assert [s.history_id for s in finder.search(1, request)] == [old_id]
+
+    new_id = record(history, make_request(name="查询订单列表"), "fp2", "orders.id")
+    assert [s.history_id for s in finder.search(1, request)] == [new_id]
+    assert finder.stats()["signatures"] == 1
+
+
+def test_deleted_entries_do_not_push_out_live_matches(tmp_path):
+    history = PromptHistory(str(tmp_path))
+    finder = SimilarSpecFinder(history)
+    request = make_request(project_id=2)
+
+    stale_ids = [record(history, make_request(project_id=2), f"fp{i}", "orders.order_no") for i in range(3)]
+    live_id = record(history, make_request(project_id=3), "live", "orders.id")
+    finder.search(1, request)
+
+    history.delete_project(2)
+    specs = finder.search(1, request, limit=1)
+    assert [s.history_id for s in specs] == [live_id]
+    assert not any(stale_id in finder._indexes[1] for stale_id in stale_ids)
+
+
+def test_reuse_thresholds():
+    row = "| orderNo | orders.order_no |  | AI分析 |"
+    specs = [
+        SimilarSpec(1, "低", 0.6, {"orderNo": "| orderNo | low |  |  |"}),
+        SimilarSpec(2, "高", 0.9, {"orderNo": row, "userId": "| userId | orders.user_id |  |  |"}),
+    ]
+    reused = reuse_data_source_rows(sorted(specs, key=lambda s: -s.similarity), ["orderNo", "amount"], threshold=0.75)
+    assert reused == {"orderNo": row}
+    assert reuse_data_source_rows(specs, ["orderNo"], threshold=0.95) == {}
+
+
+def test_parse_data_source_rows_skips_header():
+    rows = parse_data_source_rows(data_sources("orders.order_no"))
+    assert list(rows) == ["orderNo"]
+
+
+def test_route_searches_off_the_event_loop(monkeypatch):
+    import asyncio
+    import threading
+    from routers import task_router
+
+    threads = []
+
+    def search(user_id, request):
+        threads.append(threading.current_thread())
+        raise RuntimeError("索引损坏")
+
+    monkeypatch.setattr(task_router.similar_spec_finder, "search", search)
+    assert asyncio.run(task_router._find_similar_specs(1, make_request())) == []  # 查找失败按没有相似接口处理
+    assert threads and threads[0] is not threading.main_thread()
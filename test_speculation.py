@@ -0,0 +1,136 @@
+"""
+AI增强预先生成测试
+"""
+
+import asyncio
+
+import speculation
+from shared_state import MemoryBackend
+from speculation import SpeculativeEnhancer, STATUS_STARTED, STATUS_RUNNING, STATUS_READY, STATUS_LIMITED
+
+
+class FakeAI:
+    """记录调用次数的AI段落生成，release 未设置时一直等待"""
+
+    def __init__(self, result: str = "AI结果"):
+        self.result = result
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        await self.release.wait()
+        return self.result
+
+
+async def unexpected() -> str:
+    raise AssertionError("不应重新调用AI")
+
+
+async def wait_idle(enhancer: SpeculativeEnhancer):
+    while enhancer.stats()["running"]:
+        await asyncio.sleep(0.01)
+
+
+def test_take_uses_ready_result():
+    async def main():
+        enhancer = SpeculativeEnhancer(MemoryBackend())
+        ai = FakeAI()
+        ai.release.set()
+        assert await enhancer.start(1, 10, {"data_sources": ("fp", ai)}) == {"data_sources": STATUS_STARTED}
+        await wait_idle(enhancer)
+
+        assert await enhancer.start(1, 10, {"data_sources": ("fp", ai)}) == {"data_sources": STATUS_READY}
+        assert await enhancer.take(1, "data_sources", "fp", unexpected) == "AI结果"
+        # 结果按用户和输入指纹区分
+        other = FakeAI("其他用户")
+        other.release.set()
+        assert await enhancer.take(2, "data_sources", "fp", other) == "其他用户"
+        return enhancer, ai
+
+    enhancer, ai = asyncio.run(main())
+    assert ai.calls == 1
+    assert enhancer.stats()["ready_hits"] == 1
+    assert enhancer.stats()["misses"] == 1
+
+
+def test_take_waits_for_running_task():
+    async def main():
+        enhancer = SpeculativeEnhancer(MemoryBackend())
+        ai = FakeAI()
+        await enhancer.start(1, 10, {"business_logic": ("fp", ai)})
+        assert await enhancer.start(1, 10, {"business_logic": ("fp", ai)}) == {"business_logic": STATUS_RUNNING}
+
+        taking = asyncio.create_task(enhancer.take(1, "business_logic", "fp", unexpected))
+        await asyncio.sleep(0.05)
+        assert not taking.done()
+        ai.release.set()
+        return enhancer, ai, await taking
+
+    enhancer, ai, result = asyncio.run(main())
+    assert result == "AI结果"
+    assert ai.calls == 1
+    assert enhancer.stats()["running_hits"] == 1
+
+
+def test_changed_inputs_cancel_previous_tasks():
+    async def main():
+        enhancer = SpeculativeEnhancer(MemoryBackend())
+        old, new, other_user = FakeAI("旧"), FakeAI("新"), FakeAI("其他用户")
+        await enhancer.start(1, 10, {"data_sources": ("old", old)})
+        await enhancer.start(2, 10, {"data_sources": ("old", other_user)})
+        await asyncio.sleep(0)
+
+        assert await enhancer.start(1, 10, {"data_sources": ("new", new)}) == {"data_sources": STATUS_STARTED}
+        assert enhancer.stats()["cancelled"] == 1
+        assert enhancer.stats()["running"] == 2  # 其他用户的预先增强不受影响
+
+        # 已取消的输入重新调用AI
+        fallback = FakeAI("重新生成")
+        fallback.release.set()
+        assert await enhancer.take(1, "data_sources", "old", fallback) == "重新生成"
+        new.release.set()
+        assert await enhancer.take(1, "data_sources", "new", unexpected) == "新"
+        await enhancer.stop()
+        return enhancer
+
+    enhancer = asyncio.run(main())
+    assert enhancer.stats()["running"] == 0
+    assert enhancer.stats()["misses"] == 1
+
+
+def test_failed_speculation_falls_back_to_factory():
+    async def failing() -> str:
+        raise RuntimeError("AI服务不可用")
+
+    async def main():
+        enhancer = SpeculativeEnhancer(MemoryBackend())
+        await enhancer.start(1, 10, {"data_sources": ("fp", failing)})
+        fallback = FakeAI("直接生成")
+        fallback.release.set()
+        return await enhancer.take(1, "data_sources", "fp", fallback)
+
+    assert asyncio.run(main()) == "直接生成"
+
+
+def test_running_and_hourly_limits(monkeypatch):
+    monkeypatch.setattr(speculation, "SPECULATION_HOURLY_LIMIT", 3)
+
+    async def main():
+        enhancer = SpeculativeEnhancer(MemoryBackend())
+        planned = {name: ("fp", FakeAI()) for name in ("a", "b", "c")}
+        statuses = await enhancer.start(1, 10, planned)
+        await enhancer.stop()
+
+        first = await enhancer.start(1, 10, {"d": ("fp", FakeAI())})
+        second = await enhancer.start(1, 10, {"d": ("fp2", FakeAI())})
+        await enhancer.stop()
+        return enhancer, statuses, first, second
+
+    enhancer, statuses, first, second = asyncio.run(main())
+    # 同时进行的数量受限
+    assert statuses == {"a": STATUS_STARTED, "b": STATUS_STARTED, "c": STATUS_LIMITED}
+    # 每小时启动次数受限
+    assert first == {"d": STATUS_STARTED}
+    assert second == {"d": STATUS_LIMITED}
+    assert enhancer.stats()["limited"] == 2
@@ -0,0 +1,231 @@
+"""
+JSON存储测试：按用户分片、旧格式迁移和多实例缓存失效
+"""
+
+import os
+import json
+import time
+
+import pytest
+
+import change_notifier
+import storage as storage_module
+from blob_store import BlobStore, is_blob_ref
+from models import User, ProjectCreate, ProjectUpdate, AIConfigCreate
+from storage import JSONStorage, STORAGE_FORMAT_VERSION
+
+
+@pytest.fixture
+def make_storage(tmp_path, monkeypatch):
+    """在临时目录中创建存储，项目长文本写入临时的blob目录"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(storage_module, "blob_store", BlobStore(str(tmp_path / "blobs")))
+    created = []
+
+    def factory(data_dir: str = "data") -> JSONStorage:
+        instance = JSONStorage(data_dir)
+        created.append(instance)
+        return instance
+
+    yield factory
+    for instance in created:
+        if instance.notifier:
+            instance.notifier.stop()
+
+
+def read_json(path: str):
+    with open(path, "rb") as f:
+        return json.loads(f.read())
+
+
+def test_constructor_has_no_side_effects(tmp_path, make_storage):
+    make_storage("data")
+    assert not os.path.exists(tmp_path / "data")
+    assert not os.path.exists(tmp_path / "logs")
+
+
+def test_writes_go_to_user_shards(make_storage):
+    store = make_storage()
+    alice = store.create_user(User(username="alice", email="alice@example.com", password_hash="x"))
+    bob = store.create_user(User(username="bob", email="bob@example.com", password_hash="x"))
+    project = store.create_project(alice.id, ProjectCreate(name="项目", development_standard="规范" * 600))
+    store.create_ai_config(bob.id, AIConfigCreate(api_key="k" * 30, api_url="offline://local", model_name="gpt-4o"))
+
+    index = read_json("data/index.json")
+    assert index["emails"] == {"alice@example.com": alice.id, "bob@example.com": bob.id}
+    assert index["projects"] == {str(project.id): alice.id}
+
+    projects = read_json(f"data/users/{alice.id}/projects.json")
+    assert is_blob_ref(projects[0]["development_standard"])  # 长文本保存在blob中
+    assert read_json(f"data/users/{bob.id}/projects.json") == []
+    assert os.path.exists(f"data/users/{bob.id}/ai_config.json")
+
+    assert store.get_project_by_id(project.id).development_standard == "规范" * 600
+    assert store.update_project(project.id, ProjectUpdate(name="新名称")).name == "新名称"
+    assert store.delete_project(project.id)
+    assert store.get_project_by_id(project.id) is None
+    assert read_json("data/index.json")["projects"] == {}
+
+
+def test_summaries_do_not_read_blobs(make_storage, monkeypatch):
+    store = make_storage()
+    user = store.create_user(User(username="alice", email="alice@example.com", password_hash="x"))
+    standard = "- 使用MyBatis\n" + "- 其他规范\n" * 300
+    store.create_project(user.id, ProjectCreate(name="项目", development_standard=standard))
+
+    def unexpected(blob_hash):
+        raise AssertionError("列表页不应读取blob内容")
+
+    monkeypatch.setattr(storage_module.blob_store, "get", unexpected)
+    summary = store.get_project_summaries_by_user_id(user.id)[0]
+    assert summary.preview == "使用MyBatis"
+    assert summary.standards_count == 302
+    assert summary.content_size == len(standard)
+
+
+def age_blobs(store_blobs: BlobStore, seconds: float = 3600):
+    for root, _, files in os.walk(store_blobs.blob_dir):
+        for name in files:
+            os.utime(os.path.join(root, name), (time.time() - seconds, time.time() - seconds))
+
+
+def test_update_and_delete_release_unreferenced_blobs(make_storage):
+    store = make_storage()
+    blobs = storage_module.blob_store
+    alice = store.create_user(User(username="alice", email="alice@example.com", password_hash="x"))
+    bob = store.create_user(User(username="bob", email="bob@example.com", password_hash="x"))
+    shared, unique = "共用规范" * 300, "独有规范" * 300
+    first = store.create_project(alice.id, ProjectCreate(name="a", development_standard=shared,
+                                                         interface_example=unique))
+    store.create_project(bob.id, ProjectCreate(name="b", development_standard=shared))
+    assert blobs.stats()["blobs"] == 2
+
+    # 刚写入的blob暂不删除，留给启动时的清理
+    store.update_project(first.id, ProjectUpdate(interface_example=""))
+    assert blobs.stats()["blobs"] == 2
+
+    store.update_project(first.id, ProjectUpdate(interface_example=unique))
+    age_blobs(blobs)
+    store.update_project(first.id, ProjectUpdate(name="只改名称"))
+    assert blobs.stats()["blobs"] == 2
+    store.update_project(first.id, ProjectUpdate(interface_example="短文本"))
+    assert blobs.stats()["blobs"] == 1
+
+    # 其他用户的项目仍引用相同内容，删除项目时保留
+    assert store.delete_project(first.id)
+    assert blobs.stats()["blobs"] == 1
+    assert store.get_projects_by_user_id(bob.id)[0].development_standard == shared
+
+
+def test_duplicate_user_is_rejected(make_storage):
+    store = make_storage()
+    store.create_user(User(username="alice", email="alice@example.com", password_hash="x"))
+    with pytest.raises(ValueError):
+        store.create_user(User(username="alice2", email="alice@example.com", password_hash="x"))
+
+
+def write_legacy_files(data_dir: str):
+    os.makedirs(data_dir)
+    legacy = {
+        "users.json": [
+            {"id": 1, "email": "a@example.com", "username": "a", "password_hash": "x", "created_at": "2024-01-01 10:00:00"},
+            {"id": 3, "email": "b@example.com", "username": "b", "password_hash": "x", "created_at": "2024-01-02T10:00:00"},
+        ],
+        "projects.json": [
+            {"id": 5, "user_id": 1, "name": "p", "development_standard": "规范" * 600, "interface_example": "",
+             "entity_example": "", "mapper_example": "", "created_at": "2024-01-01 10:00:00", "updated_at": None},
+            {"id": 9, "user_id": 42, "name": "孤立项目", "development_standard": "", "interface_example": "",
+             "entity_example": "", "mapper_example": ""},
+        ],
+        "ai_configs.json": [
+            {"id": 2, "user_id": 3, "api_key": "k", "api_url": "offline://local", "model_name": "gpt-4o"},
+        ],
+    }
+    for name, records in legacy.items():
+        with open(os.path.join(data_dir, name), "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False)
+
+
+def test_migration_runs_only_when_requested(make_storage):
+    write_legacy_files("data")
+    store = make_storage()
+
+    # 普通读写不会迁移旧文件
+    assert store.get_user_by_email("a@example.com") is None
+    assert os.path.exists("data/users.json")
+
+    assert store.migrate_storage_format() == 2 + 1 + 1
+    assert store.migrate_storage_format() == 0
+    with open("data/format_version") as f:
+        assert f.read() == str(STORAGE_FORMAT_VERSION)
+    assert sorted(name for name in os.listdir("data") if name.endswith(".bak")) == [
+        "ai_configs.json.bak", "projects.json.bak", "users.json.bak"]
+
+    user = store.get_user_by_email("a@example.com")
+    assert user.id == 1
+    assert user.created_at.isoformat() == "2024-01-01T10:00:00"
+    assert store.get_project_by_id(5).development_standard == "规范" * 600
+    assert store.get_ai_config_by_user_id(3).model_name == "gpt-4o"
+    assert store.get_project_by_id(9) is None
+
+    # ID计数器接着旧数据继续分配
+    new_user = store.create_user(User(username="c", email="c@example.com", password_hash="x"))
+    assert new_user.id == 4
+    assert store.create_project(1, ProjectCreate(name="q", development_standard="")).id == 6
+
+
+def test_interrupted_migration_resumes(make_storage):
+    write_legacy_files("data")
+    store = make_storage()
+    # 模拟第一个用户迁移完成后中断
+    store.create_user(User(id=1, username="a", email="a@example.com", password_hash="x"))
+
+    assert store.migrate_storage_format() == 2  # 只迁移剩余的用户及其AI配置
+    assert store.get_user_by_email("b@example.com").id == 3
+
+
+@pytest.fixture(params=["polling", "inotify"])
+def storage_pair(request, make_storage, monkeypatch):
+    """共享同一数据目录的两个存储实例，模拟两个工作进程"""
+    monkeypatch.setattr(storage_module, "STORAGE_CACHE_ENABLED", True)
+    monkeypatch.setattr(storage_module, "create_notifier",
+                        lambda root, callback: change_notifier.create_notifier(root, callback, mode=request.param))
+    first, second = make_storage(), make_storage()
+    assert first.cache_stats()["notifier"] == second.cache_stats()["notifier"] == request.param
+    return first, second
+
+
+def test_cache_sees_writes_from_other_instance(storage_pair):
+    first, second = storage_pair
+    user = first.create_user(User(username="alice", email="alice@example.com", password_hash="x"))
+    project = first.create_project(user.id, ProjectCreate(name="旧名称", development_standard=""))
+
+    # 读取后进入缓存，另一实例写入后缓存失效
+    assert [p.name for p in first.get_projects_by_user_id(user.id)] == ["旧名称"]
+    second.update_project(project.id, ProjectUpdate(name="新名称"))
+    assert [p.name for p in first.get_projects_by_user_id(user.id)] == ["新名称"]
+
+    # 文件不存在的结果同样被缓存，另一实例创建文件后可见
+    assert first.get_ai_config_by_user_id(user.id) is None
+    second.create_ai_config(user.id, AIConfigCreate(api_key="k", api_url="offline://local", model_name="gpt-4o"))
+    assert first.get_ai_config_by_user_id(user.id).model_name == "gpt-4o"
+
+
+def test_cache_sees_deletes_from_other_instance(storage_pair):
+    first, second = storage_pair
+    user = first.create_user(User(username="alice", email="alice@example.com", password_hash="x"))
+    first.create_ai_config(user.id, AIConfigCreate(api_key="k", api_url="offline://local", model_name="gpt-4o"))
+    assert first.get_ai_config_by_user_id(user.id) is not None
+    assert second.get_ai_config_by_user_id(user.id) is not None
+
+    version = first.cache_stats()["version"]
+    assert second.delete_ai_config(user.id)
+    assert first.cache_stats()["version"] > version
+    # 删除方自己的缓存和另一实例的缓存都失效
+    assert second.get_ai_config_by_user_id(user.id) is None
+    assert first.get_ai_config_by_user_id(user.id) is None
+
+    project = first.create_project(user.id, ProjectCreate(name="项目", development_standard=""))
+    assert first.get_project_by_id(project.id) is not None
+    assert second.delete_project(project.id)
+    assert first.get_project_by_id(project.id) is None
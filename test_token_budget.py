@@ -0,0 +1,81 @@
+"""
+Prompt token预算测试
+"""
+
+from token_budget import (
+    PromptBudget, PromptSection, count_tokens, get_context_window, get_prompt_budget, truncate_to_tokens,
+    MAX_PROMPT_TOKENS, TRUNCATION_MARK
+)
+
+
+def long_text(lines: int, word: str = "column") -> str:
+    return "\n".join(f"{word}_{i} varchar(32) 说明{i}" for i in range(lines))
+
+
+def test_count_tokens_and_context_windows():
+    assert count_tokens("") == 0
+    assert count_tokens("中文") == 2
+    assert count_tokens("abcdefgh") == 2
+    assert count_tokens("a\nb") == 3
+
+    assert get_context_window("gpt-4-32k-0613") == 32768  # 最长前缀优先
+    assert get_context_window("GPT-4o-mini") == 128000
+    assert get_context_window("gpt-4o-2024-08-06") == 128000
+    assert get_context_window("gpt-4-turbo-2024-04-09") == 128000
+    assert get_context_window("gpt-4-0125-preview") == 128000
+    assert get_context_window("gpt-4-0613") == 8192
+    assert get_context_window("gpt-4.1-mini") == 1047576
+    assert get_context_window("o1-mini") == 128000
+    assert get_context_window("o3-mini") == 200000
+    assert get_context_window("unknown-model") == 8192
+    assert get_prompt_budget("gpt-4o") == MAX_PROMPT_TOKENS
+    assert get_prompt_budget("gpt-4", completion_tokens=8000) == 0
+
+
+def test_truncate_to_tokens():
+    text = long_text(200)
+    truncated = truncate_to_tokens(text, 100)
+    assert count_tokens(truncated) <= 100
+    assert truncated.endswith(TRUNCATION_MARK)
+    assert truncate_to_tokens("短文本", 100) == "短文本"
+
+    single_line = "字" * 500
+    assert count_tokens(truncate_to_tokens(single_line, 50)) <= 50
+
+
+def test_fit_within_budget_keeps_text():
+    budget = PromptBudget("gpt-4o")
+    sections, report = budget.fit("模板【a】", [PromptSection("a", "内容")])
+    assert sections == {"a": "内容"}
+    assert report.within_budget
+    assert report.actions == []
+
+
+def test_fit_reduces_then_truncates_by_priority():
+    budget = PromptBudget("gpt-4", completion_tokens=6000)  # 预算约1900
+    ddl = long_text(400)
+    description = long_text(50, "desc")
+    sections, report = budget.fit("模板", [
+        PromptSection("name", "接口名称", truncatable=False),
+        PromptSection("description", description, priority=1),
+        PromptSection("ddl", ddl, priority=2, original=ddl + "\n" + ddl,
+                      reducers=[lambda text: "\n".join(text.splitlines()[:150])]),
+    ])
+
+    assert report.within_budget
+    assert report.tokens_after <= budget.budget < report.tokens_before
+    assert sections["name"] == "接口名称"
+    # 优先级高的DDL先精简，仍超出时先截断DDL，优先级较低的描述保持不变
+    assert sections["ddl"].startswith("column_0")
+    assert sections["ddl"].endswith(TRUNCATION_MARK)
+    assert sections["description"] == description
+    assert [action.split(" ")[0] for action in report.actions] == ["ddl去重", "ddl精简", "ddl截断"]
+    assert report.section_tokens["ddl"][0] == count_tokens(ddl + "\n" + ddl)
+
+
+def test_fit_never_truncates_protected_sections():
+    budget = PromptBudget("gpt-4", completion_tokens=7800)
+    name = long_text(100)
+    sections, report = budget.fit("", [PromptSection("name", name, truncatable=False)])
+    assert sections["name"] == name
+    assert not report.within_budget
@@ -0,0 +1,101 @@
+"""
+AI调用用量统计测试
+"""
+
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from usage_accounting import (
+    UsageLedger, UsageRecord, bucket_percentile, latency_bucket, usage_scope, current_usage_scope,
+    LATENCY_BUCKETS_MS, OUTCOME_OK, OUTCOME_ERROR, OUTCOME_CANCELLED
+)
+
+
+def test_latency_bucket_bounds():
+    assert latency_bucket(0) == 0
+    assert latency_bucket(50) == 0
+    assert latency_bucket(50.1) == 1
+    assert latency_bucket(LATENCY_BUCKETS_MS[-1] + 1) == len(LATENCY_BUCKETS_MS)
+
+
+def test_bucket_percentile_interpolates_within_bucket():
+    assert bucket_percentile({}, 50) is None
+    assert bucket_percentile({0: 10}, 50) == 25.0
+    # 100~200ms 的桶中有一半调用，p50落在50~100ms桶的上沿
+    counts = {latency_bucket(80): 5, latency_bucket(150): 5}
+    assert bucket_percentile(counts, 50) == 100.0
+    assert bucket_percentile(counts, 90) == 180.0
+    assert bucket_percentile(counts, 100) == 200.0
+    # 最后一个桶没有上界，按下界的两倍估算
+    last = len(LATENCY_BUCKETS_MS)
+    assert bucket_percentile({last: 2}, 50) == LATENCY_BUCKETS_MS[-1] * 1.5
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return UsageLedger(str(tmp_path))
+
+
+def record(ledger: UsageLedger, outcome: str = OUTCOME_OK, latency_ms: float = 100, days_ago: int = 0,
+           user_id: int = 1, project_id=10, model: str = "gpt-4o", task: str = "data_sources", tokens=(100, 20)):
+    created_at = time.time() - days_ago * 86400
+    ledger.record(UsageRecord(user_id, project_id, "默认", model, task, outcome, tokens[0], tokens[1],
+                              latency_ms, created_at=created_at))
+
+
+def test_daily_and_model_rollups(ledger):
+    for latency in (80, 80, 150, 150):
+        record(ledger, latency_ms=latency)
+    record(ledger, OUTCOME_ERROR, latency_ms=60000)
+    record(ledger, OUTCOME_CANCELLED, latency_ms=5000, tokens=(100, 0))
+    ledger.record_cache_hit(1, 10, "默认", "gpt-4o", "data_sources")
+    record(ledger, latency_ms=1000, days_ago=1, model="gpt-4o-mini", task="business_logic", project_id=None)
+    record(ledger, days_ago=5)  # 超出统计范围
+    record(ledger, user_id=2)  # 其他用户
+    assert ledger.flush()
+
+    summary = ledger.summary(1, days=2)
+    today = datetime.now().strftime("%Y-%m-%d")
+    yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+    assert summary["since"] == yesterday
+
+    daily = {item["day"]: item for item in summary["daily"]}
+    assert list(daily) == [yesterday, today]
+    assert daily[today]["calls"] == 6  # 命中缓存不计为调用
+    assert (daily[today]["errors"], daily[today]["cancelled"], daily[today]["cache_hits"]) == (1, 1, 1)
+    assert daily[today]["prompt_tokens"] == 600
+    assert daily[today]["total_tokens"] == 600 + 100
+    assert daily[today]["avg_latency_ms"] == 115.0  # 只统计成功的调用
+    assert daily[yesterday]["calls"] == 1
+
+    models = {item["model"]: item for item in summary["models"]}
+    assert models["gpt-4o"]["p50_latency_ms"] == 100.0
+    assert models["gpt-4o"]["p99_latency_ms"] == pytest.approx(198.0)
+    assert models["gpt-4o-mini"]["p50_latency_ms"] == 875.0
+
+    assert [item["project_id"] for item in summary["projects"]] == [0, 10]
+    assert [item["task"] for item in summary["tasks"]] == ["business_logic", "data_sources"]
+
+    # 不指定用户时统计全部用户
+    assert sum(item["calls"] for item in ledger.summary(None, days=2)["daily"]) == 8
+
+
+def test_recent_calls(ledger):
+    record(ledger, latency_ms=10, days_ago=1)
+    record(ledger, OUTCOME_ERROR, latency_ms=20)
+    record(ledger, user_id=2)
+    assert ledger.flush()
+
+    calls = ledger.recent_calls(1)
+    assert [call["outcome"] for call in calls] == [OUTCOME_ERROR, OUTCOME_OK]
+    assert calls[0]["provider"] == "默认" and calls[0]["estimated"] == 0
+    assert len(ledger.recent_calls(1, limit=1)) == 1
+
+
+def test_usage_scope():
+    assert current_usage_scope() is None
+    with usage_scope(1, 10):
+        assert current_usage_scope() == (1, 10)
+    assert current_usage_scope() is None
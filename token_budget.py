@@ -0,0 +1,208 @@
+import re
+import math
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 各模型的上下文窗口（按配置中的模型名前缀匹配，越长的前缀越优先，如 gpt-4o-2024-08-06 按 gpt-4o）
+MODEL_CONTEXT_WINDOWS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-3.5-turbo-instruct": 4096,
+    "gpt-4": 8192,
+    "gpt-4-32k": 32768,
+    "gpt-4-turbo": 128000,
+    "gpt-4-1106-preview": 128000,
+    "gpt-4-0125-preview": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "chatgpt-4o-latest": 128000,
+    "gpt-4.1": 1047576,
+    "gpt-4.1-mini": 1047576,
+    "gpt-4.1-nano": 1047576,
+    "o1": 200000,
+    "o1-mini": 128000,
+    "o1-preview": 128000,
+    "o3": 200000,
+    "o3-mini": 200000,
+    "o4-mini": 200000,
+    "claude": 200000,
+    "deepseek": 64000,
+    "qwen": 32768,
+    "glm": 128000,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# 预留给模型答复的token数（即请求中的max_tokens）
+COMPLETION_TOKENS = 2000
+
+# 单次请求的Prompt上限：即使模型窗口更大，也不发送超过该数量的token，控制费用和延迟
+MAX_PROMPT_TOKENS = 12000
+
+# 估算误差的安全余量
+SAFETY_MARGIN_TOKENS = 256
+
+TRUNCATION_MARK = "\n...（内容过长，已截断）"
+
+# 离线分词规则：CJK字符单独计数，英文单词约每4个字符一个token，数字每3位一个token，标点单独计数
+_TOKEN_PATTERN = re.compile(
+    r'[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]'
+    r'|[A-Za-z]+'
+    r'|\d+'
+    r'|[^\sA-Za-z\d]'
+)
+
+
+def count_tokens(text: str) -> int:
+    """离线估算文本的token数（不依赖网络和第三方分词器）"""
+    if not text:
+        return 0
+    tokens = 0
+    for piece in _TOKEN_PATTERN.findall(text):
+        if piece[0].isascii() and piece[0].isalpha():
+            tokens += math.ceil(len(piece) / 4)
+        elif piece[0].isdigit():
+            tokens += math.ceil(len(piece) / 3)
+        else:
+            tokens += 1
+    # 换行通常单独成为token
+    return tokens + text.count("\n")
+
+
+def get_context_window(model_name: str) -> int:
+    """获取模型的上下文窗口大小"""
+    name = (model_name or "").lower()
+    matched = [prefix for prefix in MODEL_CONTEXT_WINDOWS if name.startswith(prefix)]
+    if not matched:
+        return DEFAULT_CONTEXT_WINDOW
+    return MODEL_CONTEXT_WINDOWS[max(matched, key=len)]
+
+
+def get_prompt_budget(model_name: str, completion_tokens: int = COMPLETION_TOKENS) -> int:
+    """计算模型可用于Prompt的token预算"""
+    available = get_context_window(model_name) - completion_tokens - SAFETY_MARGIN_TOKENS
+    return max(0, min(available, MAX_PROMPT_TOKENS))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """按行截断文本使其不超过max_tokens，单行过长时按字符截断"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    budget = max_tokens - count_tokens(TRUNCATION_MARK)
+    if budget <= 0:
+        return ""
+
+    kept, used = [], 0
+    for line in text.splitlines():
+        line_tokens = count_tokens(line) + 1
+        if used + line_tokens > budget:
+            if not kept:
+                # 第一行就超出预算，按字符二分截断
+                low, high = 0, len(line)
+                while low < high:
+                    mid = (low + high + 1) // 2
+                    if count_tokens(line[:mid]) <= budget:
+                        low = mid
+                    else:
+                        high = mid - 1
+                kept.append(line[:low])
+            break
+        kept.append(line)
+        used += line_tokens
+    return "\n".join(kept) + TRUNCATION_MARK
+
+
+@dataclass
+class PromptSection:
+    """Prompt中的一个可压缩段落
+
+    priority 数值越大越先被压缩；reducers 为有损压缩步骤，按顺序尝试，
+    全部尝试后仍超出预算时才会截断（truncatable=False 的段落不会被截断）。
+    """
+    name: str
+    text: str
+    priority: int = 0
+    original: Optional[str] = None
+    reducers: List[Callable[[str], str]] = field(default_factory=list)
+    truncatable: bool = True
+    min_tokens: int = 64
+
+
+@dataclass
+class BudgetReport:
+    """Prompt压缩报告"""
+    model_name: str
+    budget: int
+    tokens_before: int = 0
+    tokens_after: int = 0
+    section_tokens: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    actions: List[str] = field(default_factory=list)
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.tokens_before - self.tokens_after)
+
+    @property
+    def within_budget(self) -> bool:
+        return self.tokens_after <= self.budget
+
+    def summary(self) -> str:
+        text = (f"模型 {self.model_name}，预算 {self.budget}，压缩前 {self.tokens_before}，"
+                f"压缩后 {self.tokens_after}，节省 {self.tokens_saved}")
+        if self.actions:
+            text += "；" + "；".join(self.actions)
+        return text
+
+
+class PromptBudget:
+    """按模型预算压缩Prompt段落"""
+
+    def __init__(self, model_name: str, completion_tokens: int = COMPLETION_TOKENS):
+        self.model_name = model_name
+        self.completion_tokens = completion_tokens
+        self.budget = get_prompt_budget(model_name, completion_tokens)
+
+    def fit(self, template: str, sections: List[PromptSection]) -> Tuple[Dict[str, str], BudgetReport]:
+        """压缩各段落使 模板固定部分 + 全部段落 不超过预算
+
+        返回 段落名 -> 压缩后文本 的字典和压缩报告。
+        """
+        report = BudgetReport(model_name=self.model_name, budget=self.budget)
+        overhead = count_tokens(template)
+        texts = {s.name: s.text for s in sections}
+        tokens = {s.name: count_tokens(s.text) for s in sections}
+        before = {s.name: count_tokens(s.original) if s.original is not None else tokens[s.name] for s in sections}
+        report.tokens_before = overhead + sum(before.values())
+        for section in sections:
+            if before[section.name] > tokens[section.name]:
+                report.actions.append(f"{section.name}去重 {before[section.name]}→{tokens[section.name]}")
+
+        def total() -> int:
+            return overhead + sum(tokens.values())
+
+        ordered = sorted(sections, key=lambda s: s.priority, reverse=True)
+
+        # 第一轮：有损压缩
+        for section in ordered:
+            for reducer in section.reducers:
+                if total() <= self.budget:
+                    break
+                reduced = reducer(texts[section.name])
+                reduced_tokens = count_tokens(reduced)
+                if reduced_tokens < tokens[section.name]:
+                    report.actions.append(f"{section.name}精简 {tokens[section.name]}→{reduced_tokens}")
+                    texts[section.name], tokens[section.name] = reduced, reduced_tokens
+
+        # 第二轮：按优先级截断
+        for section in ordered:
+            excess = total() - self.budget
+            if excess <= 0:
+                break
+            if not section.truncatable or tokens[section.name] <= section.min_tokens:
+                continue
+            target = max(section.min_tokens, tokens[section.name] - excess)
+            truncated = truncate_to_tokens(texts[section.name], target)
+            report.actions.append(f"{section.name}截断 {tokens[section.name]}→{count_tokens(truncated)}")
+            texts[section.name], tokens[section.name] = truncated, count_tokens(truncated)
+
+        report.tokens_after = total()
+        report.section_tokens = {name: (before[name], tokens[name]) for name in texts}
+        return texts, report
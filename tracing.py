@@ -0,0 +1,252 @@
+"""
+请求链路追踪
+
+按OpenTelemetry的数据模型记录span（trace_id、span_id、父span、起止时间、属性），
+一个请求结束后把它的全部span写入本地文件（每行一个JSON，字段与OTLP/JSON一致）。
+通过 PROMPT_TRACE_SAMPLE_RATE 设置采样率（默认0即关闭）；请求头带有已采样的
+traceparent 时沿用上游的trace，调用AI服务时同样通过 traceparent 请求头向下游传递。
+未采样时 span() 只读取一次上下文变量，不产生其他开销。
+"""
+
+import os
+import time
+import queue
+import random
+import secrets
+import asyncio
+import functools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+import codec
+
+# 采样率（0~1），0为关闭
+TRACE_SAMPLE_RATE = float(os.environ.get("PROMPT_TRACE_SAMPLE_RATE", "0"))
+
+# span导出文件
+TRACE_FILE = os.environ.get("PROMPT_TRACE_FILE", os.path.join("logs", "traces.jsonl"))
+
+
+class Span:
+    """一个span，结束时加入所属trace"""
+
+    __slots__ = ("trace", "name", "span_id", "parent_id", "attributes", "status", "start_ns", "end_ns")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = "OK"
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        self.attributes.update(attributes)
+
+    def record_error(self, error: BaseException):
+        self.status = "ERROR"
+        self.attributes["error.type"] = type(error).__name__
+        self.attributes["error.message"] = str(error)
+
+    def end(self):
+        self.end_ns = time.time_ns()
+        self.trace.spans.append(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "traceId": self.trace.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "status": self.status
+        }
+
+
+class _NoopSpan:
+    """未采样时使用的span，所有操作为空"""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        pass
+
+    def record_error(self, error: BaseException):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List[Span] = []
+
+
+class FileSpanExporter:
+    """把span写入本地文件（JSON Lines），写入在后台线程完成，不占用事件循环"""
+
+    def __init__(self, path: str = TRACE_FILE):
+        self.path = path
+        self._queue: "queue.SimpleQueue[List[dict]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._thread.start()
+        self._queue.put([span.to_dict() for span in spans])
+
+    def _run(self):
+        while True:
+            batch = self._queue.get()
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "ab") as f:
+                    f.write(b"".join(codec.dumps(record, pretty=False) + b"\n" for record in batch))
+            except Exception as e:
+                print(f"写入追踪数据失败: {str(e)}")
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("trace_span", default=None)
+
+# 创建全局导出实例
+span_exporter = FileSpanExporter()
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """解析W3C traceparent请求头，返回 (trace_id, 父span_id, 是否已采样)，格式不正确时为None"""
+    parts = (value or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        trace_id, parent_id, flags = int(parts[1], 16), int(parts[2], 16), int(parts[3], 16)
+    except ValueError:
+        return None
+    if not trace_id or not parent_id:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+def current_traceparent() -> Optional[str]:
+    """当前span对应的traceparent，未采样时为None"""
+    current = _current_span.get()
+    if current is None:
+        return None
+    return f"00-{current.trace.trace_id}-{current.span_id}-01"
+
+
+def inject_trace_headers(headers: Dict[str, str]) -> Dict[str, str]:
+    """向下游请求头写入traceparent"""
+    traceparent = current_traceparent()
+    if traceparent:
+        headers["traceparent"] = traceparent
+    return headers
+
+
+@contextmanager
+def start_trace(name: str, traceparent: Optional[str] = None, sample_rate: float = None, **attributes):
+    """开始一个请求的根span；未被采样时返回空span。根span结束时导出整个trace"""
+    sample_rate = TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+    parent = parse_traceparent(traceparent)
+    if parent is not None and parent[2]:
+        trace, parent_id = Trace(parent[0]), parent[1]
+    elif sample_rate > 0 and random.random() < sample_rate:
+        trace, parent_id = Trace(secrets.token_hex(16)), None
+    else:
+        yield NOOP_SPAN
+        return
+    root = Span(trace, name, parent_id, attributes)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        root.end()
+        span_exporter.export(trace.spans)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """在当前trace下创建子span，当前请求未被采样时返回空span"""
+    parent = _current_span.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+    child = Span(parent.trace, name, parent.span_id, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+
+def traced(name: str):
+    """用span包裹函数（支持协程函数）"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current_span.get() is None:
+                    return await func(*args, **kwargs)
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TracingMiddleware:
+    """为每个HTTP请求创建根span（ASGI）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        traceparent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        with start_trace(f"{scope['method']} {scope['path']}", traceparent,
+                         **{"http.method": scope["method"], "http.target": scope["path"]}) as root:
+            if root is NOOP_SPAN:
+                await self.app(scope, receive, send)
+                return
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    root.set_attribute("http.status_code", message["status"])
+                await send(message)
+            await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,308 @@
+"""
+AI调用用量统计
+
+每次AI调用（以及命中历史、复用段落而省去的调用）记录token数、耗时和结果，
+按用户、项目、模型和增强类型（数据源分析、业务逻辑等）区分。
+写入时同步累加按天汇总的计数和延迟分布（固定分桶），
+日报、按模型的延迟分位数直接查询汇总表，不扫描明细。
+写入在后台线程中批量完成，不占用事件循环。
+"""
+
+import os
+import time
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, astuple
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# 用量数据目录
+USAGE_DIR = os.path.join("data", "usage")
+
+# 调用明细的保留天数，汇总数据不清理
+USAGE_DETAIL_RETENTION_DAYS = int(os.environ.get("PROMPT_USAGE_RETENTION_DAYS", "30"))
+
+# 延迟分桶的上界（毫秒），最后一个桶不设上界
+LATENCY_BUCKETS_MS = (
+    50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000,
+    7500, 10000, 15000, 20000, 30000, 45000, 60000, 90000
+)
+
+# 调用结果
+OUTCOME_OK = "ok"
+OUTCOME_ERROR = "error"
+OUTCOME_CANCELLED = "cancelled"
+OUTCOME_CACHE_HIT = "cache_hit"
+
+# 查询汇总时允许的最大天数
+USAGE_MAX_DAYS = 366
+
+
+@dataclass
+class UsageRecord:
+    """一次AI调用的用量"""
+    user_id: int
+    project_id: Optional[int]
+    provider: str
+    model: str
+    task: str
+    outcome: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency_ms: float = 0.0
+    estimated: bool = False  # 服务未返回用量时为离线估算的token数
+    created_at: float = 0.0
+
+
+def latency_bucket(latency_ms: float) -> int:
+    """延迟所在分桶的序号"""
+    for index, bound in enumerate(LATENCY_BUCKETS_MS):
+        if latency_ms <= bound:
+            return index
+    return len(LATENCY_BUCKETS_MS)
+
+
+def bucket_percentile(counts: Dict[int, int], percentile: float) -> Optional[float]:
+    """按分桶计数估算延迟分位数（桶内线性插值），没有数据时为None"""
+    total = sum(counts.values())
+    if not total:
+        return None
+    target = total * percentile / 100
+    seen = 0
+    for index in sorted(counts):
+        count = counts[index]
+        if seen + count >= target:
+            lower = LATENCY_BUCKETS_MS[index - 1] if index > 0 else 0
+            upper = LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else lower * 2
+            return round(lower + (upper - lower) * (target - seen) / count, 1)
+        seen += count
+    return float(LATENCY_BUCKETS_MS[-1])
+
+
+# 当前请求的用户和项目，由路由设置，AI调用记录用量时读取
+_usage_context: ContextVar[Optional[Tuple[int, Optional[int]]]] = ContextVar("usage_context", default=None)
+
+
+@contextmanager
+def usage_scope(user_id: int, project_id: Optional[int] = None):
+    """在该范围内的AI调用按此用户和项目记录用量"""
+    token = _usage_context.set((user_id, project_id))
+    try:
+        yield
+    finally:
+        _usage_context.reset(token)
+
+
+def current_usage_scope() -> Optional[Tuple[int, Optional[int]]]:
+    return _usage_context.get()
+
+
+class UsageLedger:
+    """用量明细与按天汇总（SQLite）"""
+
+    # 每写入多少批清理一次过期明细
+    PRUNE_INTERVAL = 200
+
+    def __init__(self, usage_dir: str = USAGE_DIR, retention_days: int = USAGE_DETAIL_RETENTION_DAYS):
+        self.retention_days = retention_days
+        os.makedirs(usage_dir, exist_ok=True)
+        self.db_path = os.path.join(usage_dir, "usage.db")
+        self._local = threading.local()
+        self._queue: "queue.SimpleQueue[Optional[UsageRecord]]" = queue.SimpleQueue()
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self._batches = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ai_calls ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, project_id INTEGER, "
+                "provider TEXT NOT NULL, model TEXT NOT NULL, task TEXT NOT NULL, outcome TEXT NOT NULL, "
+                "prompt_tokens INTEGER NOT NULL, completion_tokens INTEGER NOT NULL, latency_ms REAL NOT NULL, "
+                "estimated INTEGER NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_calls_user_time ON ai_calls (user_id, created_at)")
+            # 按天汇总：project_id 为空的调用记为0，便于作为主键
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS usage_daily ("
+                "day TEXT NOT NULL, user_id INTEGER NOT NULL, project_id INTEGER NOT NULL, "
+                "model TEXT NOT NULL, task TEXT NOT NULL, "
+                "calls INTEGER NOT NULL DEFAULT 0, errors INTEGER NOT NULL DEFAULT 0, "
+                "cancelled INTEGER NOT NULL DEFAULT 0, cache_hits INTEGER NOT NULL DEFAULT 0, "
+                "prompt_tokens INTEGER NOT NULL DEFAULT 0, completion_tokens INTEGER NOT NULL DEFAULT 0, "
+                "latency_ms REAL NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (user_id, day, project_id, model, task))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS usage_latency ("
+                "day TEXT NOT NULL, user_id INTEGER NOT NULL, model TEXT NOT NULL, task TEXT NOT NULL, "
+                "bucket INTEGER NOT NULL, count INTEGER NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (user_id, day, model, task, bucket))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # 写入
+    def record(self, record: UsageRecord):
+        """记录一次调用（异步写入，可在事件循环中直接调用）"""
+        if not record.created_at:
+            record.created_at = time.time()
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="usage-writer", daemon=True)
+                self._thread.start()
+        with self._idle:
+            self._pending += 1
+        self._queue.put(record)
+
+    def record_cache_hit(self, user_id: int, project_id: Optional[int], provider: str, model: str, task: str):
+        """记录命中历史或复用段落而省去的一次调用"""
+        self.record(UsageRecord(user_id, project_id, provider, model, task, OUTCOME_CACHE_HIT))
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待已提交的记录全部写入，返回是否在超时前完成"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # 把已排队的记录合并为一个事务
+            while len(batch) < 500:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                print(f"写入AI用量失败: {str(e)}")
+            with self._idle:
+                self._pending -= len(batch)
+                self._idle.notify_all()
+
+    def _write(self, batch: List[UsageRecord]):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for record in batch:
+                conn.execute(
+                    "INSERT INTO ai_calls (user_id, project_id, provider, model, task, outcome, prompt_tokens, "
+                    "completion_tokens, latency_ms, estimated, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    astuple(record)
+                )
+                day = datetime.fromtimestamp(record.created_at).strftime("%Y-%m-%d")
+                called = record.outcome != OUTCOME_CACHE_HIT
+                conn.execute(
+                    "INSERT INTO usage_daily (day, user_id, project_id, model, task, calls, errors, cancelled, "
+                    "cache_hits, prompt_tokens, completion_tokens, latency_ms) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (user_id, day, project_id, model, task) DO UPDATE SET "
+                    "calls = calls + excluded.calls, errors = errors + excluded.errors, "
+                    "cancelled = cancelled + excluded.cancelled, cache_hits = cache_hits + excluded.cache_hits, "
+                    "prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+                    "completion_tokens = completion_tokens + excluded.completion_tokens, "
+                    "latency_ms = latency_ms + excluded.latency_ms",
+                    (day, record.user_id, record.project_id or 0, record.model, record.task,
+                     int(called), int(record.outcome == OUTCOME_ERROR), int(record.outcome == OUTCOME_CANCELLED),
+                     int(not called), record.prompt_tokens, record.completion_tokens,
+                     record.latency_ms if record.outcome == OUTCOME_OK else 0)
+                )
+                # 延迟分布只统计成功的调用
+                if record.outcome == OUTCOME_OK:
+                    conn.execute(
+                        "INSERT INTO usage_latency (day, user_id, model, task, bucket, count) VALUES (?, ?, ?, ?, ?, 1) "
+                        "ON CONFLICT (user_id, day, model, task, bucket) DO UPDATE SET count = count + 1",
+                        (day, record.user_id, record.model, record.task, latency_bucket(record.latency_ms))
+                    )
+            self._batches += 1
+            if self.retention_days and self._batches % self.PRUNE_INTERVAL == 0:
+                conn.execute("DELETE FROM ai_calls WHERE created_at < ?",
+                             (time.time() - self.retention_days * 86400,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # 查询
+    @staticmethod
+    def _since_day(days: int) -> str:
+        days = max(1, min(days, USAGE_MAX_DAYS))
+        return (datetime.now() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+
+    @staticmethod
+    def _scope(user_id: Optional[int]) -> Tuple[str, tuple]:
+        return ("user_id = ? AND ", (user_id,)) if user_id is not None else ("", ())
+
+    def _totals(self, group_by: str, user_id: Optional[int], since: str) -> Iterator[dict]:
+        where, params = self._scope(user_id)
+        rows = self._connect().execute(
+            f"SELECT {group_by}, SUM(calls), SUM(errors), SUM(cancelled), SUM(cache_hits), SUM(prompt_tokens), "
+            f"SUM(completion_tokens), SUM(latency_ms) FROM usage_daily WHERE {where}day >= ? "
+            f"GROUP BY {group_by} ORDER BY {group_by}",
+            params + (since,)
+        ).fetchall()
+        for row in rows:
+            calls, errors, cancelled, cache_hits, prompt_tokens, completion_tokens, latency_ms = row[1:]
+            succeeded = calls - errors - cancelled
+            yield {
+                group_by: row[0], "calls": calls, "errors": errors, "cancelled": cancelled, "cache_hits": cache_hits,
+                "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "avg_latency_ms": round(latency_ms / succeeded, 1) if succeeded else None
+            }
+
+    def _latency_counts(self, group_by: str, user_id: Optional[int], since: str) -> Dict[str, Dict[int, int]]:
+        where, params = self._scope(user_id)
+        counts: Dict[str, Dict[int, int]] = {}
+        for key, bucket, count in self._connect().execute(
+            f"SELECT {group_by}, bucket, SUM(count) FROM usage_latency WHERE {where}day >= ? "
+            f"GROUP BY {group_by}, bucket",
+            params + (since,)
+        ):
+            counts.setdefault(key, {})[bucket] = count
+        return counts
+
+    def summary(self, user_id: Optional[int] = None, days: int = 30) -> dict:
+        """最近若干天的用量汇总：按天、按模型（含延迟分位数）、按项目、按增强类型；user_id为空时统计全部用户"""
+        since = self._since_day(days)
+        latency = self._latency_counts("model", user_id, since)
+        models = list(self._totals("model", user_id, since))
+        for item in models:
+            counts = latency.get(item["model"], {})
+            item.update({f"p{p}_latency_ms": bucket_percentile(counts, p) for p in (50, 95, 99)})
+        return {
+            "since": since,
+            "daily": list(self._totals("day", user_id, since)),
+            "models": models,
+            "projects": list(self._totals("project_id", user_id, since)),
+            "tasks": list(self._totals("task", user_id, since))
+        }
+
+    def recent_calls(self, user_id: int, limit: int = 50) -> List[dict]:
+        """最近的调用明细"""
+        cursor = self._connect().execute(
+            "SELECT project_id, provider, model, task, outcome, prompt_tokens, completion_tokens, latency_ms, "
+            "estimated, created_at FROM ai_calls WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
+            (user_id, max(1, min(limit, 500)))
+        )
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+# 创建全局用量统计实例
+usage_ledger = UsageLedger()